@@ -0,0 +1,50 @@
+"""
+Simulations of a hotel, a busy office, a classroom and a traffic grid, with shared tools.
+
+Each simulation is a subpackage (`simulations.hotel`, `simulations.office`,
+`simulations.classroom` and `simulations.traffic`) whose modules do nothing when imported:
+simulations only start when one of their `run_*` functions or the command line
+(`python -m simulations`) is called, and heavy dependencies such as pandas are only imported
+when a report needs them.
+"""
+import importlib
+from pathlib import Path
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+
+PROJECTS = {
+    "hotel": "simulations.hotel.hotel_simulation",
+    "office": "simulations.office.office_simulation",
+    "classroom": "simulations.classroom.classroom_simulation",
+    "traffic": "simulations.traffic.traffic_simulation",
+}
+
+
+def import_model(name):
+    """
+    Imports the main module of a simulation.
+
+    Args:
+        name (str): The simulation: "hotel", "office", "classroom" or "traffic".
+
+    Returns:
+        module: The simulation module.
+    """
+    return importlib.import_module(PROJECTS[name])
+
+
+def lazy_exports(package, exports):
+    """
+    Returns a module `__getattr__` importing the attributes of a package from its modules on first use.
+
+    Args:
+        package (str): The name of the package.
+        exports (dict): Maps each exported name to the module of the package defining it.
+    """
+    def __getattr__(name):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        return getattr(importlib.import_module(f"{package}.{module}"), name)
+
+    return __getattr__
@@ -0,0 +1,358 @@
+"""
+Benchmark suite measuring the throughput and scaling of every simulation.
+
+Each (simulation, execution mode, entity count) case runs in a fresh process and records
+events per second, peak resident memory and peak thread count. Results are written to a JSON
+file so runs on different commits can be compared.
+
+The events counted are those the mode actually processes: events handled by the hotel's
+event loop, guest stages completed in the threaded hotel, employees reporting, car moves
+and classroom events. Only the threaded hotel also reports `resource_wait_seconds`: the
+total time guest threads spent queued for staff and seats, summed over threads (so it can
+exceed the wall-clock time). It is None for every other case.
+
+Threaded modes sleep in real time, so they run with scaled-down sleeps (see `time_scale`
+in each case's parameters) and are capped at a few thousand threads.
+
+Example:
+    python -m simulations.benchmark --sizes 10 100 1000 10000 100000
+    python -m simulations.benchmark --compare benchmark_results/old.json benchmark_results/new.json
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from simulations import REPOSITORY, import_model
+
+
+class _LineCounter:
+    """
+    A write-only stream counting occurrences of marker strings instead of storing the output.
+    """
+    def __init__(self, markers):
+        self.markers = markers
+        self.count = 0
+
+    def write(self, text):
+        for marker in self.markers:
+            self.count += text.count(marker)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class _ThreadSampler(threading.Thread):
+    """
+    Samples the number of live threads of the process until stopped, keeping the peak.
+    """
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, threading.active_count())
+
+
+# Benchmarks
+def _completed_stages(events):
+    """
+    Counts the guest stages completed in a trace: the outcome of each reservation, check-in,
+    luggage, activity and checkout, without the waits and the refused activity attempts.
+    """
+    import numpy as np
+
+    from simulations.hotel import event_trace as trace
+
+    stage, code = events["stage"], events["code"]
+    completed = {trace.RESERVATION: [trace.FINISHED], trace.CHECKIN: [trace.FINISHED, trace.UNAVAILABLE],
+                 trace.LUGGAGE: [trace.FINISHED, trace.SKIPPED], trace.RESTAURANT: [trace.STARTED],
+                 trace.BAR: [trace.STARTED], trace.ROOM_SERVICE: [trace.STARTED],
+                 trace.HOUSEKEEPING: [trace.STARTED], trace.CHECKOUT: [trace.STARTED]}
+    return sum(int(((stage == key) & np.isin(code, codes)).sum()) for key, codes in completed.items())
+
+
+def bench_hotel_threaded(size):
+    from simulations.hotel.event_trace import EventTrace
+
+    hotel = import_model("hotel")
+    with EventTrace() as guest_trace:
+        hotel.run_threaded(size, time_scale=0.01, trace=guest_trace)
+    pools = [hotel.receptionists, hotel.bellhops, hotel.housekeepers, hotel.bar_seats, hotel.restaurant_seats]
+    return {"events": _completed_stages(guest_trace.events()),
+            "resource_wait_seconds": sum(pool.wait_time for pool in pools), "params": {"time_scale": 0.01}}
+
+
+def bench_hotel_event(size):
+    hotel = import_model("hotel")
+    simulation = hotel.make_event_simulation(size, seed=0)
+    simulation.run()
+    return {"events": simulation.events_processed, "resource_wait_seconds": None, "params": {}}
+
+
+def bench_hotel_stream(size):
+    from simulations.hotel.streaming import make_streaming_simulation, poisson_arrivals
+    from simulations.seeding import SeedStreams
+
+    streams = SeedStreams(0)
+    simulation = make_streaming_simulation(poisson_arrivals(1.0, streams.stream("arrivals")), streams,
+                                           max_guests=size)
+    simulation.run()
+    return {"events": simulation.events_processed, "resource_wait_seconds": None,
+            "params": {"arrival_rate": 1.0, "peak_guests": simulation.guests.peak}}
+
+
+def bench_office_threaded(size):
+    office = import_model("office")
+    office.Simulator(size, "threaded", time_scale=0.001, verbose=False).start()
+    return {"events": size, "resource_wait_seconds": None, "params": {"time_scale": 0.001}}
+
+
+def bench_office_asyncio(size):
+    office = import_model("office")
+    office.Simulator(size, "asyncio", time_scale=0, verbose=False, keep_report=False).start()
+    return {"events": size, "resource_wait_seconds": None, "params": {"time_scale": 0}}
+
+
+def bench_traffic_threaded(size):
+    traffic = import_model("traffic")
+    counter = _LineCounter([" arrived at "])
+    with contextlib.redirect_stdout(counter):
+        traffic.run_threaded(size, time_scale=0.01)
+    return {"events": counter.count, "resource_wait_seconds": None,
+            "params": {"time_scale": 0.01, "grid": traffic.number_of_x_squares}}
+
+
+def bench_traffic_vectorized(size):
+    from simulations.traffic.grid_engine import GridEngine
+
+    summary = GridEngine(200, 200, size, seed=0).run()
+    return {"events": summary["moves"], "resource_wait_seconds": None, "params": {"grid": 200}}
+
+
+def bench_traffic_tiled(size):
+    from simulations.traffic.grid_engine import GridEngine
+    from simulations.traffic.tiled_engine import TiledGridEngine, default_tiles
+
+    tiles = default_tiles(os.cpu_count() or 1)
+    summary = TiledGridEngine(GridEngine(200, 200, size, seed=0), tiles).run()
+    return {"events": summary["moves"], "resource_wait_seconds": None, "params": {"grid": 200, "tiles": list(tiles)}}
+
+
+def bench_classroom_threaded(size):
+    classroom = import_model("classroom")
+    counter = _LineCounter(["has raised", "has lowered", "is presenting"])
+    with contextlib.redirect_stdout(counter):
+        classroom.run_simulation(size, 2, 60, time_scale=0.01)
+    return {"events": counter.count, "resource_wait_seconds": None,
+            "params": {"time_scale": 0.01, "teachers": 2, "timeout": 60}}
+
+
+def bench_classroom_batched(size):
+    from simulations.classroom.school_engine import SchoolEngine
+
+    classrooms = max(1, size // 50)
+    summary = SchoolEngine(classrooms, 50, 2, seed=0).run(60)
+    return {"events": summary["events"], "resource_wait_seconds": None,
+            "params": {"classrooms": classrooms, "students": 50, "teachers": 2, "timeout": 60}}
+
+
+# (simulation, mode) -> (benchmark function, maximum entity count)
+BENCHMARKS = {
+    ("hotel", "threaded"): (bench_hotel_threaded, 1000),
+    ("hotel", "event"): (bench_hotel_event, 100000),
+    ("hotel", "stream"): (bench_hotel_stream, 1000000),
+    ("office", "threaded"): (bench_office_threaded, 1000),
+    ("office", "asyncio"): (bench_office_asyncio, 100000),
+    ("traffic", "threaded"): (bench_traffic_threaded, 100),
+    ("traffic", "vectorized"): (bench_traffic_vectorized, 100000),
+    ("traffic", "tiled"): (bench_traffic_tiled, 100000),
+    ("classroom", "threaded"): (bench_classroom_threaded, 1000),
+    ("classroom", "batched"): (bench_classroom_batched, 100000),
+}
+
+
+def measure(model, mode, size):
+    """
+    Runs one benchmark case in the current process and measures it.
+
+    Args:
+        model (str): The simulation.
+        mode (str): The execution mode.
+        size (int): The number of entities (guests, employees, cars or students).
+
+    Returns:
+        dict: The case, its wall and CPU time, events per second, peak RSS, peak threads and resource wait.
+    """
+    logging.disable(logging.CRITICAL)
+    benchmark, _ = BENCHMARKS[(model, mode)]
+    sampler = _ThreadSampler()
+    sampler.start()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    result = benchmark(size)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    sampler.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    return {
+        "model": model,
+        "mode": mode,
+        "size": size,
+        "params": result["params"],
+        "wall_seconds": elapsed,
+        "cpu_seconds": cpu,
+        "events": result["events"],
+        "events_per_second": result["events"] / elapsed if elapsed > 0 else None,
+        "peak_rss_bytes": peak_rss,
+        "peak_threads": sampler.peak,
+        "resource_wait_seconds": result["resource_wait_seconds"],
+    }
+
+
+def run_suite(models=None, modes=None, sizes=(10, 100, 1000, 10000, 100000), max_threads=None, on_result=None):
+    """
+    Runs every selected benchmark case, each in a freshly spawned process.
+
+    Args:
+        models (list): The simulations to benchmark; defaults to all.
+        modes (list): The execution modes to benchmark; defaults to all.
+        sizes (list): The entity counts to run.
+        max_threads (int): Optional override of the entity cap of threaded modes.
+        on_result (callable): Optional function called with each case result as it completes.
+
+    Returns:
+        list: The case results; skipped cases and failures are recorded with a "skipped" or "error" key.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for (model, mode), (_, cap) in BENCHMARKS.items():
+        if (models and model not in models) or (modes and mode not in modes):
+            continue
+        if mode == "threaded" and max_threads is not None:
+            cap = max_threads
+        for size in sizes:
+            if size > cap:
+                result = {"model": model, "mode": mode, "size": size, "skipped": f"above the cap of {cap}"}
+            else:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    try:
+                        result = executor.submit(measure, model, mode, size).result()
+                    except Exception as error:
+                        result = {"model": model, "mode": mode, "size": size, "error": repr(error)}
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results
+
+
+def environment():
+    """
+    Describes the machine and code version the benchmarks ran on.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPOSITORY, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def format_result(result):
+    """
+    Formats a case result as a single line.
+    """
+    case = f"{result['model']:<9} {result['mode']:<10} {result['size']:>7}"
+    if "skipped" in result:
+        return f"{case}  skipped ({result['skipped']})"
+    if "error" in result:
+        return f"{case}  failed: {result['error']}"
+    wait = result.get("resource_wait_seconds")
+    wait = "" if wait is None else f"  resource wait {wait:.3f}s"
+    return (f"{case}  {result['events_per_second']:>12,.0f} events/s  {result['wall_seconds']:8.3f}s"
+            f"  {result['peak_rss_bytes'] / 2 ** 20:8.1f} MiB  {result['peak_threads']:>6} threads{wait}")
+
+
+def compare(old_path, new_path):
+    """
+    Prints the change in events per second and peak memory between two result files.
+    """
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+
+    def measured(report):
+        return {(r["model"], r["mode"], r["size"]): r for r in report["results"] if "events_per_second" in r}
+
+    old_results, new_results = measured(old), measured(new)
+    print(f"{old['environment']['commit'] or old_path} -> {new['environment']['commit'] or new_path}\n")
+    for key in sorted(old_results.keys() & new_results.keys()):
+        before, after = old_results[key], new_results[key]
+        speedup = after["events_per_second"] / before["events_per_second"] if before["events_per_second"] else float("nan")
+        memory = after["peak_rss_bytes"] / before["peak_rss_bytes"] if before["peak_rss_bytes"] else float("nan")
+        print(f"{key[0]:<9} {key[1]:<10} {key[2]:>7}  events/s x{speedup:6.2f}  peak RSS x{memory:5.2f}")
+
+
+def main(argv=None):
+    """
+    Parses the command line and runs or compares benchmarks.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the throughput and scaling of the simulations.")
+    parser.add_argument("--models", nargs="*", default=None, help="Simulations to benchmark (default: all).")
+    parser.add_argument("--modes", nargs="*", default=None, help="Execution modes to benchmark (default: all).")
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--max-threads", type=int, default=None, help="Entity cap for threaded modes.")
+    parser.add_argument("--output", default=None,
+                        help="Result file (default: benchmark_results/<timestamp>-<commit>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {"environment": environment()}
+    report["results"] = run_suite(args.models, args.modes, args.sizes, args.max_threads,
+                                  lambda result: print(format_result(result), flush=True))
+    output = args.output
+    if output is None:
+        stamp = report["environment"]["timestamp"].replace(":", "").replace("-", "")
+        commit = (report["environment"]["commit"] or "unknown")[:10]
+        output = os.path.join("benchmark_results", f"{stamp}-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
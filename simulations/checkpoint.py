@@ -0,0 +1,422 @@
+"""
+Checkpoint and resume for the virtual-clock simulations.
+
+The hotel's discrete-event simulation and the vectorized traffic engine are saved at regular
+intervals of simulated time. Each checkpoint is a directory holding one `.npy` file per array
+(the event heap, resource queues and guest table of the hotel; the car and light arrays of
+the traffic grid) and a `meta.json` with the scalars: the virtual clock, counters and random
+generator states. The arrays can be memory-mapped for analysis without restoring a run.
+
+A run that dies resumes from its latest checkpoint. A checkpoint can also be forked into
+what-if branches, each continuing from the saved state with different capacities, light
+phases or a different seed for the future, without re-simulating the warm-up.
+
+Example:
+    python -m simulations.checkpoint hotel --guests 100000 --dir checkpoints/hotel --interval 10
+    python -m simulations.checkpoint hotel --dir checkpoints/hotel --resume
+    python -m simulations.checkpoint hotel --fork checkpoints/hotel/checkpoint-000000030.000 \\
+        --seed 7 --set receptionists=8
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import time
+
+import numpy as np
+
+from simulations import import_model
+from simulations.seeding import RandomStream, SeedStreams
+
+FORMAT_VERSION = 1
+
+
+# Storage
+def save_checkpoint(path, model, state):
+    """
+    Writes a state to a checkpoint directory, replacing it atomically.
+
+    Args:
+        path (str): The checkpoint directory.
+        model (str): The simulation the state belongs to.
+        state (dict): Maps names to numpy arrays (saved as .npy) or JSON-serializable scalars.
+    """
+    temporary = f"{path}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    meta = {"format": FORMAT_VERSION, "model": model, "arrays": [], "scalars": {}}
+    for name, value in state.items():
+        if isinstance(value, np.ndarray):
+            np.save(os.path.join(temporary, f"{name}.npy"), value)
+            meta["arrays"].append(name)
+        else:
+            meta["scalars"][name] = value.item() if isinstance(value, np.generic) else value
+    with open(os.path.join(temporary, "meta.json"), "w") as file:
+        json.dump(meta, file)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path, mmap=True):
+    """
+    Reads a checkpoint directory.
+
+    Args:
+        path (str): The checkpoint directory.
+        mmap (bool): Memory-map the arrays instead of reading them into memory.
+
+    Returns:
+        tuple: (model, state) with the arrays and scalars in one dictionary.
+    """
+    with open(os.path.join(path, "meta.json")) as file:
+        meta = json.load(file)
+    if meta["format"] != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint format {meta['format']}.")
+    state = dict(meta["scalars"])
+    for name in meta["arrays"]:
+        state[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+    return meta["model"], state
+
+
+def checkpoint_path(directory, clock):
+    """
+    Returns the path of the checkpoint taken at a value of the virtual clock (seconds or ticks).
+    """
+    return os.path.join(directory, f"checkpoint-{clock:013.3f}")
+
+
+def latest_checkpoint(directory):
+    """
+    Returns the path of the most recent complete checkpoint in a directory, or None.
+    """
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith("checkpoint-") and not name.endswith(".tmp")
+                   and os.path.exists(os.path.join(directory, name, "meta.json")))
+    return os.path.join(directory, names[-1]) if names else None
+
+
+def _prune(directory, keep):
+    names = sorted(name for name in os.listdir(directory) if name.startswith("checkpoint-") and not name.endswith(".tmp"))
+    for name in names[:-keep] if keep else []:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+# Random Streams
+def pack_streams(rngs):
+    """
+    Converts the random streams of the guests to columns.
+
+    Guests either all draw from the random module, whose state is saved once, or each own a
+    RandomStream, whose PCG64 states and unconsumed values are saved as arrays.
+
+    Returns:
+        dict: Arrays and scalars to add to a checkpoint state.
+    """
+    if all(rng is random for rng in rngs):
+        return {"rng_kind": "random", "rng_random_state": json.dumps(random.getstate())}
+    count = len(rngs)
+    packed = {
+        "rng_kind": "streams",
+        "rng_state": np.zeros((count, 2), dtype=np.uint64),
+        "rng_increment": np.zeros((count, 2), dtype=np.uint64),
+        "rng_has_uint32": np.zeros(count, dtype=np.uint8),
+        "rng_uinteger": np.zeros(count, dtype=np.uint32),
+        "rng_block_size": np.zeros(count, dtype=np.int32),
+    }
+    remaining = []
+    for i, rng in enumerate(rngs):
+        bit_state, values = rng.getstate()
+        if bit_state["bit_generator"] != "PCG64":
+            raise ValueError(f"Cannot checkpoint {bit_state['bit_generator']} streams.")
+        for column, value in (("rng_state", bit_state["state"]["state"]), ("rng_increment", bit_state["state"]["inc"])):
+            packed[column][i] = (value >> 64, value & ((1 << 64) - 1))
+        packed["rng_has_uint32"][i] = bit_state["has_uint32"]
+        packed["rng_uinteger"][i] = bit_state["uinteger"]
+        packed["rng_block_size"][i] = rng.block_size
+        remaining.append(values)
+    packed["rng_remaining_count"] = np.array([len(values) for values in remaining], dtype=np.int32)
+    packed["rng_remaining"] = np.array([value for values in remaining for value in values], dtype=np.float64)
+    return packed
+
+
+def unpack_streams(state, count):
+    """
+    Rebuilds the random streams saved by `pack_streams`.
+
+    Returns:
+        list: The random module (repeated) or one RandomStream per guest.
+    """
+    if state["rng_kind"] == "random":
+        random.setstate(_as_tuple(json.loads(state["rng_random_state"])))
+        return [random] * count
+    rngs = []
+    remaining = np.asarray(state["rng_remaining"]).tolist()
+    offsets = np.concatenate([[0], np.cumsum(state["rng_remaining_count"])]).tolist()
+    for i in range(count):
+        high, low = (int(value) for value in state["rng_state"][i])
+        increment_high, increment_low = (int(value) for value in state["rng_increment"][i])
+        bit_state = {
+            "bit_generator": "PCG64",
+            "state": {"state": high << 64 | low, "inc": increment_high << 64 | increment_low},
+            "has_uint32": int(state["rng_has_uint32"][i]),
+            "uinteger": int(state["rng_uinteger"][i]),
+        }
+        stream = RandomStream(np.random.Generator(np.random.PCG64()), int(state["rng_block_size"][i]))
+        stream.setstate((bit_state, remaining[offsets[i]:offsets[i + 1]]))
+        rngs.append(stream)
+    return rngs
+
+
+def _as_tuple(value):
+    return tuple(_as_tuple(item) for item in value) if isinstance(value, list) else value
+
+
+# Hotel
+def checkpoint_hotel(simulation, path):
+    """
+    Saves a HotelEventSimulation to a checkpoint directory.
+
+    Raises:
+        ValueError: If the simulation streams its arrivals (StreamingHotelSimulation): the
+            position of its arrival generator cannot be saved.
+    """
+    from simulations.hotel.streaming import StreamingHotelSimulation
+
+    if isinstance(simulation, StreamingHotelSimulation):
+        raise ValueError("Streaming hotel simulations cannot be checkpointed.")
+    state = simulation.get_state()
+    state.update(pack_streams(state.pop("rngs")))
+    save_checkpoint(path, "hotel", state)
+
+
+def restore_hotel(path, trace=None, mmap=True):
+    """
+    Restores a HotelEventSimulation from a checkpoint directory.
+
+    Args:
+        path (str): The checkpoint directory.
+        trace (EventTrace): Optional trace to record the rest of the run in.
+        mmap (bool): Memory-map the arrays while restoring.
+
+    Returns:
+        HotelEventSimulation: The simulation, ready to continue with `run`.
+    """
+    model, state = load_checkpoint(path, mmap)
+    if model != "hotel":
+        raise ValueError(f"{path} is a {model} checkpoint.")
+    hotel = import_model("hotel")
+    from simulations.hotel.event_simulation import HotelEventSimulation
+
+    count = len(state["guest_index"])
+    rngs = unpack_streams(state, count)
+    guests = [
+        hotel.Guest(guest_id, name, has_luggage, index, rng)
+        for guest_id, name, has_luggage, index, rng in zip(
+            state["guest_guest_id"].tolist(), state["guest_guest_name"].tolist(),
+            state["guest_has_luggage"].tolist(), state["guest_index"].tolist(), rngs)
+    ]
+    simulation = HotelEventSimulation(guests, [], trace=trace)
+    simulation.set_state(state)
+    return simulation
+
+
+def fork_hotel(path, seed=None, **capacities):
+    """
+    Restores a hotel checkpoint as a what-if branch.
+
+    Args:
+        path (str): The checkpoint directory.
+        seed (int): Optional seed of new random streams for the rest of the run; None keeps the saved streams.
+        capacities (int): New capacities by resource name (see HotelEventSimulation.resize).
+
+    Returns:
+        HotelEventSimulation: The branch, ready to continue with `run`.
+    """
+    simulation = restore_hotel(path)
+    if seed is not None:
+        streams = SeedStreams(seed)
+        for guest in simulation.guests:
+            guest.rng = streams.stream("guest", guest.index, block_size=16)
+    for resource, capacity in capacities.items():
+        simulation.resize(resource, capacity)
+    return simulation
+
+
+def run_hotel(simulation, directory, interval, keep=None):
+    """
+    Runs a hotel simulation to completion, checkpointing every `interval` seconds of virtual time.
+
+    Args:
+        simulation (HotelEventSimulation): The simulation, new or restored.
+        directory (str): The directory checkpoints are written to.
+        interval (float): The virtual time between checkpoints.
+        keep (int): Optional number of most recent checkpoints to keep.
+
+    Returns:
+        list: The simulated Guest objects.
+    """
+    os.makedirs(directory, exist_ok=True)
+    while simulation.pending_events:
+        until = (simulation.now // interval + 1) * interval
+        simulation.run(until)
+        if simulation.pending_events:
+            checkpoint_hotel(simulation, checkpoint_path(directory, simulation.now))
+            _prune(directory, keep)
+    return simulation.guests
+
+
+# Traffic
+def checkpoint_grid(engine, path):
+    """
+    Saves a GridEngine to a checkpoint directory.
+    """
+    save_checkpoint(path, "traffic", engine.get_state())
+
+
+def restore_grid(path, mmap=True):
+    """
+    Restores a GridEngine from a checkpoint directory.
+    """
+    model, state = load_checkpoint(path, mmap)
+    if model != "traffic":
+        raise ValueError(f"{path} is a {model} checkpoint.")
+    from simulations.traffic.grid_engine import GridEngine
+
+    return GridEngine.from_state(state)
+
+
+def fork_grid(path, seed=None, light_seconds=None):
+    """
+    Restores a traffic checkpoint as a what-if branch.
+
+    Args:
+        path (str): The checkpoint directory.
+        seed (int): Optional new seed for the random decisions of the rest of the run.
+        light_seconds (tuple): Optional new range [low, high) of seconds between light flips.
+
+    Returns:
+        GridEngine: The branch, ready to continue with `run`.
+    """
+    engine = restore_grid(path)
+    if seed is not None:
+        engine.key = SeedStreams(seed).key()
+    if light_seconds is not None:
+        engine.light_seconds = tuple(light_seconds)
+    return engine
+
+
+def run_grid(engine, directory, interval, max_ticks=None, keep=None):
+    """
+    Runs a GridEngine until every car has left the grid, checkpointing every `interval` ticks.
+
+    Args:
+        engine (GridEngine): The engine, new or restored.
+        directory (str): The directory checkpoints are written to.
+        interval (int): The number of ticks between checkpoints.
+        max_ticks (int): Optional limit on the tick the run stops at.
+        keep (int): Optional number of most recent checkpoints to keep.
+
+    Returns:
+        dict: The summary of the run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    first_tick = engine.tick
+    moves = 0
+    while engine.active.any() and (max_ticks is None or engine.tick < max_ticks):
+        ticks = interval - engine.tick % interval
+        if max_ticks is not None:
+            ticks = min(ticks, max_ticks - engine.tick)
+        moves += engine.run(ticks)["moves"]
+        if engine.active.any():
+            checkpoint_grid(engine, checkpoint_path(directory, engine.tick))
+            _prune(directory, keep)
+    return engine.summary(time.perf_counter() - start, engine.tick - first_tick, moves)
+
+
+# Command Line
+def _parse_settings(settings):
+    values = {}
+    for setting in settings or []:
+        name, _, value = setting.partition("=")
+        values[name] = int(value)
+    return values
+
+
+def main(argv=None):
+    """
+    Parses the command line and starts, resumes or forks a checkpointed run.
+    """
+    parser = argparse.ArgumentParser(description="Run the hotel or traffic simulation with checkpoints.")
+    parser.add_argument("model", choices=["hotel", "traffic"])
+    parser.add_argument("--dir", default=None, help="Directory to write checkpoints to.")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Virtual seconds (hotel) or ticks (traffic) between checkpoints.")
+    parser.add_argument("--keep", type=int, default=None, help="Number of most recent checkpoints to keep.")
+    parser.add_argument("--resume", action="store_true", help="Continue from the latest checkpoint in --dir.")
+    parser.add_argument("--fork", default=None, metavar="CHECKPOINT", help="Continue a what-if branch of a checkpoint.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed of a new run, or of the rest of a forked run.")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="Capacity change for a forked hotel run, e.g. receptionists=8.")
+    parser.add_argument("--light-seconds", type=int, nargs=2, default=None,
+                        help="Light phase range [low, high) for a forked traffic run.")
+    parser.add_argument("--guests", type=int, default=400, help="Guests of a new hotel run.")
+    parser.add_argument("--cars", type=int, default=2, help="Cars of a new traffic run.")
+    parser.add_argument("--grid", type=int, default=5, help="Squares per side of a new traffic grid.")
+    parser.add_argument("--ticks", type=int, default=None, help="Maximum tick of a traffic run.")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or os.path.join("checkpoints", args.model)
+    interval = args.interval or (10.0 if args.model == "hotel" else 100)
+    if args.fork:
+        fork = os.path.normpath(args.fork)
+        directory = args.dir or os.path.join(f"{os.path.dirname(fork)}-forks", os.path.basename(fork))
+    latest = latest_checkpoint(directory) if args.resume else None
+    if args.resume and latest is None:
+        parser.error(f"No checkpoint to resume from in {directory}.")
+
+    start = time.perf_counter()
+    if args.model == "hotel":
+        logging.disable(logging.INFO)
+        if args.fork:
+            simulation = fork_hotel(args.fork, args.seed, **_parse_settings(args.set))
+        elif latest:
+            simulation = restore_hotel(latest)
+        else:
+            hotel = import_model("hotel")
+            from simulations.hotel.event_simulation import HotelEventSimulation
+
+            streams = SeedStreams(args.seed)
+            rooms = list(hotel.ROOMS)
+            streams.stream("model").shuffle(rooms)
+            simulation = HotelEventSimulation(hotel.make_guests(args.guests, streams), rooms)
+        print(f"Starting at {simulation.now:.3f}s of virtual time.")
+        guests = run_hotel(simulation, directory, interval, args.keep)
+        stays = [guest.time_in_hotel for guest in guests if guest.room_number is not None]
+        print(f"Finished at {simulation.now:.3f}s of virtual time after {simulation.events_processed} events "
+              f"({time.perf_counter() - start:.3f}s of wall-clock time).")
+        print(f"{len(stays)} of {len(guests)} guests checked in; average time in hotel "
+              f"{(sum(stays) / len(stays) if stays else float('nan')):.3f}s.")
+    else:
+        if args.fork:
+            engine = fork_grid(args.fork, args.seed, args.light_seconds)
+        elif latest:
+            engine = restore_grid(latest)
+        else:
+            from simulations.traffic.grid_engine import GridEngine
+
+            engine = GridEngine(args.grid, args.grid, args.cars, seed=args.seed)
+        print(f"Starting at tick {engine.tick}.")
+        summary = run_grid(engine, directory, int(interval), args.ticks, args.keep)
+        for key, value in summary.items():
+            print(f"{key}: {value}")
+    print(f"Checkpoints in {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+The classroom simulation of students raising hands and teachers calling on them.
+"""
+from simulations import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "Student": "classroom_simulation",
+    "Teacher": "classroom_simulation",
+    "PresentationScheduler": "classroom_simulation",
+    "run_simulation": "classroom_simulation",
+    "SchoolEngine": "school_engine",
+})
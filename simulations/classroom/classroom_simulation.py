@@ -0,0 +1,367 @@
+import contextlib
+import random
+import sys
+import threading
+import time
+
+# Times the stages of a teacher; simulations.profiling swaps in a timer when a run is profiled
+profile_stage = contextlib.nullcontext
+
+class Student:
+    """
+    Represents a student who can raise and lower their hand, and give a presentation.
+
+    Attributes:
+        id (int): The unique ID of the student.
+        hand_raised (bool): Indicates if the student's hand is raised.
+        has_presented (bool): Indicates if the student has presented.
+        scheduler (PresentationScheduler): The scheduler tracking the student, if any.
+    """
+    def __init__(self, id):
+        """
+        Initializes a Student instance with a unique ID.
+
+        Args:
+            id (int): The unique ID of the student.
+        """
+        self.id = id
+        self.hand_raised = False
+        self.has_presented = False
+        self.scheduler = None
+
+    def raise_hand(self):
+        """
+        Raises the student's hand.
+        """
+        self.hand_raised = True
+        if self.scheduler is not None:
+            self.scheduler.update_hand(self)
+        print(f"Student {self.id} has raised their hand.")
+
+    def lower_hand(self):
+        """
+        Lowers the student's hand.
+        """
+        self.hand_raised = False
+        if self.scheduler is not None:
+            self.scheduler.update_hand(self)
+        print(f"Student {self.id} has lowered their hand.")
+
+    def present(self, duration=5):
+        """
+        Simulates the student giving a presentation, for 5 seconds by default.
+
+        Args:
+            duration (float): The length of the presentation in seconds.
+        """
+        self.hand_raised = False
+        self.has_presented = True
+        print(f"Student {self.id} is presenting.")
+        time.sleep(duration)
+        print(f"Student {self.id} has finished presenting.")
+
+class IndexedSet:
+    """
+    A set supporting O(1) insertion, removal and uniform random choice.
+
+    Items are kept in a list, with a dictionary from each item to its position; a removed
+    item is replaced by the last item of the list so that no other item has to move.
+    """
+    def __init__(self, items=()):
+        self._items = []
+        self._positions = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def choice(self, rng=random):
+        return self._items[rng.randrange(len(self._items))]
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def __len__(self):
+        return len(self._items)
+
+
+class PresentationScheduler:
+    """
+    Thread-safe index of the students who still have to present, shared by all teachers of a class.
+
+    The scheduler keeps the set of students who have not presented yet and, among them, those
+    with a raised hand. A teacher claims a student atomically, so a student can never be called
+    on by two teachers, and picking one is O(1) however large the class is.
+
+    Attributes:
+        lock (threading.Lock): Guards both indexes.
+        rng: The source of random numbers used to pick students, with the API of the random module.
+    """
+    def __init__(self, students, rng=random):
+        """
+        Initializes the scheduler and attaches it to every student.
+
+        Args:
+            students (list): The list of students in the class.
+            rng: The source of random numbers used to pick students; defaults to the random module.
+        """
+        self.lock = threading.Lock()
+        self.rng = rng
+        self._not_presented = IndexedSet()
+        self._raised_hands = IndexedSet()
+        for student in students:
+            student.scheduler = self
+            if not student.has_presented:
+                self._not_presented.add(student)
+                if student.hand_raised:
+                    self._raised_hands.add(student)
+
+    def update_hand(self, student):
+        """
+        Updates the index of raised hands after a student raised or lowered their hand.
+
+        Args:
+            student (Student): The student whose hand changed.
+        """
+        with self.lock:
+            if student not in self._not_presented:
+                return
+            if student.hand_raised:
+                self._raised_hands.add(student)
+            else:
+                self._raised_hands.discard(student)
+
+    def claim(self):
+        """
+        Picks and removes a student to present: a random student with a raised hand if there is one,
+        otherwise a random student who has not presented yet.
+
+        Returns:
+            Student: The claimed student, or None if every student has been called on.
+        """
+        with self.lock:
+            if self._raised_hands:
+                student = self._raised_hands.choice(self.rng)
+            elif self._not_presented:
+                student = self._not_presented.choice(self.rng)
+            else:
+                return None
+            self._raised_hands.discard(student)
+            self._not_presented.discard(student)
+            return student
+
+    @property
+    def remaining(self):
+        """
+        int: The number of students who have not been called on yet.
+        """
+        return len(self._not_presented)
+
+    @property
+    def raised_hands(self):
+        """
+        int: The number of students waiting with a raised hand.
+        """
+        return len(self._raised_hands)
+
+
+class Teacher:
+    """
+    Represents a teacher who calls on students to present.
+
+    Attributes:
+        id (int): The unique ID of the teacher.
+        students (list): The list of students in the class.
+        scheduler (PresentationScheduler): The scheduler shared by the teachers of the class.
+        time_scale (float): Multiplier applied to the presentation and pause durations.
+    """
+    def __init__(self, id, students, stop_event, scheduler=None, time_scale=1.0):
+        """
+        Initializes a Teacher instance with a unique ID and a list of students.
+
+        Args:
+            id (int): The unique ID of the teacher.
+            students (list): The list of students in the class.
+            stop_event (threading.Event): Event to signal when to stop the simulation.
+            scheduler (PresentationScheduler): The scheduler shared by the teachers of the class;
+                one is created for the students if not given.
+            time_scale (float): Multiplier applied to the presentation and pause durations.
+        """
+        self.id = id
+        self.students = students
+        self.stop_event = stop_event
+        self.scheduler = scheduler if scheduler is not None else PresentationScheduler(students)
+        self.time_scale = time_scale
+
+    def call_on_student(self):
+        """
+        Calls on students to present, prioritizing those with raised hands. Stops when all students have presented or the stop event is set.
+        """
+        while not self.stop_event.is_set():
+            with profile_stage("call_on_student"):
+                with profile_stage("claim"):
+                    student = self.scheduler.claim()
+                if student is None:
+                    break
+                with profile_stage("present"):
+                    student.present(5 * self.time_scale)
+                time.sleep(self.time_scale)
+
+def student_behavior(student, stop_event, time_scale=1.0, rng=random):
+    """
+    Simulates the behavior of a student, randomly raising and lowering their hand.
+
+    Args:
+        student (Student): The student whose behavior is being simulated.
+        stop_event (threading.Event): Event to signal when to stop the simulation.
+        time_scale (float): Multiplier applied to the time between decisions.
+        rng: The student's source of random numbers, with the API of the random module.
+    """
+    while not student.has_presented and not stop_event.is_set():
+        if rng.random() < 0.1:
+            student.raise_hand()
+        if rng.random() < 0.05:
+            student.lower_hand()
+        time.sleep(rng.uniform(1, 3) * time_scale)
+
+def print_report(students):
+    """
+    Prints a report of which students have presented, who raised their hands, and who did not present.
+
+    Args:
+        students (list): The list of students in the class.
+    """
+    raised_hands_students = [student.id for student in students if student.hand_raised]
+    presented_students = [student.id for student in students if student.has_presented]
+    not_presented_students = [student.id for student in students if not student.has_presented]
+
+    max_length = max(len(raised_hands_students), len(presented_students), len(not_presented_students))
+    raised_hands_students.extend([''] * (max_length - len(raised_hands_students)))
+    presented_students.extend([''] * (max_length - len(presented_students)))
+    not_presented_students.extend([''] * (max_length - len(not_presented_students)))
+
+    import pandas as pd
+
+    report_df = pd.DataFrame({
+        'Raised Hands': raised_hands_students,
+        'Presented': presented_students,
+        'Not Presented': not_presented_students
+    })
+
+    print("\nPresentation Report:")
+    print(report_df.to_string(index=False))
+
+def stop_simulation_after_timeout(stop_event, timeout):
+    """
+    Stops the simulation after a specified timeout.
+
+    Args:
+        stop_event (threading.Event): Event to signal when to stop the simulation.
+        timeout (int): The time in seconds after which the simulation should stop.
+    """
+    time.sleep(timeout)
+    stop_event.set()
+
+# The scheduler of the class being simulated, for observers such as the metrics sampler
+current_scheduler = None
+
+
+def run_simulation(num_students=50, num_teachers=2, timeout=60, time_scale=1.0, streams=None):
+    """
+    Runs the classroom simulation with one thread per student and per teacher until the timeout.
+
+    Args:
+        num_students (int): The number of students in the class.
+        num_teachers (int): The number of teachers calling on students.
+        timeout (float): The time in seconds after which the simulation stops.
+        time_scale (float): Multiplier applied to every duration, including the timeout, to run
+            the same simulation faster (below 1) or slower (above 1) than real time.
+        streams (SeedStreams): Optional source of a seeded random stream per student and for the
+            teachers' choices; without it, everything draws from the random module.
+
+    Returns:
+        list: The students of the class.
+    """
+    global current_scheduler
+    students = [Student(i) for i in range(1, num_students + 1)]
+    stop_event = threading.Event()
+    scheduler = PresentationScheduler(students, streams.stream("teacher") if streams is not None else random)
+    current_scheduler = scheduler
+    teachers = [Teacher(i, students, stop_event, scheduler, time_scale) for i in range(1, num_teachers + 1)]
+
+    student_threads = [
+        threading.Thread(
+            target=student_behavior,
+            args=(student, stop_event, time_scale,
+                  streams.stream("student", student.id) if streams is not None else random),
+        )
+        for student in students
+    ]
+    teacher_threads = [threading.Thread(target=teacher.call_on_student) for teacher in teachers]
+
+    # Start a thread to stop the simulation after the timeout
+    timeout_thread = threading.Thread(target=stop_simulation_after_timeout, args=(stop_event, timeout * time_scale))
+    timeout_thread.start()
+
+    for thread in student_threads + teacher_threads:
+        thread.start()
+
+    for thread in student_threads + teacher_threads:
+        thread.join()
+
+    timeout_thread.join()
+    return students
+
+
+def run_command(args):
+    """
+    Runs the simulation configured on the command line and prints the report.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments of the classroom command (see simulations.cli).
+    """
+    if args.mode == "batched":
+        from simulations.classroom.school_engine import SchoolEngine, print_school_report
+
+        engine = SchoolEngine(args.classrooms, args.students, args.teachers, seed=args.seed)
+        with profile_stage("simulate"):
+            summary = engine.run(args.timeout)
+        with profile_stage("report"):
+            for key, value in summary.items():
+                print(f"{key}: {value}")
+            print_school_report(engine, args.detail)
+        return
+    streams = None
+    if args.seed is not None:
+        from simulations.seeding import SeedStreams
+
+        streams = SeedStreams(args.seed)
+    with profile_stage("simulate"):
+        students = run_simulation(args.students, args.teachers, args.timeout, args.time_scale, streams)
+    with profile_stage("report"):
+        print_report(students)
+
+
+def main(argv=None):
+    """
+    Parses the command line, runs the simulation and prints the report.
+    """
+    from simulations.cli import main as cli_main
+
+    cli_main(["classroom", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import time
+
+import numpy as np
+
+# Student behavior (as in `student_behavior` of the threaded simulation)
+RAISE_PROBABILITY = 0.1
+LOWER_PROBABILITY = 0.05
+DECISION_SECONDS = (1, 3)
+
+# Teacher behavior (as in `Teacher.call_on_student`)
+PRESENTATION_SECONDS = 5
+PAUSE_SECONDS = 1
+
+
+class SchoolEngine:
+    """
+    Simulates a whole school of classrooms together, one tick at a time.
+
+    Instead of one thread per student and per teacher, the hands and presentations of every
+    student are held in (classroom, student) boolean arrays. The rules are those of the
+    threaded simulation: every 1 to 3 seconds a student who has not presented raises their
+    hand with a probability of 10%, then lowers it with a probability of 5%; a free teacher
+    calls on a random student with a raised hand, or if there is none a random student who
+    has not presented, who presents for 5 seconds, then pauses for a second. Each tick draws
+    the decisions of every student due to decide as one vectorized Bernoulli draw, and each
+    teacher slot picks its students in all the classrooms where it is free with one argmax.
+
+    Attributes:
+        classrooms (int): The number of classrooms.
+        students (int): The number of students per classroom.
+        teachers (int): The number of teachers per classroom.
+        tick_seconds (float): The simulated time covered by one tick.
+        now (float): The simulated time in seconds.
+        hand_raised (numpy.ndarray): (classroom, student) True where the student's hand is raised.
+        has_presented (numpy.ndarray): (classroom, student) True where the student has presented.
+        next_decision (numpy.ndarray): (classroom, student) time of the student's next decision.
+        teacher_free_at (numpy.ndarray): (classroom, teacher) time at which each teacher calls on
+            the next student; infinite once every student of the class has been called on.
+        hands_raised (int): The number of times a student raised their hand.
+        hands_lowered (int): The number of times a student lowered their hand.
+        presentations (int): The number of presentations given.
+    """
+    def __init__(self, classrooms=1, students=50, teachers=2, seed=None, tick_seconds=0.25):
+        """
+        Initializes a school where no student has raised their hand or presented yet.
+
+        Args:
+            classrooms (int): The number of classrooms.
+            students (int): The number of students per classroom.
+            teachers (int): The number of teachers per classroom.
+            seed (int or numpy.random.SeedSequence): Optional seed of the random decisions.
+            tick_seconds (float): The simulated time covered by one tick.
+        """
+        self.classrooms = classrooms
+        self.students = students
+        self.teachers = teachers
+        self.tick_seconds = tick_seconds
+        self.now = 0.0
+        self.rng = np.random.default_rng(seed)
+        shape = (classrooms, students)
+        self.hand_raised = np.zeros(shape, dtype=bool)
+        self.has_presented = np.zeros(shape, dtype=bool)
+        self.next_decision = np.zeros(shape)
+        self.teacher_free_at = np.zeros((classrooms, teachers))
+        self.hands_raised = 0
+        self.hands_lowered = 0
+        self.presentations = 0
+
+    def step(self):
+        """
+        Advances the school by one tick.
+        """
+        now = self.now
+
+        # Students due to decide roll to raise, then to lower, their hand.
+        rooms, seats = np.nonzero((self.next_decision <= now) & ~self.has_presented)
+        raising = self.rng.random(rooms.size) < RAISE_PROBABILITY
+        lowering = self.rng.random(rooms.size) < LOWER_PROBABILITY
+        self.hand_raised[rooms, seats] = (self.hand_raised[rooms, seats] | raising) & ~lowering
+        self.next_decision[rooms, seats] += self.rng.uniform(*DECISION_SECONDS, rooms.size)
+        self.hands_raised += int(raising.sum())
+        self.hands_lowered += int(lowering.sum())
+
+        # Free teachers call on a student: a random raised hand scores in [1, 2), any other
+        # student still to present in [0, 1), so the argmax follows the teachers' priority.
+        for teacher in range(self.teachers):
+            free = np.flatnonzero(self.teacher_free_at[:, teacher] <= now)
+            if not free.size:
+                continue
+            score = self.rng.random((free.size, self.students)) + self.hand_raised[free]
+            score[self.has_presented[free]] = -1
+            chosen = score.argmax(axis=1)
+            found = score[np.arange(free.size), chosen] >= 0
+            rooms, chosen = free[found], chosen[found]
+            self.has_presented[rooms, chosen] = True
+            self.hand_raised[rooms, chosen] = False
+            self.teacher_free_at[rooms, teacher] = now + PRESENTATION_SECONDS + PAUSE_SECONDS
+            self.teacher_free_at[free[~found], teacher] = np.inf
+            self.presentations += rooms.size
+
+        self.now = now + self.tick_seconds
+
+    def run(self, timeout=60):
+        """
+        Steps the school until `timeout` simulated seconds have passed or every student has presented.
+
+        Args:
+            timeout (float): The simulated time after which the classes stop.
+
+        Returns:
+            dict: The summary of the run (see `summary`).
+        """
+        start = time.perf_counter()
+        while self.now < timeout and np.isfinite(self.teacher_free_at).any():
+            self.step()
+        return self.summary(time.perf_counter() - start)
+
+    def counts(self):
+        """
+        Returns the number of raised hands, presented and not presented students of each classroom.
+
+        Returns:
+            tuple: Three arrays with one count per classroom.
+        """
+        presented = self.has_presented.sum(axis=1)
+        return self.hand_raised.sum(axis=1), presented, self.students - presented
+
+    def classroom(self, number):
+        """
+        Returns the students of one classroom as Student objects, for `print_report`.
+
+        Args:
+            number (int): The classroom, from 1.
+        """
+        from simulations.classroom.classroom_simulation import Student
+
+        students = []
+        for index in range(self.students):
+            student = Student(index + 1)
+            student.hand_raised = bool(self.hand_raised[number - 1, index])
+            student.has_presented = bool(self.has_presented[number - 1, index])
+            students.append(student)
+        return students
+
+    def summary(self, elapsed=None):
+        """
+        Returns the totals of the school and, if given, the wall-clock time of the run.
+        """
+        raised, presented, not_presented = self.counts()
+        summary = {
+            "classrooms": self.classrooms,
+            "students": self.classrooms * self.students,
+            "simulated_seconds": self.now,
+            "presented": int(presented.sum()),
+            "not_presented": int(not_presented.sum()),
+            "raised_hands": int(raised.sum()),
+            "events": self.hands_raised + self.hands_lowered + self.presentations,
+        }
+        if elapsed is not None:
+            summary["elapsed_seconds"] = elapsed
+        return summary
+
+
+def print_school_report(engine, detail=(), max_rows=20):
+    """
+    Prints the report of a school: the totals, the counts of every classroom, and the full
+    `print_report` of the chosen classrooms.
+
+    Args:
+        engine (SchoolEngine): The simulated school.
+        detail (list): The classrooms (from 1) whose students are listed.
+        max_rows (int): The number of classrooms shown before the table is truncated.
+    """
+    import pandas as pd
+
+    from simulations.classroom.classroom_simulation import print_report
+
+    raised, presented, not_presented = engine.counts()
+    report_df = pd.DataFrame({
+        'Classroom': np.arange(1, engine.classrooms + 1),
+        'Raised Hands': raised,
+        'Presented': presented,
+        'Not Presented': not_presented,
+    })
+    totals = report_df.drop(columns='Classroom').agg(['sum', 'mean', 'min', 'max'])
+
+    print("\nSchool Report:")
+    print(f"{engine.classrooms} classrooms of {engine.students} students and {engine.teachers} teachers, "
+          f"{engine.now:g} simulated seconds.")
+    print(totals.to_string(float_format=lambda value: f"{value:.2f}"))
+    print("\nPer Classroom:")
+    print(report_df.to_string(index=False, max_rows=max_rows))
+    for number in detail:
+        print(f"\nClassroom {number}:", end="")
+        print_report(engine.classroom(number))
@@ -0,0 +1,183 @@
+"""
+The command line of the simulations: `python -m simulations <command> [options]`.
+
+Each simulation is a subcommand with its own parameters, and the tools (replication,
+benchmark, instrumentation, room inventory, checkpoints, sweeps, queueing estimates,
+comparisons, live metrics, signal timing, road networks) are subcommands that pass their
+arguments on. Only the module of the chosen command is imported, after the arguments are
+parsed, so the command line starts without loading NumPy, pandas or any simulation.
+
+Example:
+    python -m simulations hotel --mode event --guests 1000 --seed 1
+    python -m simulations traffic --mode vectorized --cars 10000 --grid 100
+    python -m simulations classroom --mode batched --classrooms 2000 --students 100
+    python -m simulations replicate hotel -n 200
+    python -m simulations hotel --guests 400 --time-scale 0.01 --profile profile
+"""
+import argparse
+import importlib
+import sys
+
+# Tool commands -> the module whose main(argv) they run
+TOOLS = {
+    "replicate": ("simulations.replication", "Run seeded replications of a simulation in parallel."),
+    "benchmark": ("simulations.benchmark", "Benchmark the throughput and scaling of the simulations."),
+    "instrument": ("simulations.instrumentation", "Measure lock contention and resource utilization."),
+    "inventory": ("simulations.hotel.inventory", "Book calendar nights in a room inventory and forecast occupancy."),
+    "checkpoint": ("simulations.checkpoint", "Run the hotel or traffic simulation with checkpoints."),
+    "sweep": ("simulations.sweep", "Sweep the hotel's staffing and capacities with cached results."),
+    "queueing": ("simulations.queueing", "Estimate waits and utilizations in closed form."),
+    "compare": ("simulations.variance", "Compare configurations with common random numbers and variance reduction."),
+    "metrics": ("simulations.metrics", "Sample live metrics of a simulation and serve them over HTTP."),
+    "signals": ("simulations.traffic.signal_timing", "Optimize fixed-time plans of the traffic lights."),
+    "network": ("simulations.traffic.road_network", "Import a road network and cache its routing table."),
+}
+
+
+# Simulations
+def add_hotel_arguments(parser):
+    parser.add_argument("--mode", choices=["threaded", "event", "stream"], default="threaded",
+                        help="threaded sleeps in real time; event runs on a virtual clock; stream runs on a "
+                             "virtual clock with guests arriving from a stream and kept only during their stay.")
+    parser.add_argument("--guests", type=int, default=400, help="The number of guests to simulate; the maximum number of arrivals in stream mode.")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplier applied to every service time (threaded mode only).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the guests' random streams.")
+    parser.add_argument("--arrival-rate", type=float, default=None,
+                        help="Guests arriving per second as a Poisson process (event and stream modes); "
+                             "by default all guests arrive at once, or one per second in stream mode.")
+    parser.add_argument("--seasonality", type=_parse_seasonality, action="append", default=[],
+                        metavar="AMPLITUDE:PERIOD",
+                        help="A sinusoidal cycle of the arrival rate, e.g. 0.5:86400 (stream mode only; repeatable).")
+    parser.add_argument("--arrivals", default=None, metavar="FILE",
+                        help="Replay the arrival times of a text, CSV or .npy file (stream mode only).")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Virtual seconds after which no more guests arrive (stream mode only).")
+    parser.add_argument("--inventory", type=int, default=None, metavar="ROOMS",
+                        help="Book calendar nights in a room inventory of this many rooms, which get their "
+                             "rooms back at checkout; by default the 33 rooms are assigned for good.")
+    parser.add_argument("--night-seconds", type=float, default=86400.0,
+                        help="Virtual seconds per calendar night of the room inventory (event and stream modes).")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Write the binary event trace to this directory.")
+    parser.add_argument("--npz", default=None, metavar="FILE",
+                        help="Also save the event trace as a compressed .npz file.")
+    parser.add_argument("--log", action="store_true",
+                        help="Log every guest event, rendered from the trace after the run.")
+
+
+def add_office_arguments(parser):
+    parser.add_argument("--employees", type=int, default=5, help="The number of employees to simulate.")
+    parser.add_argument("--mode", choices=["threaded", "asyncio"], default="threaded",
+                        help="threaded runs one thread per employee; asyncio runs one coroutine per employee.")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Wall-clock seconds per simulated hour.")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Maximum number of employees working at once (asyncio mode only).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the employees' tasks and times.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print each employee's progress.")
+    parser.add_argument("--table", action="store_true", help="Also print the per-employee report as a pandas table.")
+
+
+def add_classroom_arguments(parser):
+    parser.add_argument("--mode", choices=["threaded", "batched"], default="threaded",
+                        help="threaded runs one thread per student and teacher; batched simulates whole "
+                             "schools with NumPy arrays on a virtual clock.")
+    parser.add_argument("--students", type=int, default=50, help="The number of students in each class.")
+    parser.add_argument("--teachers", type=int, default=2, help="The number of teachers of each class.")
+    parser.add_argument("--classrooms", type=int, default=1, help="The number of classrooms (batched mode only).")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds after which the simulation stops.")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplier applied to every duration (threaded mode only).")
+    parser.add_argument("--detail", type=int, action="append", default=[], metavar="CLASSROOM",
+                        help="Also list the students of this classroom, from 1 (batched mode only; repeatable).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the students' and teachers' random streams.")
+
+
+def add_traffic_arguments(parser):
+    parser.add_argument("--mode", choices=["threaded", "vectorized", "tiled"], default="threaded",
+                        help="threaded runs one thread per car and light; vectorized steps NumPy arrays; "
+                             "tiled splits the vectorized grid between processes.")
+    parser.add_argument("--cars", type=int, default=2, help="The number of cars to simulate.")
+    parser.add_argument("--grid", type=int, default=None,
+                        help="Squares per side of the grid (vectorized and tiled modes only).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the cars' and lights' random decisions.")
+    parser.add_argument("--ticks", type=int, default=None, help="Maximum ticks (vectorized and tiled modes only).")
+    parser.add_argument("--tiles", type=_parse_tiles, default=None, metavar="COLUMNSxROWS",
+                        help="Layout of the tiles, one process each (tiled mode only); defaults to one per CPU.")
+    parser.add_argument("--plan", default=None, metavar="FILE",
+                        help="Run the lights on the fixed-time plan in this JSON file, as written by the "
+                             "signals command (vectorized and tiled modes only).")
+    parser.add_argument("--destinations", type=int, default=None, metavar="COUNT",
+                        help="Route every car along shortest paths to one of this many intersections, picked "
+                             "at random, instead of turning at random (vectorized mode only).")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplier applied to driving times and light phases (threaded mode only).")
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="Profile the run: time the stages of the simulation, trace memory allocations "
+                             "and write the report and flame-graph folded stacks to this directory.")
+    parser.add_argument("--profile-sample", type=float, default=None, metavar="SECONDS",
+                        help="Also sample the stacks of all threads at this interval (with --profile).")
+    parser.add_argument("--profile-cprofile", action="store_true",
+                        help="Also run cProfile in every thread (with --profile).")
+    parser.add_argument("--profile-frames", type=int, default=8,
+                        help="Frames kept per traced allocation; 0 does not trace memory (with --profile).")
+
+
+def _parse_seasonality(text):
+    amplitude, _, period = text.partition(":")
+    return float(amplitude), float(period)
+
+
+def _parse_tiles(text):
+    columns, _, rows = text.lower().partition("x")
+    return int(columns), int(rows or 1)
+
+
+# Simulation commands -> (module with run_command(args), argument builder, description)
+SIMULATIONS = {
+    "hotel": ("simulations.hotel.hotel_simulation", add_hotel_arguments, "Hotel guest simulation."),
+    "office": ("simulations.office.office_simulation", add_office_arguments, "Busy office simulation."),
+    "classroom": ("simulations.classroom.classroom_simulation", add_classroom_arguments, "Classroom simulation."),
+    "traffic": ("simulations.traffic.traffic_simulation", add_traffic_arguments,
+                "Traffic simulation on a grid of traffic lights."),
+}
+
+
+def build_parser():
+    """
+    Builds the parser of the command line, with one subcommand per simulation and tool.
+    """
+    parser = argparse.ArgumentParser(prog="simulations", description="Simulations & Modeling.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for name, (_, add_arguments, description) in SIMULATIONS.items():
+        subparser = commands.add_parser(name, help=description, description=description)
+        add_arguments(subparser)
+        add_profile_arguments(subparser)
+    for name, (_, description) in TOOLS.items():
+        commands.add_parser(name, help=description, description=description)
+    return parser
+
+
+def main(argv=None):
+    """
+    Parses the command line and runs the chosen simulation or tool.
+
+    Args:
+        argv (list): The arguments; defaults to sys.argv[1:].
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in TOOLS:
+        # Tools parse their own arguments, including --help, under the name of the command.
+        sys.argv[0] = f"simulations {argv[0]}"
+        module = importlib.import_module(TOOLS[argv[0]][0])
+        return module.main(argv[1:])
+    args = build_parser().parse_args(argv)
+    module = importlib.import_module(SIMULATIONS[args.command][0])
+    if args.profile is not None:
+        from simulations.profiling import run_profiled
+
+        return run_profiled(module, args)
+    return module.run_command(args)
@@ -0,0 +1,23 @@
+"""
+The hotel guest simulation, threaded or on a virtual clock.
+"""
+from simulations import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "Guest": "hotel_simulation",
+    "run_threaded": "hotel_simulation",
+    "run_discrete_event": "hotel_simulation",
+    "make_event_simulation": "hotel_simulation",
+    "CAPACITIES": "hotel_simulation",
+    "HotelEventSimulation": "event_simulation",
+    "StreamingHotelSimulation": "streaming",
+    "GuestTable": "streaming",
+    "StayLog": "streaming",
+    "poisson_arrivals": "streaming",
+    "trace_arrivals": "streaming",
+    "load_stays": "streaming",
+    "RoomInventory": "inventory",
+    "EventTrace": "event_trace",
+    "load_trace": "event_trace",
+    "ResourcePool": "resource_pool",
+})
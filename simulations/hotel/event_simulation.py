@@ -0,0 +1,493 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+from simulations.hotel import event_trace as trace
+from simulations.hotel.inventory import RoomInventory, book_stay
+
+# Event Codes
+ARRIVAL = 0
+RESERVATION_START = 1
+RESERVATION_DONE = 2
+CHECKIN_START = 3
+CHECKIN_DONE = 4
+LUGGAGE_START = 5
+LUGGAGE_DONE = 6
+ACTIVITY_START = 7
+ACTIVITY_DONE = 8
+CHECKOUT_START = 9
+CHECKOUT_DONE = 10
+
+# Activity Codes
+RESTAURANT = 1
+BAR = 2
+ROOM_SERVICE = 3
+HOUSEKEEPING = 4
+
+# Stages in which guests wait, and the grant events that end their waits
+WAIT_STAGES = ("reservation", "checkin", "luggage", "activity", "checkout")
+_GRANT_STAGES = {
+    RESERVATION_START: "reservation",
+    CHECKIN_START: "checkin",
+    LUGGAGE_START: "luggage",
+    CHECKOUT_START: "checkout",
+}
+
+# Staff and desks whose busy time is accounted
+STAFF = ("receptionists", "bellhops", "housekeepers", "checkout_desk")
+
+# Guest attributes saved in the simulation state, with their column types
+GUEST_COLUMNS = {
+    "index": np.int64,
+    "guest_id": str,
+    "guest_name": str,
+    "has_luggage": bool,
+    "luggage_handled": bool,
+    "room_number": str,
+    "room_service_order": str,
+    "checkin_time": np.float64,
+    "checkout_time": np.float64,
+    "time_in_hotel": np.float64,
+}
+
+
+class EventResource:
+    """
+    Represents a counted resource (staff or seats) in the discrete-event simulation.
+
+    Guests that cannot be served immediately wait in a FIFO queue and are granted the
+    resource, in arrival order, as soon as a unit is released.
+
+    Attributes:
+        name (str): The name of the resource.
+        capacity (int): The number of units of the resource.
+        in_use (int): The number of units currently held by guests.
+        queue (collections.deque): Waiting guests as (guest index, grant event) pairs.
+    """
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.in_use = 0
+        self.queue = deque()
+
+    @property
+    def available(self):
+        return self.capacity - self.in_use
+
+    def __repr__(self):
+        return f"{self.name}: {self.in_use}/{self.capacity} in use, {len(self.queue)} waiting"
+
+
+class HotelEventSimulation:
+    """
+    Simulates the hotel with a virtual clock and an event heap instead of threads and sleeps.
+
+    Every stage of a guest's stay (reservation, check-in, luggage handling, activities and
+    checkout) is a scheduled event. Service times are drawn from the same distributions as
+    in the threaded simulation, but time only advances when the next event is popped from
+    the heap, so a run completes as fast as the events can be processed. Each guest draws
+    its service times and decisions from its own `rng`, so with seeded per-guest streams a
+    guest's draws do not depend on the other guests.
+
+    Attributes:
+        guests (list): The Guest objects being simulated.
+        now (float): The current virtual time, in seconds.
+        available_rooms (list): Room numbers that have not been assigned yet (without an inventory).
+        inventory (RoomInventory): The bookings of the rooms over calendar nights, or None.
+        night_seconds (float): The virtual seconds per calendar night of the inventory.
+        receptionists (EventResource): The reception desk staff.
+        bellhops (EventResource): The bellhops handling luggage.
+        housekeepers (EventResource): The housekeepers serving room service and housekeeping.
+        checkout_desk (EventResource): The checkout desk, which serves one guest at a time.
+        bar_capacity (int): The maximum number of guests at the bar.
+        restaurant_capacity (int): The maximum number of guests at the restaurant.
+        events_processed (int): The number of events handled so far.
+        stage_waits (dict): The total virtual time guests have waited in each of WAIT_STAGES: queued
+            for staff or the checkout desk, or retrying an activity while all housekeepers are busy.
+        busy_time (dict): The total service time given by each of STAFF, for utilization.
+        trace (EventTrace): The trace guest events are recorded in, or None.
+    """
+    def __init__(self, guests, rooms, receptionists=6, bellhops=5, housekeepers=15,
+                 bar_capacity=50, restaurant_capacity=150, trace=None, arrival_rate=None, inventory=None,
+                 night_seconds=86400.0):
+        """
+        Initializes the simulation and schedules the arrival of every guest.
+
+        Guests all arrive at time zero, as in the threaded simulation, unless an arrival rate is
+        given: they then arrive one by one as a Poisson process, each drawing the gap since the
+        previous guest from its own random stream.
+
+        Without an inventory, checked-in guests keep a room of `rooms` for good. With one, each
+        guest books a room type for a number of nights at the end of the reservation stage,
+        gets the booked room at check-in, and the room is free again from the night of checkout.
+
+        Args:
+            guests (list): The Guest objects to simulate.
+            rooms (list): The room numbers available for check-in; popped from the end.
+            receptionists (int): The number of receptionists.
+            bellhops (int): The number of bellhops.
+            housekeepers (int): The number of housekeepers.
+            bar_capacity (int): The maximum number of guests at the bar.
+            restaurant_capacity (int): The maximum number of guests at the restaurant.
+            trace (EventTrace): Optional trace to record guest events in, stamped with the virtual time.
+            arrival_rate (float): Optional mean number of guests arriving per second of virtual time.
+            inventory (RoomInventory): Optional room inventory to book the guests' nights in.
+            night_seconds (float): The virtual seconds per calendar night of the inventory.
+        """
+        self.guests = guests
+        self.now = 0.0
+        self.available_rooms = list(rooms)
+        self.inventory = inventory
+        self.night_seconds = night_seconds
+        self.receptionists = EventResource("receptionists", receptionists)
+        self.bellhops = EventResource("bellhops", bellhops)
+        self.housekeepers = EventResource("housekeepers", housekeepers)
+        self.checkout_desk = EventResource("checkout desk", 1)
+        self.bar_capacity = bar_capacity
+        self.guests_at_bar = 0
+        self.restaurant_capacity = restaurant_capacity
+        self.guests_at_restaurant = 0
+        self.events_processed = 0
+        self.stage_waits = dict.fromkeys(WAIT_STAGES, 0.0)
+        self.busy_time = dict.fromkeys(STAFF, 0.0)
+        self.trace = trace
+
+        self._heap = []
+        self._sequence = 0
+        self._activity = [0] * len(guests)
+        self._waiting_since = [0.0] * len(guests)
+        self._handlers = {
+            ARRIVAL: self._on_arrival,
+            RESERVATION_START: self._on_reservation_start,
+            RESERVATION_DONE: self._on_reservation_done,
+            CHECKIN_START: self._on_checkin_start,
+            CHECKIN_DONE: self._on_checkin_done,
+            LUGGAGE_START: self._on_luggage_start,
+            LUGGAGE_DONE: self._on_luggage_done,
+            ACTIVITY_START: self._on_activity_start,
+            ACTIVITY_DONE: self._on_activity_done,
+            CHECKOUT_START: self._on_checkout_start,
+            CHECKOUT_DONE: self._on_checkout_done,
+        }
+
+        arrival = 0.0
+        for index, guest in enumerate(guests):
+            if arrival_rate is not None:
+                arrival += guest.rng.expovariate(arrival_rate)
+            self.schedule(arrival, ARRIVAL, index)
+
+    @property
+    def pending_events(self):
+        """
+        int: The number of events scheduled but not processed yet.
+        """
+        return len(self._heap)
+
+    def schedule(self, delay, event, index):
+        """
+        Schedules an event for a guest after a delay of virtual time.
+
+        Events scheduled for the same time are handled in the order they were scheduled.
+
+        Args:
+            delay (float): The virtual time, in seconds, until the event happens.
+            event (int): The event code.
+            index (int): The index of the guest in the guests list.
+        """
+        heapq.heappush(self._heap, (self.now + delay, self._sequence, event, index))
+        self._sequence += 1
+
+    def run(self, until=None):
+        """
+        Processes events in time order until the heap is empty or the virtual clock passes `until`.
+
+        Args:
+            until (float): Optional virtual time at which to stop the simulation.
+
+        Returns:
+            list: The simulated Guest objects.
+        """
+        heap = self._heap
+        handlers = self._handlers
+        while heap:
+            if until is not None and heap[0][0] > until:
+                self.now = until
+                break
+            self.now, _, event, index = heapq.heappop(heap)
+            handlers[event](index)
+            self.events_processed += 1
+        return self.guests
+
+    def resize(self, resource, capacity):
+        """
+        Changes the capacity of a resource, serving waiting guests at once if it grows.
+
+        Args:
+            resource (str): "receptionists", "bellhops", "housekeepers", "checkout_desk", "bar" or "restaurant".
+            capacity (int): The new capacity.
+        """
+        if resource == "bar":
+            self.bar_capacity = capacity
+            return
+        if resource == "restaurant":
+            self.restaurant_capacity = capacity
+            return
+        pool = getattr(self, resource)
+        pool.capacity = capacity
+        while pool.queue and pool.in_use < pool.capacity:
+            pool.in_use += 1
+            self._grant_next(pool)
+
+    # State
+    def get_state(self):
+        """
+        Returns the full state of the simulation as arrays and scalars, for checkpointing.
+
+        The event heap, the resource queues and the guest attributes are stored as columns.
+        The guests' random streams are returned as they are, under "rngs", to be saved by the caller.
+
+        Returns:
+            dict: Maps names to numpy arrays, numbers, or the list of guest random streams.
+        """
+        heap = self._heap
+        state = {
+            "now": self.now,
+            "sequence": self._sequence,
+            "events_processed": self.events_processed,
+            "bar_capacity": self.bar_capacity,
+            "guests_at_bar": self.guests_at_bar,
+            "restaurant_capacity": self.restaurant_capacity,
+            "guests_at_restaurant": self.guests_at_restaurant,
+            "heap_time": np.array([entry[0] for entry in heap], dtype=np.float64),
+            "heap_sequence": np.array([entry[1] for entry in heap], dtype=np.int64),
+            "heap_event": np.array([entry[2] for entry in heap], dtype=np.int8),
+            "heap_index": np.array([entry[3] for entry in heap], dtype=np.int64),
+            "activity": np.array(self._activity, dtype=np.int8),
+            "waiting_since": np.array(self._waiting_since, dtype=np.float64),
+            "available_rooms": np.array(self.available_rooms, dtype=str),
+            "rngs": [guest.rng for guest in self.guests],
+        }
+        for stage, wait in self.stage_waits.items():
+            state[f"wait_{stage}"] = wait
+        for name, busy in self.busy_time.items():
+            state[f"busy_{name}"] = busy
+        for name in ("receptionists", "bellhops", "housekeepers", "checkout_desk"):
+            pool = getattr(self, name)
+            state[f"{name}_capacity"] = pool.capacity
+            state[f"{name}_in_use"] = pool.in_use
+            state[f"{name}_queue_index"] = np.array([entry[0] for entry in pool.queue], dtype=np.int64)
+            state[f"{name}_queue_event"] = np.array([entry[1] for entry in pool.queue], dtype=np.int8)
+        for column, dtype in GUEST_COLUMNS.items():
+            values = [getattr(guest, column) for guest in self.guests]
+            if dtype is str:
+                values = ["" if value is None else value for value in values]
+            state[f"guest_{column}"] = np.array(values, dtype=dtype)
+        if self.inventory is not None:
+            state["night_seconds"] = self.night_seconds
+            state["guest_booking"] = np.array([-1 if guest.booking is None else guest.booking
+                                               for guest in self.guests], dtype=np.int64)
+            for name, value in self.inventory.get_state().items():
+                state[f"inventory_{name}"] = value
+        return state
+
+    def set_state(self, state):
+        """
+        Replaces the state of the simulation, including the attributes of its guests, by one from `get_state`.
+
+        The guests must be the same number of Guest objects, with their random streams already restored.
+        """
+        self.now = float(state["now"])
+        self._sequence = int(state["sequence"])
+        self.events_processed = int(state["events_processed"])
+        self.bar_capacity = int(state["bar_capacity"])
+        self.guests_at_bar = int(state["guests_at_bar"])
+        self.restaurant_capacity = int(state["restaurant_capacity"])
+        self.guests_at_restaurant = int(state["guests_at_restaurant"])
+        self._heap = list(zip(state["heap_time"].tolist(), state["heap_sequence"].tolist(),
+                              state["heap_event"].tolist(), state["heap_index"].tolist()))
+        self._activity = state["activity"].tolist()
+        # Checkpoints written before wait accounting existed restart it from zero
+        if "waiting_since" in state:
+            self._waiting_since = state["waiting_since"].tolist()
+        self.stage_waits = {stage: float(state.get(f"wait_{stage}", 0.0)) for stage in WAIT_STAGES}
+        self.busy_time = {name: float(state.get(f"busy_{name}", 0.0)) for name in STAFF}
+        self.available_rooms = state["available_rooms"].tolist()
+        for name in ("receptionists", "bellhops", "housekeepers", "checkout_desk"):
+            pool = getattr(self, name)
+            pool.capacity = int(state[f"{name}_capacity"])
+            pool.in_use = int(state[f"{name}_in_use"])
+            pool.queue = deque(zip(state[f"{name}_queue_index"].tolist(), state[f"{name}_queue_event"].tolist()))
+        for column, dtype in GUEST_COLUMNS.items():
+            values = state[f"guest_{column}"].tolist()
+            if dtype is str and column in ("room_number", "room_service_order"):
+                values = [value or None for value in values]
+            for guest, value in zip(self.guests, values):
+                setattr(guest, column, value)
+        # Checkpoints of simulations without an inventory have no bookings
+        if "inventory_numbers" in state:
+            saved = {name[len("inventory_"):]: value for name, value in state.items() if name.startswith("inventory_")}
+            self.inventory = RoomInventory.from_state(saved)
+            self.night_seconds = float(state["night_seconds"])
+            for guest, booking in zip(self.guests, state["guest_booking"].tolist()):
+                guest.booking = None if booking < 0 else booking
+
+    def _record(self, index, stage, resource, code, value=0):
+        if self.trace is not None:
+            self.trace.record(self.guests[index].index, stage, resource, code, value, self.now)
+
+    # Resources
+    def _request(self, resource, index, grant_event):
+        if resource.in_use < resource.capacity:
+            resource.in_use += 1
+            self.schedule(0.0, grant_event, index)
+        else:
+            self._waiting_since[index] = self.now
+            resource.queue.append((index, grant_event))
+
+    def _release(self, resource):
+        if resource.queue:
+            self._grant_next(resource)
+        else:
+            resource.in_use -= 1
+
+    def _grant_next(self, resource):
+        index, grant_event = resource.queue.popleft()
+        self.stage_waits[_GRANT_STAGES[grant_event]] += self.now - self._waiting_since[index]
+        self.schedule(0.0, grant_event, index)
+
+    # Reservation
+    def _on_arrival(self, index):
+        if self.receptionists.in_use == self.receptionists.capacity:
+            self._record(index, trace.RESERVATION, trace.RECEPTIONIST, trace.WAITING)
+        self._request(self.receptionists, index, RESERVATION_START)
+
+    def _serve(self, staff, duration, event, index):
+        self.busy_time[staff] += duration
+        self.schedule(duration, event, index)
+
+    def _on_reservation_start(self, index):
+        self._serve("receptionists", self.guests[index].rng.uniform(0.1, 0.2), RESERVATION_DONE, index)
+
+    def _on_reservation_done(self, index):
+        self._record(index, trace.RESERVATION, trace.RECEPTIONIST, trace.FINISHED)
+        if self.inventory is not None:
+            self._book(index)
+        self._release(self.receptionists)
+        if self.receptionists.in_use == self.receptionists.capacity:
+            self._record(index, trace.CHECKIN, trace.RECEPTIONIST, trace.WAITING)
+        self._request(self.receptionists, index, CHECKIN_START)
+
+    def _book(self, index):
+        guest = self.guests[index]
+        guest.booking = book_stay(self.inventory, guest.rng, int(self.now // self.night_seconds))
+
+    # Check-in
+    def _on_checkin_start(self, index):
+        self._serve("receptionists", self.guests[index].rng.uniform(0.1, 0.3), CHECKIN_DONE, index)
+
+    def _on_checkin_done(self, index):
+        guest = self.guests[index]
+        if self.inventory is not None:
+            room = None if guest.booking is None else self.inventory.room_number(guest.booking)
+        else:
+            room = self.available_rooms.pop() if self.available_rooms else None
+        if room is not None:
+            guest.room_number = room
+            self._record(index, trace.CHECKIN, trace.ROOM, trace.FINISHED, int(guest.room_number))
+            guest.checkin_time = self.now
+        else:
+            self._record(index, trace.CHECKIN, trace.ROOM, trace.UNAVAILABLE)
+        self._release(self.receptionists)
+        if self.bellhops.in_use == self.bellhops.capacity:
+            self._record(index, trace.LUGGAGE, trace.BELLHOP, trace.WAITING)
+        self._request(self.bellhops, index, LUGGAGE_START)
+
+    # Luggage Handling
+    def _on_luggage_start(self, index):
+        guest = self.guests[index]
+        if guest.has_luggage:
+            self._serve("bellhops", guest.rng.uniform(0.1, 0.5), LUGGAGE_DONE, index)
+        else:
+            self._record(index, trace.LUGGAGE, trace.NO_RESOURCE, trace.SKIPPED)
+            guest.luggage_handled = False
+            self.schedule(0.0, LUGGAGE_DONE, index)
+
+    def _on_luggage_done(self, index):
+        guest = self.guests[index]
+        if guest.has_luggage:
+            self._record(index, trace.LUGGAGE, trace.BELLHOP, trace.FINISHED)
+            guest.luggage_handled = True
+        self._release(self.bellhops)
+        self._on_activity_start(index)
+
+    # Guest Activity
+    def _on_activity_start(self, index):
+        guest = self.guests[index]
+        while True:
+            option = guest.rng.randint(1, 4)
+            if option == RESTAURANT:
+                if self.guests_at_restaurant < self.restaurant_capacity:
+                    self.guests_at_restaurant += 1
+                    self._record(index, trace.RESTAURANT, trace.RESTAURANT_SEAT, trace.STARTED)
+                    break
+                self._record(index, trace.RESTAURANT, trace.RESTAURANT_SEAT, trace.UNAVAILABLE)
+            elif option == BAR:
+                if self.guests_at_bar < self.bar_capacity:
+                    self.guests_at_bar += 1
+                    self._record(index, trace.BAR, trace.BAR_SEAT, trace.STARTED)
+                    break
+                self._record(index, trace.BAR, trace.BAR_SEAT, trace.UNAVAILABLE)
+            else:
+                if self.housekeepers.in_use < self.housekeepers.capacity:
+                    self.housekeepers.in_use += 1
+                    if option == ROOM_SERVICE:
+                        guest.room_service_order = guest.rng.choice(trace.ROOM_SERVICE_ORDERS)
+                        self._record(index, trace.ROOM_SERVICE, trace.HOUSEKEEPER, trace.STARTED,
+                                     trace.ROOM_SERVICE_ORDERS.index(guest.room_service_order))
+                    else:
+                        self._record(index, trace.HOUSEKEEPING, trace.HOUSEKEEPER, trace.STARTED)
+                    break
+                if option == ROOM_SERVICE:
+                    self._record(index, trace.ROOM_SERVICE, trace.HOUSEKEEPER, trace.WAITING)
+                else:
+                    self._record(index, trace.HOUSEKEEPING, trace.HOUSEKEEPER, trace.WAITING)
+                retry = guest.rng.uniform(0.1, 0.3)
+                self.stage_waits["activity"] += retry
+                self.schedule(retry, ACTIVITY_START, index)
+                return
+        self._activity[index] = option
+        duration = guest.rng.uniform(0.1, 0.5)
+        if option in (ROOM_SERVICE, HOUSEKEEPING):
+            self.busy_time["housekeepers"] += duration
+        self.schedule(duration, ACTIVITY_DONE, index)
+
+    def _on_activity_done(self, index):
+        option = self._activity[index]
+        if option == RESTAURANT:
+            self.guests_at_restaurant -= 1
+        elif option == BAR:
+            self.guests_at_bar -= 1
+        else:
+            self._release(self.housekeepers)
+        self._request(self.checkout_desk, index, CHECKOUT_START)
+
+    # Checkout
+    def _on_checkout_start(self, index):
+        guest = self.guests[index]
+        self._record(index, trace.CHECKOUT, trace.CHECKOUT_DESK, trace.STARTED)
+        if guest.luggage_handled:
+            self._serve("checkout_desk", guest.rng.uniform(0.1, 0.5), CHECKOUT_DONE, index)
+        else:
+            self.schedule(0.0, CHECKOUT_DONE, index)
+
+    def _on_checkout_done(self, index):
+        guest = self.guests[index]
+        if guest.luggage_handled:
+            self._record(index, trace.CHECKOUT, trace.BELLHOP, trace.FINISHED)
+        guest.checkout_time = self.now
+        guest.time_in_hotel = guest.checkout_time - guest.checkin_time
+        if self.inventory is not None and guest.booking is not None:
+            self.inventory.release(guest.booking, int(self.now // self.night_seconds))
+            guest.booking = None
+        self._release(self.checkout_desk)
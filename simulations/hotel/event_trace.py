@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Stages
+RESERVATION = 0
+CHECKIN = 1
+LUGGAGE = 2
+RESTAURANT = 3
+BAR = 4
+ROOM_SERVICE = 5
+HOUSEKEEPING = 6
+CHECKOUT = 7
+STAGES = ["reservation", "check-in", "luggage", "restaurant", "bar", "room service", "housekeeping", "checkout"]
+
+# Resources
+NO_RESOURCE = 0
+RECEPTIONIST = 1
+BELLHOP = 2
+ROOM = 3
+RESTAURANT_SEAT = 4
+BAR_SEAT = 5
+HOUSEKEEPER = 6
+CHECKOUT_DESK = 7
+RESOURCES = ["none", "receptionist", "bellhop", "room", "restaurant seat", "bar seat", "housekeeper", "checkout desk"]
+
+# Event Codes
+WAITING = 0
+STARTED = 1
+FINISHED = 2
+UNAVAILABLE = 3
+SKIPPED = 4
+CODES = ["waiting", "started", "finished", "unavailable", "skipped"]
+
+ROOM_SERVICE_ORDERS = ['breakfast', 'cleaning', 'laundry']
+
+# Trace Columns
+COLUMNS = {
+    "timestamp": np.float64,
+    "guest": np.uint32,
+    "stage": np.uint8,
+    "resource": np.uint8,
+    "code": np.uint8,
+    "value": np.int32,
+}
+
+# Log Messages (the human-readable view of each (stage, resource, code) event)
+MESSAGES = {
+    (RESERVATION, RECEPTIONIST, WAITING): "No receptionist available! {guest} is waiting for a receptionist.",
+    (RESERVATION, RECEPTIONIST, FINISHED): "{guest}: has reserved the room.",
+    (CHECKIN, RECEPTIONIST, WAITING): "No receptionist available! {guest} is waiting for a receptionist.",
+    (CHECKIN, ROOM, FINISHED): "{guest}: has checked in, The room number is {value}.",
+    (CHECKIN, ROOM, UNAVAILABLE): "No rooms available for {guest}!",
+    (LUGGAGE, BELLHOP, WAITING): "No bellhops available! {guest} is waiting for a bellhop.",
+    (LUGGAGE, BELLHOP, FINISHED): "{guest}: Bellhop is carrying out the luggage.",
+    (LUGGAGE, NO_RESOURCE, SKIPPED): "{guest}: has no luggage.",
+    (RESTAURANT, RESTAURANT_SEAT, STARTED): "{guest}: has entered the restaurant.",
+    (RESTAURANT, RESTAURANT_SEAT, UNAVAILABLE): "Restaurant is full! {guest} is waiting or choosing another option.",
+    (BAR, BAR_SEAT, STARTED): "{guest}: has entered the bar.",
+    (BAR, BAR_SEAT, UNAVAILABLE): "Bar is full! {guest} is waiting or choosing another option.",
+    (ROOM_SERVICE, HOUSEKEEPER, STARTED): "{guest}: has ordered room service.",
+    (ROOM_SERVICE, HOUSEKEEPER, WAITING): "{guest}: is waiting for a housekeeper to be available.",
+    (HOUSEKEEPING, HOUSEKEEPER, STARTED): "{guest}: requested housekeeping.",
+    (HOUSEKEEPING, HOUSEKEEPER, WAITING): "{guest}: waiting for housekeeper to be available.",
+    (CHECKOUT, CHECKOUT_DESK, STARTED): "{guest}: is checking out.",
+    (CHECKOUT, BELLHOP, FINISHED): "{guest}: Bellhop is carrying out the luggage.",
+}
+
+
+class EventTrace:
+    """
+    Low-overhead recorder of guest events, stored as columns in a preallocated ring buffer.
+
+    Recording an event only writes six numbers into the ring buffer under a short lock: no
+    string formatting or I/O happens on the caller's thread. A background writer thread
+    drains the buffer in bulk, appending each column to `<path>/<column>.bin` (or keeping the
+    drained chunks in memory when no path is given). If producers get a full buffer ahead of
+    the writer, they wait for it to drain rather than dropping events.
+
+    Attributes:
+        capacity (int): The number of events the ring buffer holds.
+        path (str): The trace directory, or None to keep the trace in memory.
+        recorded (int): The number of events recorded so far.
+    """
+    def __init__(self, path=None, capacity=1 << 16, flush_interval=0.5):
+        """
+        Initializes the ring buffer and starts the writer thread.
+
+        Args:
+            path (str): Optional directory to write the trace to; created if needed, existing columns are replaced.
+            capacity (int): The number of events the ring buffer holds.
+            flush_interval (float): The maximum seconds between two flushes.
+        """
+        self.capacity = capacity
+        self.path = path
+        self.flush_interval = flush_interval
+        self._columns = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self._timestamp = self._columns["timestamp"]
+        self._guest = self._columns["guest"]
+        self._stage = self._columns["stage"]
+        self._resource = self._columns["resource"]
+        self._code = self._columns["code"]
+        self._value = self._columns["value"]
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._closed = False
+        self.recorded = 0
+        self._flushed = 0
+        self._chunks = []
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for name in COLUMNS:
+                open(os.path.join(path, f"{name}.bin"), "wb").close()
+        self._writer = threading.Thread(target=self._write_loop, name="event-trace-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, guest, stage, resource, code, value=0, timestamp=None):
+        """
+        Appends one event to the trace.
+
+        Args:
+            guest (int): The index of the guest.
+            stage (int): The stage code (RESERVATION, CHECKIN, ...).
+            resource (int): The resource code (RECEPTIONIST, BELLHOP, ...).
+            code (int): The event code (WAITING, STARTED, ...).
+            value (int): An optional number attached to the event, e.g. the room number.
+            timestamp (float): The time of the event; defaults to the wall clock.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            while self.recorded - self._flushed >= self.capacity:
+                self._wake.set()
+                self._space.wait()
+            slot = self.recorded % self.capacity
+            self._timestamp[slot] = timestamp
+            self._guest[slot] = guest
+            self._stage[slot] = stage
+            self._resource[slot] = resource
+            self._code[slot] = code
+            self._value[slot] = value
+            self.recorded += 1
+            if self.recorded - self._flushed >= self.capacity // 2:
+                self._wake.set()
+
+    def _drain(self):
+        with self._lock:
+            start, end = self._flushed, self.recorded
+            if start == end:
+                return None
+            first, last = start % self.capacity, end % self.capacity
+            if first < last:
+                chunk = {name: column[first:last].copy() for name, column in self._columns.items()}
+            else:
+                chunk = {name: np.concatenate([column[first:], column[:last]]) for name, column in self._columns.items()}
+            self._flushed = end
+            self._space.notify_all()
+        return chunk
+
+    def flush(self):
+        """
+        Writes every recorded event out of the ring buffer.
+        """
+        chunk = self._drain()
+        if chunk is None:
+            return
+        if self.path is None:
+            self._chunks.append(chunk)
+            return
+        for name, values in chunk.items():
+            with open(os.path.join(self.path, f"{name}.bin"), "ab") as file:
+                file.write(values.tobytes())
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """
+        Stops the writer thread, flushes the remaining events and writes the trace schema.
+        """
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        if self.path is not None:
+            schema = {"columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+                      "events": self.recorded}
+            with open(os.path.join(self.path, "schema.json"), "w") as file:
+                json.dump(schema, file, indent=2)
+
+    def events(self):
+        """
+        Returns the flushed events as a dictionary of columns.
+        """
+        if self.path is not None:
+            return load_trace(self.path)
+        if not self._chunks:
+            return {name: np.zeros(0, dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.concatenate([chunk[name] for chunk in self._chunks]) for name in COLUMNS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_trace(path, mmap=True):
+    """
+    Loads a trace directory written by EventTrace.
+
+    Args:
+        path (str): The trace directory.
+        mmap (bool): Memory-map the columns instead of reading them into memory.
+
+    Returns:
+        dict: The trace columns as numpy arrays.
+    """
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        file = os.path.join(path, f"{name}.bin")
+        if mmap and os.path.getsize(file):
+            columns[name] = np.memmap(file, dtype=dtype, mode="r")
+        else:
+            columns[name] = np.fromfile(file, dtype=dtype)
+    return columns
+
+
+def save_npz(events, path):
+    """
+    Saves trace columns as a single compressed .npz file.
+    """
+    np.savez_compressed(path, **{name: np.asarray(values) for name, values in events.items()})
+
+
+def format_events(events, guest_id=str, sort=True):
+    """
+    Renders trace columns as human-readable log lines, in time order.
+
+    Args:
+        events (dict): The trace columns.
+        guest_id (callable): Maps a guest index to the identifier shown in the log.
+        sort (bool): Sort the events by timestamp first (stable, so ties keep recording order).
+
+    Yields:
+        tuple: (timestamp, message) for every event.
+    """
+    order = np.argsort(events["timestamp"], kind="stable") if sort else range(len(events["timestamp"]))
+    for i in order:
+        key = (int(events["stage"][i]), int(events["resource"][i]), int(events["code"][i]))
+        template = MESSAGES.get(key, "{guest}: " + " ".join([STAGES[key[0]], RESOURCES[key[1]], CODES[key[2]]]) + ".")
+        value = int(events["value"][i])
+        yield float(events["timestamp"][i]), template.format(guest=guest_id(int(events["guest"][i])), value=value)
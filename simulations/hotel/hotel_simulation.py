@@ -0,0 +1,542 @@
+import concurrent.futures
+import contextlib
+import sys
+import threading
+import time
+import datetime
+import random
+import logging
+import os
+
+from simulations.hotel import event_trace as trace
+from simulations.hotel.event_simulation import HotelEventSimulation
+from simulations.hotel.event_trace import EventTrace
+from simulations.hotel.inventory import book_stay
+from simulations.hotel.resource_pool import ResourcePool
+
+# Queues & Locks
+Lock_Reception = threading.Lock()
+Lock_Bellhops = threading.Lock()
+Lock_room = threading.Lock()
+Lock_restaurant = threading.Lock()
+Lock_bar = threading.Lock()
+Lock_checkout = threading.Lock()
+Lock_rooms = threading.Lock()
+
+# Default capacities of the hotel (number of staff, seats and rooms)
+CAPACITIES = {
+    "receptionists": 6,
+    "bellhops": 5,
+    "housekeepers": 15,
+    "bar_capacity": 50,
+    "restaurant_capacity": 150,
+    "rooms": 33,
+}
+
+bar_capacity = CAPACITIES["bar_capacity"]
+restaurant_capacity = CAPACITIES["restaurant_capacity"]
+
+# Multiplier applied to every wall-clock sleep of the threaded simulation
+sleep_scale = 1.0
+
+# Event trace of the running simulation (None disables recording)
+event_trace = None
+
+# Resource Pools
+receptionists = ResourcePool("receptionists", CAPACITIES["receptionists"], Lock_Reception)
+bellhops = ResourcePool("bellhops", CAPACITIES["bellhops"], Lock_Bellhops)
+housekeepers = ResourcePool("housekeepers", CAPACITIES["housekeepers"], Lock_room)
+bar_seats = ResourcePool("bar seats", bar_capacity, Lock_bar)
+restaurant_seats = ResourcePool("restaurant seats", restaurant_capacity, Lock_restaurant)
+
+# Available Rooms (shuffled at the start of every run)
+def room_numbers(count):
+    """
+        Returns the numbers of the first `count` rooms, 11 rooms per floor from the first floor up.
+        """
+    return [f"{floor}{room:02d}" for floor in range(1, count // 11 + 2) for room in range(0, 11)][:count]
+
+
+ROOMS = room_numbers(CAPACITIES["rooms"])
+available_rooms = list(ROOMS)
+
+# Room inventory of the running simulation (None assigns rooms from available_rooms for good)
+room_inventory = None
+
+# Seconds of the simulation per calendar night of the room inventory, and the start of the run
+night_seconds = 86400.0
+run_start = 0.0
+
+# Times the stages of a guest; simulations.profiling swaps in a timer when a run is profiled
+profile_stage = contextlib.nullcontext
+
+# Guest Class
+class Guest:
+    """
+    Represents a guest at the hotel.
+
+    Attributes:
+        guest_id (str): The unique ID of the guest.
+        index (int): The unique integer the guest ID was generated from.
+        guest_name (str): The name of the guest.
+        checkin_time (float): The time the guest checked in.
+        checkout_time (float): The time the guest checked out.
+        room_number (str): The room number assigned to the guest.
+        has_luggage (bool): Indicates if the guest has luggage.
+        luggage_handled (bool): Indicates if the guest's luggage has been handled.
+        room_service_order (str): The room service order of the guest.
+        room_service_time (float): The time the guest ordered room service.
+        housekeeping_done (bool): Indicates if housekeeping has been done.
+        housekeeping_time (float): The time housekeeping was done.
+        room_service_done (bool): Indicates if room service has been done.
+        room_service_arrival (float): The time room service arrived.
+        time_in_hotel (float): The total time the guest spent in the hotel.
+        booking (int): The guest's booking in the room inventory, if there is one.
+        rng: The guest's source of random numbers, with the API of the random module.
+    """
+    def __init__(self, guest_id, guest_name, has_luggage, index=0, rng=random) -> None:
+        self.guest_id = guest_id
+        self.index = index
+        self.guest_name = guest_name
+        self.checkin_time = 0
+        self.checkout_time = 0
+        self.room_number = None
+        self.has_luggage = has_luggage
+        self.luggage_handled = False
+        self.room_service_order = None
+        self.room_service_time = 0
+        self.housekeeping_done = False
+        self.housekeeping_time = 0
+        self.room_service_done = False
+        self.room_service_arrival = 0
+        self.time_in_hotel = 0
+        self.booking = None
+        self.rng = rng
+
+    def __repr__(self):
+        return f"ID: {self.guest_id}, Name: {self.guest_name}"
+
+# Initialize Current Date and Year
+date_now = datetime.datetime.now()
+curr_year = date_now.year
+
+# Guest Initialization Function
+def guest_init(x, rng=random):
+    """
+        Initializes a Guest object.
+
+        Args:
+            x (int): A unique integer for generating guest ID and name.
+            rng: The guest's source of random numbers; defaults to the random module.
+
+        Returns:
+            Guest: An initialized Guest object with a unique ID, name, and luggage status.
+        """
+    return Guest(
+        guest_id_for(x),
+        f"GST{curr_year}{x}",
+        rng.choice([True, False]),
+        x,
+        rng,
+    )
+
+
+def guest_id_for(x):
+    """
+        Returns the guest ID generated by guest_init for the unique integer x.
+        """
+    return f"111-{x}-{curr_year}"
+
+# Event Recording Helpers
+def record(guest, stage, resource, code, value=0):
+    """
+        Records a guest event in the active event trace, if there is one.
+
+        Args:
+            guest (Guest): The guest the event is about.
+            stage (int): The stage code from event_trace.
+            resource (int): The resource code from event_trace.
+            code (int): The event code from event_trace.
+            value (int): An optional number attached to the event, e.g. the room number.
+        """
+    if event_trace is not None:
+        event_trace.record(guest.index, stage, resource, code, value)
+
+
+def current_night():
+    """
+        Returns the calendar night of the threaded simulation: the scaled wall-clock time since the run started.
+        Without sleeps (a time scale of 0) no simulated time passes, so the whole run is night 0.
+        """
+    if sleep_scale <= 0:
+        return 0
+    return int((time.time() - run_start) / (night_seconds * sleep_scale))
+
+
+def acquire_or_wait(pool, guest, stage, resource):
+    """
+        Acquires a unit from a resource pool, recording a waiting event first if the guest has to wait.
+
+        Args:
+            pool (ResourcePool): The pool to acquire from.
+            guest (Guest): The guest acquiring the unit.
+            stage (int): The stage the guest is in.
+            resource (int): The resource code of the pool.
+        """
+    if not pool.acquire(timeout=0):
+        record(guest, stage, resource, trace.WAITING)
+        with profile_stage("wait"):
+            pool.acquire()
+
+# Guest Process Function
+def guest_process(guest):
+    """
+        Processes a guest through various stages of their stay at the hotel.
+
+        Stages include reservation, check-in, luggage handling, activities (restaurant, bar, room service, housekeeping), and checkout.
+
+        Args:
+            guest (Guest): The Guest object representing the guest being processed.
+
+        Raises:
+            Exception: Logs any exception that occurs during guest processing.
+        """
+    rng = guest.rng
+    try:
+        # Reservation
+        with profile_stage("reservation"):
+            acquire_or_wait(receptionists, guest, trace.RESERVATION, trace.RECEPTIONIST)
+            try:
+                time.sleep(rng.uniform(0.1, 0.2) * sleep_scale)
+                record(guest, trace.RESERVATION, trace.RECEPTIONIST, trace.FINISHED)
+                if room_inventory is not None:
+                    with Lock_rooms:
+                        guest.booking = book_stay(room_inventory, rng, current_night())
+            finally:
+                receptionists.release()
+
+        # Check-in
+        with profile_stage("checkin"):
+            acquire_or_wait(receptionists, guest, trace.CHECKIN, trace.RECEPTIONIST)
+            try:
+                time.sleep(rng.uniform(0.1, 0.3) * sleep_scale)
+                with Lock_rooms:
+                    if room_inventory is not None:
+                        room = None if guest.booking is None else room_inventory.room_number(guest.booking)
+                    else:
+                        room = available_rooms.pop() if available_rooms else None
+                if room is not None:
+                    guest.room_number = room
+                    record(guest, trace.CHECKIN, trace.ROOM, trace.FINISHED, int(guest.room_number))
+                    guest.checkin_time = time.time()
+                else:
+                    record(guest, trace.CHECKIN, trace.ROOM, trace.UNAVAILABLE)
+            finally:
+                receptionists.release()
+
+        # Luggage Handling
+        with profile_stage("luggage"):
+            acquire_or_wait(bellhops, guest, trace.LUGGAGE, trace.BELLHOP)
+            try:
+                if guest.has_luggage:
+                    time.sleep(rng.uniform(0.1, 0.5) * sleep_scale)
+                    record(guest, trace.LUGGAGE, trace.BELLHOP, trace.FINISHED)
+                    guest.luggage_handled = True
+                else:
+                    record(guest, trace.LUGGAGE, trace.NO_RESOURCE, trace.SKIPPED)
+                    guest.luggage_handled = False
+            finally:
+                bellhops.release()
+
+        # Guest Activity
+        with profile_stage("activity"):
+            while True:
+                option = rng.randint(1, 4)
+                if option == 1:
+                    # Restaurant
+                    if restaurant_seats.acquire(timeout=0):
+                        try:
+                            record(guest, trace.RESTAURANT, trace.RESTAURANT_SEAT, trace.STARTED)
+                            time.sleep(rng.uniform(0.1, 0.5) * sleep_scale)
+                        finally:
+                            restaurant_seats.release()
+                        break
+                    record(guest, trace.RESTAURANT, trace.RESTAURANT_SEAT, trace.UNAVAILABLE)
+                elif option == 2:
+                    # Bar
+                    if bar_seats.acquire(timeout=0):
+                        try:
+                            record(guest, trace.BAR, trace.BAR_SEAT, trace.STARTED)
+                            time.sleep(rng.uniform(0.1, 0.5) * sleep_scale)
+                        finally:
+                            bar_seats.release()
+                        break
+                    record(guest, trace.BAR, trace.BAR_SEAT, trace.UNAVAILABLE)
+                elif option == 3:
+                    # Room Service
+                    if housekeepers.acquire(timeout=rng.uniform(0.1, 0.3) * sleep_scale):
+                        try:
+                            guest.room_service_order = rng.choice(trace.ROOM_SERVICE_ORDERS)
+                            record(guest, trace.ROOM_SERVICE, trace.HOUSEKEEPER, trace.STARTED,
+                                   trace.ROOM_SERVICE_ORDERS.index(guest.room_service_order))
+                            time.sleep(rng.uniform(0.1, 0.5) * sleep_scale)
+                        finally:
+                            housekeepers.release()
+                        break
+                    record(guest, trace.ROOM_SERVICE, trace.HOUSEKEEPER, trace.WAITING)
+                else:
+                    # Housekeeping
+                    if housekeepers.acquire(timeout=rng.uniform(0.1, 0.3) * sleep_scale):
+                        try:
+                            record(guest, trace.HOUSEKEEPING, trace.HOUSEKEEPER, trace.STARTED)
+                            time.sleep(rng.uniform(0.1, 0.5) * sleep_scale)
+                        finally:
+                            housekeepers.release()
+                        break
+                    record(guest, trace.HOUSEKEEPING, trace.HOUSEKEEPER, trace.WAITING)
+
+        # Checkout
+        with profile_stage("checkout"):
+            with Lock_checkout:
+                record(guest, trace.CHECKOUT, trace.CHECKOUT_DESK, trace.STARTED)
+                if guest.luggage_handled:
+                    time.sleep(rng.uniform(0.1, 0.5) * sleep_scale)
+                    record(guest, trace.CHECKOUT, trace.BELLHOP, trace.FINISHED)
+                guest.checkout_time = time.time()
+                guest.time_in_hotel = guest.checkout_time - guest.checkin_time
+                if room_inventory is not None and guest.booking is not None:
+                    with Lock_rooms:
+                        room_inventory.release(guest.booking, current_night())
+                    guest.booking = None
+    except Exception as e:
+        logging.error(f"Error processing guest {guest.guest_id}: {e}")
+
+
+
+# Simulation Summary
+def log_summary(guests, mode, elapsed):
+    """
+        Logs a summary of a finished simulation run so that execution modes can be compared.
+
+        Args:
+            guests (list): The simulated Guest objects.
+            mode (str): The execution mode of the run.
+            elapsed (float): The wall-clock duration of the run, in seconds.
+        """
+    checked_in = [guest for guest in guests if guest.room_number is not None]
+    logging.info(f"Simulation completed in {mode} mode after {elapsed:.3f}s of wall-clock time.")
+    logging.info(f"{len(checked_in)} of {len(guests)} guests checked in.")
+    if checked_in:
+        mean_stay = sum(guest.time_in_hotel for guest in checked_in) / len(checked_in)
+        logging.info(f"Average time in hotel: {mean_stay:.3f}s.")
+
+
+def make_guests(num_guests, streams=None):
+    """
+        Initializes the guests of a run, each with its own random stream if streams are given.
+
+        Args:
+            num_guests (int): The number of guests.
+            streams (SeedStreams): Optional source of the guests' random streams.
+
+        Returns:
+            list: The Guest objects.
+        """
+    if streams is None:
+        return [guest_init(i) for i in range(1, num_guests + 1)]
+    return [guest_init(i, streams.stream("guest", i, block_size=16)) for i in range(1, num_guests + 1)]
+
+
+# Threaded Simulation Execution
+def run_threaded(num_guests=400, time_scale=1.0, trace=None, streams=None, inventory=None):
+    """
+        Executes the guest processing simulation with one thread per guest.
+
+        Initializes a list of Guest objects and maps them to the guest_process function using a ThreadPoolExecutor.
+
+        Args:
+            num_guests (int): The number of guests to simulate.
+            time_scale (float): Multiplier applied to every service time, to run faster than real time.
+            trace (EventTrace): Optional trace to record guest events in.
+            streams (SeedStreams): Optional source of a seeded random stream per guest; without
+                it, guests draw from the random module.
+            inventory (RoomInventory): Optional room inventory in which guests book their nights
+                at reservation and which gets their rooms back at checkout.
+
+        Returns:
+            list: The simulated Guest objects.
+        """
+    global sleep_scale, event_trace, available_rooms, room_inventory, run_start
+    sleep_scale = time_scale
+    event_trace = trace
+    room_inventory = inventory
+    run_start = time.time()
+    available_rooms = list(ROOMS)
+    (streams.stream("model") if streams is not None else random).shuffle(available_rooms)
+    guests = make_guests(num_guests, streams)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_guests) as executor:
+            executor.map(guest_process, guests)
+    finally:
+        event_trace = None
+        room_inventory = None
+    return guests
+
+
+# Discrete-Event Simulation Execution
+def run_discrete_event(num_guests=400, seed=None, trace=None, streams=None, capacities=None, arrival_rate=None,
+                       inventory=None, night_seconds=86400.0):
+    """
+        Executes the guest processing simulation on a virtual clock.
+
+        The stages of guest_process are scheduled as events on an event heap, so no thread
+        ever sleeps and the run finishes as soon as all events have been processed.
+
+        Args:
+            num_guests (int): The number of guests to simulate.
+            seed (int): Optional seed for the random module, making the run reproducible.
+            trace (EventTrace): Optional trace to record guest events in, stamped with the virtual time.
+            streams (SeedStreams): Optional source of a seeded random stream per guest, which makes
+                the run reproducible whatever the seed of the random module.
+            capacities (dict): Optional capacities overriding those of CAPACITIES, by the same names.
+            arrival_rate (float): Optional rate of Poisson guest arrivals per second; by default
+                every guest arrives at time zero.
+            inventory (RoomInventory): Optional room inventory in which guests book their nights
+                at reservation and which gets their rooms back at checkout.
+            night_seconds (float): The virtual seconds per calendar night of the inventory.
+
+        Returns:
+            list: The simulated Guest objects.
+        """
+    return make_event_simulation(num_guests, seed, trace, streams, capacities, arrival_rate, inventory,
+                                 night_seconds).run()
+
+
+def make_event_simulation(num_guests=400, seed=None, trace=None, streams=None, capacities=None,
+                          arrival_rate=None, inventory=None, night_seconds=86400.0):
+    """
+        Initializes the discrete-event simulation run by run_discrete_event, without running it.
+
+        Accepts the same arguments as run_discrete_event. Without `capacities`, the staff and
+        seats are those of the threaded simulation's resource pools.
+
+        Returns:
+            HotelEventSimulation: The simulation, ready to run.
+        """
+    capacities = {
+        "receptionists": receptionists.capacity,
+        "bellhops": bellhops.capacity,
+        "housekeepers": housekeepers.capacity,
+        "bar_capacity": bar_seats.capacity,
+        "restaurant_capacity": restaurant_seats.capacity,
+        "rooms": len(ROOMS),
+        **(capacities or {}),
+    }
+    if seed is not None:
+        random.seed(seed)
+    rooms = room_numbers(capacities.pop("rooms"))
+    (streams.stream("model") if streams is not None else random).shuffle(rooms)
+    guests = make_guests(num_guests, streams)
+    return HotelEventSimulation(guests, rooms, trace=trace, arrival_rate=arrival_rate, inventory=inventory,
+                                night_seconds=night_seconds, **capacities)
+
+
+def run_command(args):
+    """
+        Runs the simulation in the execution mode chosen on the command line and logs its summary.
+
+        Args:
+            args (argparse.Namespace): The parsed arguments of the hotel command (see simulations.cli).
+        """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M')
+    streams = None
+    if args.seed is not None:
+        from simulations.seeding import SeedStreams
+
+        streams = SeedStreams(args.seed)
+
+    inventory = None
+    if args.inventory is not None:
+        from simulations.hotel.inventory import RoomInventory
+
+        inventory = RoomInventory.for_hotel(args.inventory)
+
+    # Without a trace directory, events are only kept in memory when they are logged or saved.
+    keep_trace = args.trace is not None or args.log or args.npz
+    recorder = EventTrace(args.trace) if keep_trace else contextlib.nullcontext()
+    start = time.perf_counter()
+    with profile_stage("simulate"), recorder as guest_trace:
+        if args.mode == "stream":
+            run_streaming(args, guest_trace, streams, inventory)
+            guests = None
+        elif args.mode == "threaded":
+            guests = run_threaded(args.guests, args.time_scale, guest_trace, streams, inventory)
+        else:
+            guests = run_discrete_event(args.guests, trace=guest_trace, streams=streams,
+                                        arrival_rate=args.arrival_rate, inventory=inventory,
+                                        night_seconds=args.night_seconds)
+    elapsed = time.perf_counter() - start
+
+    with profile_stage("report"):
+        if guest_trace is not None:
+            events = guest_trace.events()
+            if args.log:
+                for _, message in trace.format_events(events, guest_id_for):
+                    logging.info(message)
+            if args.npz:
+                trace.save_npz(events, args.npz)
+        if guests is not None:
+            log_summary(guests, args.mode, elapsed)
+        else:
+            logging.info(f"Simulation completed in stream mode after {elapsed:.3f}s of wall-clock time.")
+        if guest_trace is not None:
+            logging.info(f"{guest_trace.recorded} guest events recorded.")
+
+
+def run_streaming(args, guest_trace, streams=None, inventory=None):
+    """
+        Runs the streaming simulation for the hotel command and logs the totals of its stays.
+
+        Guests arrive from the file given by `--arrivals`, or as a seasonal Poisson process. With
+        `--trace DIR`, the completed stays are written to `DIR/stays`.
+
+        Args:
+            args (argparse.Namespace): The parsed arguments of the hotel command.
+            guest_trace (EventTrace): The trace to record guest events in, or None.
+            streams (SeedStreams): Optional source of the arrivals' and guests' random streams.
+            inventory (RoomInventory): Optional room inventory for the guests' bookings.
+        """
+    from simulations.hotel.streaming import StayLog, make_streaming_simulation, poisson_arrivals, trace_arrivals
+
+    if args.arrivals is not None:
+        arrivals = trace_arrivals(args.arrivals)
+    else:
+        rng = streams.stream("arrivals") if streams is not None else random
+        arrivals = poisson_arrivals(args.arrival_rate or 1.0, rng, args.seasonality, until=args.duration)
+    stays_path = None if args.trace is None else os.path.join(args.trace, "stays")
+    with StayLog(stays_path) as stays:
+        simulation = make_streaming_simulation(arrivals, streams, stays, guest_trace, max_guests=args.guests,
+                                               inventory=inventory, night_seconds=args.night_seconds)
+        simulation.run()
+    summary = simulation.summary()
+    logging.info(f"{summary['arrived']} guests arrived over {summary['virtual_seconds']:.0f}s of virtual time, "
+                 f"{summary['checked_in']} checked in.")
+    if "mean_time_in_hotel" in summary:
+        logging.info(f"Average time in hotel: {summary['mean_time_in_hotel']:.3f}s "
+                     f"(median {summary['median_time_in_hotel']:.3f}s, 90th percentile "
+                     f"{summary['p90_time_in_hotel']:.3f}s).")
+    logging.info(f"At most {summary['peak_guests']} guests were in the hotel at once "
+                 f"({summary['table_bytes'] / 1024:.0f} KiB of guest table).")
+
+
+def main(argv=None):
+    """
+        Parses the command line and runs the simulation in the requested execution mode.
+        """
+    from simulations.cli import main as cli_main
+
+    cli_main(["hotel", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+A room inventory over calendar nights, indexed by one occupancy bitmap per night.
+
+Rooms have a number, a floor and a type. They are laid out in the bitmaps sorted by type,
+then floor, so the rooms of a type (or of a type on a floor) are one contiguous range of
+bits: finding a room free for every night of a stay ORs the words of that range for each
+night, testing 64 rooms per operation, and never looks at rooms of another type. A count
+of free rooms per type and night rejects requests for sold-out nights without touching
+the bitmaps. The bitmaps form a ring of `horizon` nights that moves forward with `advance`.
+
+Example:
+    python -m simulations inventory --rooms 10000 --bookings 1000000 --seed 1
+"""
+import argparse
+import time
+
+import numpy as np
+
+# Room types, and the type of each of the 11 rooms of a floor
+ROOM_TYPES = ("single", "double", "suite")
+FLOOR_LAYOUT = ("single",) * 5 + ("double",) * 4 + ("suite",) * 2
+
+# Stays of the guests, in nights (inclusive)
+STAY_NIGHTS = (1, 7)
+
+
+def room_layout(count):
+    """
+    Returns the rooms of a hotel of `count` rooms as (number, floor, type) triples.
+
+    Rooms are numbered as by `room_numbers`, 11 rooms per floor from the first floor up, and
+    their types follow FLOOR_LAYOUT.
+    """
+    return [(f"{floor}{room:02d}", floor, FLOOR_LAYOUT[room])
+            for floor in range(1, count // 11 + 2) for room in range(11)][:count]
+
+
+def draw_request(rng):
+    """
+    Draws the room type and the number of nights a guest books.
+
+    Args:
+        rng: The guest's source of random numbers, with the API of the random module.
+
+    Returns:
+        tuple: The room type and the number of nights.
+    """
+    return rng.choice(FLOOR_LAYOUT), rng.randint(*STAY_NIGHTS)
+
+
+def book_stay(inventory, rng, night):
+    """
+    Books the stay a guest draws with `draw_request`, from `night` on.
+
+    The guest gets a room of the type they asked for if one is free for all their nights, and
+    otherwise a room of any type.
+
+    Args:
+        inventory (RoomInventory): The inventory to book in; its horizon is moved to `night`.
+        rng: The guest's source of random numbers.
+        night (int): The night the guest arrives.
+
+    Returns:
+        int: The booking, or None if no room is free for all the guest's nights.
+    """
+    room_type, nights = draw_request(rng)
+    inventory.advance(night)
+    booking = inventory.book(night, night + nights, room_type)
+    if booking is None:
+        booking = inventory.book(night, night + nights)
+    return booking
+
+
+class RoomInventory:
+    """
+    The rooms of the hotel and their bookings over a moving horizon of calendar nights.
+
+    Attributes:
+        numbers (numpy.ndarray): The room number of each room, in bitmap order.
+        floors (numpy.ndarray): The floor of each room, in bitmap order.
+        types (numpy.ndarray): The index of each room's type in ROOM_TYPES, in bitmap order.
+        horizon (int): The number of nights that can be booked ahead.
+        first_night (int): The first night that can be booked.
+        occupied (numpy.ndarray): (night % horizon, word) bitmaps of the booked rooms.
+        free_count (numpy.ndarray): (type, night % horizon) number of free rooms.
+        bookings (int): The number of bookings held.
+    """
+    def __init__(self, rooms, horizon=366):
+        """
+        Args:
+            rooms (list): The rooms as (number, floor, type) triples (see `room_layout`).
+            horizon (int): The number of nights that can be booked ahead.
+        """
+        rooms = sorted(rooms, key=lambda room: (ROOM_TYPES.index(room[2]), room[1], int(room[0])))
+        self.numbers = np.array([int(number) for number, _, _ in rooms], dtype=np.int64)
+        self.floors = np.array([floor for _, floor, _ in rooms], dtype=np.int32)
+        self.types = np.array([ROOM_TYPES.index(room_type) for _, _, room_type in rooms], dtype=np.int8)
+        self.horizon = horizon
+        self.first_night = 0
+        self.occupied = np.zeros((horizon, (len(rooms) + 63) // 64), dtype=np.uint64)
+        self._type_sizes = np.bincount(self.types, minlength=len(ROOM_TYPES)).astype(np.int32)
+        self.free_count = np.repeat(self._type_sizes[:, None], horizon, axis=1)
+        self.bookings = 0
+
+        # Bit ranges of each type, and of each type on each floor
+        self._ranges = {None: (0, len(rooms))}
+        for bit, (room_type, floor) in enumerate(zip(self.types.tolist(), self.floors.tolist())):
+            for key in (room_type, (room_type, floor)):
+                low, _ = self._ranges.get(key, (bit, bit))
+                self._ranges[key] = (low, bit + 1)
+
+        self._room = np.zeros(1024, dtype=np.int32)
+        self._start = np.zeros(1024, dtype=np.int32)
+        self._end = np.zeros(1024, dtype=np.int32)
+        self._free_bookings = list(range(1023, -1, -1))
+
+    @classmethod
+    def for_hotel(cls, count, horizon=366):
+        """
+        Returns the inventory of a hotel of `count` rooms laid out by `room_layout`.
+        """
+        return cls(room_layout(count), horizon)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def _rows(self, start, end):
+        if end <= start:
+            raise ValueError(f"a stay must last at least one night, not {start} to {end}")
+        if start < self.first_night or end > self.first_night + self.horizon:
+            raise ValueError(f"nights {start} to {end} are outside the horizon "
+                             f"{self.first_night} to {self.first_night + self.horizon}")
+        return np.arange(start, end) % self.horizon
+
+    def _keys(self, room_type, floor):
+        # The bit ranges to search: the rooms of a floor are in one range per type
+        if room_type is not None:
+            room_type = ROOM_TYPES.index(room_type)
+            return [room_type if floor is None else (room_type, floor)]
+        if floor is None:
+            return [None]
+        return [(room_type, floor) for room_type in range(len(ROOM_TYPES))]
+
+    def _free_words(self, rows, key):
+        low, high = self._ranges.get(key, (0, 0))
+        if low == high:
+            return 0, np.zeros(0, dtype=np.uint64)
+        first, last = low >> 6, (high - 1) >> 6
+        free = ~np.bitwise_or.reduce(self.occupied[rows, first:last + 1], axis=0)
+        # Mask the rooms of other types sharing the first and last words
+        free[0] &= np.uint64((0xFFFFFFFFFFFFFFFF << (low & 63)) & 0xFFFFFFFFFFFFFFFF)
+        free[-1] &= np.uint64(0xFFFFFFFFFFFFFFFF >> (63 - ((high - 1) & 63)))
+        return first, free
+
+    def available(self, start, end, room_type=None, floor=None):
+        """
+        Returns the number of rooms free for every night from `start` to `end` (excluded).
+
+        Args:
+            start (int): The first night of the stay.
+            end (int): The night of departure.
+            room_type (str): Optional room type (see ROOM_TYPES).
+            floor (int): Optional floor.
+        """
+        rows = self._rows(start, end)
+        return sum(int(np.bitwise_count(self._free_words(rows, key)[1]).sum())
+                   for key in self._keys(room_type, floor))
+
+    def book(self, start, end, room_type=None, floor=None):
+        """
+        Books the first room (lowest floor first) free for every night from `start` to `end` (excluded).
+
+        Args:
+            start (int): The first night of the stay.
+            end (int): The night of departure.
+            room_type (str): Optional room type (see ROOM_TYPES); any type by default.
+            floor (int): Optional floor.
+
+        Returns:
+            int: The booking, or None if no such room is free.
+        """
+        rows = self._rows(start, end)
+        if room_type is not None and self.free_count[ROOM_TYPES.index(room_type), rows].min() == 0:
+            return None
+        for key in self._keys(room_type, floor):
+            first, free = self._free_words(rows, key)
+            words = np.flatnonzero(free)
+            if words.size:
+                break
+        else:
+            return None
+        word = int(free[words[0]])
+        room = (first + int(words[0])) * 64 + (word & -word).bit_length() - 1
+        self._occupy(rows, room, True)
+
+        if not self._free_bookings:
+            self._grow()
+        booking = self._free_bookings.pop()
+        self._room[booking] = room
+        self._start[booking] = start
+        self._end[booking] = end
+        self.bookings += 1
+        return booking
+
+    def release(self, booking, night=None):
+        """
+        Frees the room of a booking from `night` on (at checkout) and forgets the booking.
+
+        Args:
+            booking (int): The booking returned by `book`.
+            night (int): The first night the room is free again; by default the first night of the stay.
+        """
+        start = int(self._start[booking]) if night is None else max(int(self._start[booking]), night)
+        start = max(start, self.first_night)
+        end = int(self._end[booking])
+        if start < end:
+            self._occupy(np.arange(start, end) % self.horizon, int(self._room[booking]), False)
+        self._free_bookings.append(booking)
+        self.bookings -= 1
+
+    def room_number(self, booking):
+        """
+        Returns the room number of a booking, as a string like those of `room_numbers`.
+        """
+        return str(self.numbers[self._room[booking]])
+
+    def _occupy(self, rows, room, booked):
+        bit = np.uint64(1 << (room & 63))
+        if booked:
+            self.occupied[rows, room >> 6] |= bit
+        else:
+            self.occupied[rows, room >> 6] &= ~bit
+        self.free_count[self.types[room], rows] -= 1 if booked else -1
+
+    def _grow(self):
+        capacity = len(self._room)
+        for name in ("_room", "_start", "_end"):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros(capacity, column.dtype)]))
+        self._free_bookings.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def advance(self, night):
+        """
+        Moves the horizon forward so that it starts at `night`, clearing the nights that have passed.
+        """
+        if night <= self.first_night:
+            return
+        passed = np.arange(self.first_night, min(night, self.first_night + self.horizon)) % self.horizon
+        self.occupied[passed] = 0
+        self.free_count[:, passed] = self._type_sizes[:, None]
+        self.first_night = night
+
+    def occupancy(self, start=None, end=None):
+        """
+        Returns the number of booked rooms of each type for each night from `start` to `end` (excluded).
+
+        Returns:
+            numpy.ndarray: (type, night) counts; the whole horizon by default.
+        """
+        start = self.first_night if start is None else start
+        end = self.first_night + self.horizon if end is None else end
+        return self._type_sizes[:, None] - self.free_count[:, self._rows(start, end)]
+
+    # State
+    def get_state(self):
+        """
+        Returns the bitmaps, counts and bookings as arrays, for checkpointing.
+        """
+        return {
+            "numbers": self.numbers.copy(),
+            "floors": self.floors.copy(),
+            "types": self.types.copy(),
+            "horizon": self.horizon,
+            "first_night": self.first_night,
+            "occupied": self.occupied.copy(),
+            "free_count": self.free_count.copy(),
+            "booking_room": self._room.copy(),
+            "booking_start": self._start.copy(),
+            "booking_end": self._end.copy(),
+            "free_bookings": np.array(self._free_bookings, dtype=np.int64),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Returns the inventory saved by `get_state`, with its rooms and bookings.
+        """
+        rooms = [(str(number), floor, ROOM_TYPES[room_type]) for number, floor, room_type
+                 in zip(state["numbers"].tolist(), state["floors"].tolist(), state["types"].tolist())]
+        inventory = cls(rooms, int(state["horizon"]))
+        inventory.set_state(state)
+        return inventory
+
+    def set_state(self, state):
+        """
+        Replaces the bookings by those of a state from `get_state` of an inventory of the same rooms.
+        """
+        self.first_night = int(state["first_night"])
+        self.occupied = np.array(state["occupied"], dtype=np.uint64)
+        self.free_count = np.array(state["free_count"], dtype=np.int32)
+        self._room = np.array(state["booking_room"], dtype=np.int32)
+        self._start = np.array(state["booking_start"], dtype=np.int32)
+        self._end = np.array(state["booking_end"], dtype=np.int32)
+        self._free_bookings = state["free_bookings"].tolist()
+        self.bookings = len(self._room) - len(self._free_bookings)
+
+
+def forecast(inventory, bookings, seed=None, max_lead=None):
+    """
+    Books random stays in an inventory and returns the timings and acceptance of the requests.
+
+    Each request asks for a room type (in the proportions of FLOOR_LAYOUT) and STAY_NIGHTS
+    nights, starting on a random night of the horizon (or within `max_lead` nights).
+
+    Args:
+        inventory (RoomInventory): The inventory to book the stays in.
+        bookings (int): The number of booking requests.
+        seed (int): Optional seed of the requests.
+        max_lead (int): Optional maximum number of nights between the first night and a stay.
+
+    Returns:
+        dict: The number of requests, accepted bookings and the seconds spent booking.
+    """
+    rng = np.random.default_rng(seed)
+    low, high = STAY_NIGHTS
+    nights = rng.integers(low, high + 1, bookings)
+    lead = inventory.horizon - high if max_lead is None else min(max_lead, inventory.horizon - high)
+    starts = inventory.first_night + rng.integers(0, lead + 1, bookings)
+    room_types = np.array(FLOOR_LAYOUT)[rng.integers(0, len(FLOOR_LAYOUT), bookings)]
+
+    accepted = 0
+    start_time = time.perf_counter()
+    for start, stay, room_type in zip(starts.tolist(), nights.tolist(), room_types.tolist()):
+        if inventory.book(start, start + stay, room_type) is not None:
+            accepted += 1
+    return {"requests": bookings, "accepted": accepted, "seconds": time.perf_counter() - start_time}
+
+
+def print_forecast(inventory, result, period=30):
+    """
+    Prints the acceptance of a forecast and the occupancy of each room type by period of nights.
+    """
+    import pandas as pd
+
+    print(f"{len(inventory)} rooms, {result['requests']} requests, {result['accepted']} booked "
+          f"({result['accepted'] / max(result['requests'], 1):.1%}) in {result['seconds']:.2f}s "
+          f"({result['requests'] / max(result['seconds'], 1e-9):,.0f} requests/s).")
+    occupancy = inventory.occupancy() / np.maximum(inventory._type_sizes[:, None], 1)
+    nights = np.arange(inventory.first_night, inventory.first_night + inventory.horizon)
+    report_df = pd.DataFrame(occupancy.T, columns=ROOM_TYPES)
+    report_df["Nights"] = [f"{start}-{start + period - 1}" for start in nights // period * period]
+    print("\nOccupancy by Room Type:")
+    print(report_df.groupby("Nights", sort=False).mean().to_string(float_format=lambda value: f"{value:.1%}"))
+
+
+def main(argv=None):
+    """
+    Fills a room inventory with random booking requests and prints the occupancy forecast.
+    """
+    parser = argparse.ArgumentParser(description="Book calendar nights in a room inventory and forecast occupancy.")
+    parser.add_argument("--rooms", type=int, default=10000, help="The number of rooms.")
+    parser.add_argument("--bookings", type=int, default=100000, help="The number of booking requests.")
+    parser.add_argument("--nights", type=int, default=366, help="The number of nights that can be booked ahead.")
+    parser.add_argument("--max-lead", type=int, default=None,
+                        help="The maximum number of nights between today and a stay (default: the horizon).")
+    parser.add_argument("--period", type=int, default=30, help="Nights per row of the forecast.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the booking requests.")
+    args = parser.parse_args(argv)
+
+    inventory = RoomInventory.for_hotel(args.rooms, args.nights)
+    result = forecast(inventory, args.bookings, args.seed, args.max_lead)
+    print_forecast(inventory, result, args.period)
+
+
+if __name__ == "__main__":
+    main()
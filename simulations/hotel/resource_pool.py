@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+
+
+class _Waiter:
+    """
+    A thread waiting for a unit of a ResourcePool.
+
+    Attributes:
+        condition (threading.Condition): The condition the waiting thread sleeps on.
+        granted (bool): Set when a releasing thread hands a unit to this waiter.
+    """
+    __slots__ = ("condition", "granted")
+
+    def __init__(self, lock):
+        self.condition = threading.Condition(lock)
+        self.granted = False
+
+
+class ResourcePool:
+    """
+    A counted pool of identical resources (staff members, seats) shared between threads.
+
+    Threads that find the pool empty sleep on their own condition variable instead of
+    polling, and are served strictly in arrival order: a released unit is handed directly
+    to the longest-waiting thread, so a newly arriving thread can never overtake it.
+
+    Attributes:
+        name (str): The name of the pool.
+        capacity (int): The total number of units in the pool.
+        acquisitions (int): The number of units acquired so far.
+        wait_time (float): The total seconds threads have spent waiting for a unit.
+        observer (callable): Optional function called as observer(in_use, waiting) whenever either
+            changes, with the pool's lock held; None disables the notifications.
+    """
+    def __init__(self, name, capacity, lock=None):
+        """
+        Initializes a pool with all of its units available.
+
+        Args:
+            name (str): The name of the pool.
+            capacity (int): The total number of units in the pool.
+            lock (threading.Lock): Optional lock protecting the pool's bookkeeping.
+        """
+        self.name = name
+        self.capacity = capacity
+        self._available = capacity
+        self._lock = lock if lock is not None else threading.Lock()
+        self._waiters = deque()
+        self.acquisitions = 0
+        self.wait_time = 0.0
+        self.observer = None
+
+    @property
+    def available(self):
+        """
+        int: The number of units that are currently free.
+        """
+        return self._available
+
+    @property
+    def in_use(self):
+        """
+        int: The number of units that are currently held.
+        """
+        return self.capacity - self._available
+
+    @property
+    def waiting(self):
+        """
+        int: The number of threads waiting for a unit.
+        """
+        return len(self._waiters)
+
+    def acquire(self, timeout=None):
+        """
+        Takes one unit from the pool, waiting in FIFO order if none is free.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait. None waits forever and
+                0 only takes a unit if one is free and nobody is already waiting.
+
+        Returns:
+            bool: True if a unit was acquired, False if the timeout expired first.
+        """
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                self.acquisitions += 1
+                if self.observer is not None:
+                    self.observer(self.capacity - self._available, len(self._waiters))
+                return True
+            if timeout is not None and timeout <= 0:
+                return False
+
+            waiter = _Waiter(self._lock)
+            self._waiters.append(waiter)
+            if self.observer is not None:
+                self.observer(self.capacity - self._available, len(self._waiters))
+            start = time.perf_counter()
+            granted = waiter.condition.wait_for(lambda: waiter.granted, timeout)
+            self.wait_time += time.perf_counter() - start
+            if granted:
+                self.acquisitions += 1
+                return True
+            self._waiters.remove(waiter)
+            if self.observer is not None:
+                self.observer(self.capacity - self._available, len(self._waiters))
+            return False
+
+    def release(self):
+        """
+        Returns one unit to the pool, handing it to the longest-waiting thread if there is one.
+
+        Raises:
+            ValueError: If more units are released than were acquired.
+        """
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.condition.notify()
+            elif self._available < self.capacity:
+                self._available += 1
+            else:
+                raise ValueError(f"{self.name}: released more units than were acquired.")
+            if self.observer is not None:
+                self.observer(self.capacity - self._available, len(self._waiters))
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __repr__(self):
+        return f"{self.name}: {self.in_use}/{self.capacity} in use, {self.waiting} waiting"
@@ -0,0 +1,560 @@
+"""
+Streaming guest arrivals for the discrete-event hotel simulation.
+
+`HotelEventSimulation` creates every Guest object before the run, so simulating months of
+arrivals needs millions of them in memory. `StreamingHotelSimulation` instead pulls the
+arrival times from a generator (a seasonal Poisson process or the replay of a recorded
+trace), keeps the guests currently in the hotel as rows of a `GuestTable`, and recycles
+the row of each guest at checkout after spilling the completed stay to a `StayLog`. Memory
+is bounded by the number of guests in the hotel at the same time, not by the total.
+
+Example:
+    streams = SeedStreams(1)
+    arrivals = poisson_arrivals(2.0, streams.stream("arrivals"), seasonality=[(0.5, 3600)], until=86400)
+    with StayLog("traces/stays") as stays:
+        simulation = make_streaming_simulation(arrivals, streams=streams, stays=stays)
+        simulation.run()
+"""
+import math
+import os
+import random
+
+import numpy as np
+
+from simulations.hotel import event_trace as trace
+from simulations.hotel.event_simulation import ARRIVAL, HotelEventSimulation
+from simulations.sketches import QuantileSketch
+
+# Completed Stay Columns
+STAY_COLUMNS = {
+    "guest": np.uint32,
+    "arrival": np.float64,
+    "checkin_time": np.float64,
+    "checkout_time": np.float64,
+    "room": np.int32,
+    "luggage_handled": np.bool_,
+}
+
+# Heap index of the next arrival, whose guest has no row yet
+_PENDING = -1
+
+
+# Arrival Processes
+def poisson_arrivals(rate, rng=random, seasonality=(), start=0.0, until=None):
+    """
+    Yields the arrival times of a Poisson process whose rate can follow seasonal cycles.
+
+    The rate at time t is `rate * (1 + sum(amplitude * sin(2 * pi * t / period)))`, clipped at
+    zero. Arrivals are drawn at the peak rate and kept with the ratio of the rate at their
+    time to the peak (thinning), so the process is exact for any seasonality.
+
+    Args:
+        rate (float): The mean number of arrivals per second of virtual time.
+        rng: The source of random numbers, with the API of the random module.
+        seasonality (list): (amplitude, period) pairs of sinusoidal cycles of the rate, e.g.
+            (0.5, 86400) for a daily cycle between half and one and a half times the mean rate.
+        start (float): The virtual time the process starts at.
+        until (float): Optional virtual time after which no guest arrives; endless by default.
+
+    Yields:
+        float: The arrival times, in increasing order.
+    """
+    seasonality = [(amplitude, 2 * math.pi / period) for amplitude, period in seasonality]
+    peak = rate * (1 + sum(abs(amplitude) for amplitude, _ in seasonality))
+    now = start
+    while True:
+        now += rng.expovariate(peak)
+        if until is not None and now > until:
+            return
+        if seasonality:
+            current = rate * (1 + sum(amplitude * math.sin(omega * now) for amplitude, omega in seasonality))
+            if rng.random() * peak >= current:
+                continue
+        yield now
+
+
+def trace_arrivals(path, time_scale=1.0, start=0.0):
+    """
+    Yields the arrival times recorded in a file, read one line at a time.
+
+    Args:
+        path (str): A text or CSV file with the arrival time in the first column of each line
+            (lines that do not start with a number, such as a header, are skipped), or a .npy
+            array of arrival times, which is memory-mapped.
+        time_scale (float): Multiplier applied to the recorded times, e.g. 1/60 for minutes.
+        start (float): The virtual time the first recorded time (before scaling) is shifted to.
+
+    Yields:
+        float: The arrival times, in the order of the file.
+    """
+    if path.endswith(".npy"):
+        times = np.load(path, mmap_mode="r")
+        for block in range(0, len(times), 1 << 16):
+            yield from (start + time_scale * times[block:block + (1 << 16)]).tolist()
+        return
+    with open(path) as file:
+        for line in file:
+            field = line.split(",", 1)[0].strip()
+            try:
+                yield start + time_scale * float(field)
+            except ValueError:
+                continue
+
+
+# Guest Table
+class GuestRow:
+    """
+    A view of one row of a GuestTable, with the attributes of a Guest that the event handlers use.
+
+    Attributes:
+        table (GuestTable): The table the row belongs to.
+        row (int): The row of the guest in the table.
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def index(self):
+        return int(self.table.guest[self.row])
+
+    @property
+    def rng(self):
+        return self.table.rngs[self.row]
+
+    @property
+    def has_luggage(self):
+        return bool(self.table.has_luggage[self.row])
+
+    @property
+    def luggage_handled(self):
+        return bool(self.table.luggage_handled[self.row])
+
+    @luggage_handled.setter
+    def luggage_handled(self, value):
+        self.table.luggage_handled[self.row] = value
+
+    @property
+    def room_number(self):
+        room = int(self.table.room[self.row])
+        return None if room < 0 else str(room)
+
+    @room_number.setter
+    def room_number(self, value):
+        self.table.room[self.row] = -1 if value is None else int(value)
+
+    @property
+    def room_service_order(self):
+        order = int(self.table.room_service_order[self.row])
+        return None if order < 0 else trace.ROOM_SERVICE_ORDERS[order]
+
+    @room_service_order.setter
+    def room_service_order(self, value):
+        self.table.room_service_order[self.row] = -1 if value is None else trace.ROOM_SERVICE_ORDERS.index(value)
+
+    @property
+    def booking(self):
+        booking = int(self.table.booking[self.row])
+        return None if booking < 0 else booking
+
+    @booking.setter
+    def booking(self, value):
+        self.table.booking[self.row] = -1 if value is None else value
+
+    @property
+    def checkin_time(self):
+        return float(self.table.checkin_time[self.row])
+
+    @checkin_time.setter
+    def checkin_time(self, value):
+        self.table.checkin_time[self.row] = value
+
+    @property
+    def checkout_time(self):
+        return float(self.table.checkout_time[self.row])
+
+    @checkout_time.setter
+    def checkout_time(self, value):
+        self.table.checkout_time[self.row] = value
+
+    @property
+    def time_in_hotel(self):
+        return self.checkout_time - self.checkin_time
+
+    @time_in_hotel.setter
+    def time_in_hotel(self, value):
+        # Derived from the check-in and checkout times
+        pass
+
+    def __repr__(self):
+        return f"Guest {self.index} (row {self.row})"
+
+
+class GuestTable:
+    """
+    The guests currently in the hotel, stored column by column in NumPy arrays.
+
+    Rows are handed out by `allocate` and returned by `release`, which puts them on a free
+    list to be reused by the next guest, so the table only grows (by doubling) when more
+    guests than ever before are in the hotel at once. Indexing the table returns a GuestRow
+    view of a row, which behaves like the Guest object of that row.
+
+    Attributes:
+        capacity (int): The number of rows allocated.
+        size (int): The number of rows in use.
+        peak (int): The largest number of rows in use at once so far.
+        guest (numpy.ndarray): The number of the guest in each row.
+        arrival (numpy.ndarray): The arrival time of each guest.
+        has_luggage (numpy.ndarray): Whether each guest has luggage.
+        luggage_handled (numpy.ndarray): Whether each guest's luggage has been handled.
+        room (numpy.ndarray): The room number of each guest, or -1 before check-in.
+        room_service_order (numpy.ndarray): The index of each guest's order in ROOM_SERVICE_ORDERS, or -1.
+        booking (numpy.ndarray): The booking of each guest in the room inventory, or -1.
+        checkin_time (numpy.ndarray): The check-in time of each guest.
+        checkout_time (numpy.ndarray): The checkout time of each guest.
+        activity (numpy.ndarray): The activity code each guest is doing.
+        waiting_since (numpy.ndarray): The time each guest started waiting for a resource.
+        rngs (list): The random stream of each guest.
+    """
+    COLUMNS = {
+        "guest": np.uint32,
+        "arrival": np.float64,
+        "has_luggage": np.bool_,
+        "luggage_handled": np.bool_,
+        "room": np.int32,
+        "room_service_order": np.int8,
+        "booking": np.int64,
+        "checkin_time": np.float64,
+        "checkout_time": np.float64,
+        "activity": np.int8,
+        "waiting_since": np.float64,
+    }
+
+    def __init__(self, capacity=1024):
+        """
+        Args:
+            capacity (int): The number of rows allocated at first.
+        """
+        self.capacity = 0
+        self.size = 0
+        self.peak = 0
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(0, dtype))
+        self.rngs = []
+        self._views = []
+        self._free = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.capacity] = column
+            setattr(self, name, grown)
+        self.rngs.extend([None] * (capacity - self.capacity))
+        self._views.extend(GuestRow(self, row) for row in range(self.capacity, capacity))
+        # Rows are handed out from the end of the free list, lowest first
+        self._free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def allocate(self, number, arrival, rng):
+        """
+        Fills a free row with a newly arrived guest, drawing whether they have luggage.
+
+        Args:
+            number (int): The unique number of the guest.
+            arrival (float): The arrival time of the guest.
+            rng: The guest's source of random numbers, with the API of the random module.
+
+        Returns:
+            int: The row of the guest.
+        """
+        if not self._free:
+            self._grow(2 * self.capacity)
+        row = self._free.pop()
+        self.guest[row] = number
+        self.arrival[row] = arrival
+        self.has_luggage[row] = rng.choice([True, False])
+        self.luggage_handled[row] = False
+        self.room[row] = -1
+        self.room_service_order[row] = -1
+        self.booking[row] = -1
+        self.checkin_time[row] = 0.0
+        self.checkout_time[row] = 0.0
+        self.rngs[row] = rng
+        self.size += 1
+        self.peak = max(self.peak, self.size)
+        return row
+
+    def release(self, row):
+        """
+        Returns the row of a guest who has left to the free list.
+        """
+        self.rngs[row] = None
+        self._free.append(row)
+        self.size -= 1
+
+    def __getitem__(self, row):
+        return self._views[row]
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """
+        int: The memory held by the columns, in bytes.
+        """
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+
+# Completed Stays
+class StayLog:
+    """
+    Collects the completed stays of a streaming run as columns, spilled to disk in chunks.
+
+    Stays are buffered in preallocated arrays of `chunk` rows. Each full chunk is appended to
+    `<path>/<column>.bin` (one file per column of STAY_COLUMNS, like the event trace). Running
+    totals and a quantile sketch of the time in hotel are kept for the summary of the run, so
+    the stays themselves never need to be read back. Without a path, only the totals are kept
+    and memory does not grow with the number of stays.
+
+    Attributes:
+        path (str): The directory the stays are written to, or None to keep only the totals.
+        count (int): The number of stays recorded.
+        checked_in (int): The number of stays of guests who got a room.
+        total_time_in_hotel (float): The sum of the times in hotel of the guests who got a room.
+        time_in_hotel (QuantileSketch): The distribution of the times in hotel of the guests who got a room.
+    """
+    def __init__(self, path=None, chunk=1 << 14):
+        """
+        Args:
+            path (str): Optional directory to write the stays to; created if needed, existing columns are replaced.
+            chunk (int): The number of stays buffered between two writes.
+        """
+        self.path = path
+        self.count = 0
+        self.checked_in = 0
+        self.total_time_in_hotel = 0.0
+        self.time_in_hotel = QuantileSketch()
+        self._columns = {name: np.zeros(chunk if path is not None else 0, dtype) for name, dtype in STAY_COLUMNS.items()}
+        self._buffered = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for name in STAY_COLUMNS:
+                open(os.path.join(path, f"{name}.bin"), "wb").close()
+
+    def record(self, guest, arrival, checkin_time, checkout_time, room, luggage_handled):
+        """
+        Appends one completed stay, writing out the buffered stays if the chunk is full.
+
+        Args:
+            guest (int): The number of the guest.
+            arrival (float): The arrival time.
+            checkin_time (float): The check-in time (0 without a room).
+            checkout_time (float): The checkout time.
+            room (int): The room number, or -1 if no room was available.
+            luggage_handled (bool): Whether the guest's luggage was handled.
+        """
+        self.count += 1
+        if room >= 0:
+            self.checked_in += 1
+            self.total_time_in_hotel += checkout_time - checkin_time
+            self.time_in_hotel.add(checkout_time - checkin_time)
+        if self.path is None:
+            return
+        slot = self._buffered
+        columns = self._columns
+        columns["guest"][slot] = guest
+        columns["arrival"][slot] = arrival
+        columns["checkin_time"][slot] = checkin_time
+        columns["checkout_time"][slot] = checkout_time
+        columns["room"][slot] = room
+        columns["luggage_handled"][slot] = luggage_handled
+        self._buffered = slot + 1
+        if self._buffered == len(columns["guest"]):
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out the buffered stays.
+        """
+        if not self._buffered:
+            return
+        for name, column in self._columns.items():
+            with open(os.path.join(self.path, f"{name}.bin"), "ab") as file:
+                column[:self._buffered].tofile(file)
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def stays(self):
+        """
+        Returns every recorded stay as a dict of column arrays.
+
+        Raises:
+            ValueError: If the log has no path, and so only kept the totals.
+        """
+        if self.path is None:
+            raise ValueError("The stays of a StayLog without a path are not kept.")
+        self.flush()
+        return load_stays(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_stays(path, mmap=True):
+    """
+    Loads the stays written by a StayLog as a dict of column arrays.
+
+    Args:
+        path (str): The directory of the stays.
+        mmap (bool): Memory-map the columns instead of reading them into memory.
+    """
+    return {name: (np.memmap(file, dtype=dtype, mode="r") if mmap and os.path.getsize(file)
+                   else np.fromfile(file, dtype=dtype))
+            for name, dtype in STAY_COLUMNS.items()
+            for file in [os.path.join(path, f"{name}.bin")]}
+
+
+# Streaming Simulation
+class StreamingHotelSimulation(HotelEventSimulation):
+    """
+    The discrete-event hotel simulation fed by a stream of arrival times.
+
+    Only the next arrival is on the event heap: when a guest arrives, they get a row of the
+    guest table and the following arrival time is pulled from the stream. At checkout the
+    guest's stay is recorded in the stay log, their room is returned to the available rooms
+    (or to the room inventory) and their row is recycled. Staff, seats and service times are those of HotelEventSimulation.
+
+    Attributes:
+        guests (GuestTable): The guests currently in the hotel.
+        streams (SeedStreams): The source of the guests' random streams, or None for the random module.
+        stays (StayLog): The log completed stays are recorded in, or None.
+        arrived (int): The number of guests who have arrived.
+        departed (int): The number of guests who have checked out.
+        max_guests (int): The number of guests after which the stream is no longer read, or None.
+    """
+    def __init__(self, arrivals, rooms, streams=None, stays=None, max_guests=None, table_capacity=1024, **kwargs):
+        """
+        Initializes the simulation and schedules the first arrival of the stream.
+
+        Args:
+            arrivals: An iterable of increasing arrival times (see poisson_arrivals and trace_arrivals).
+            rooms (list): The room numbers available for check-in; returned at checkout.
+            streams (SeedStreams): Optional source of a seeded random stream per guest.
+            stays (StayLog): Optional log to record the completed stays in.
+            max_guests (int): Optional number of guests after which no more arrivals are read.
+            table_capacity (int): The number of rows the guest table starts with.
+            **kwargs: The staff and seat capacities and the trace, as for HotelEventSimulation.
+        """
+        super().__init__([], rooms, **kwargs)
+        self.guests = GuestTable(table_capacity)
+        self._activity = self.guests.activity
+        self._waiting_since = self.guests.waiting_since
+        self.streams = streams
+        self.stays = stays
+        self.arrived = 0
+        self.departed = 0
+        self.max_guests = max_guests
+        self._arrivals = iter(arrivals)
+        self._schedule_arrival()
+
+    def _schedule_arrival(self):
+        if self.max_guests is not None and self.arrived >= self.max_guests:
+            return
+        arrival = next(self._arrivals, None)
+        if arrival is not None:
+            self.schedule(max(arrival - self.now, 0.0), ARRIVAL, _PENDING)
+
+    def run(self, until=None):
+        """
+        Processes events in time order until the stream and the hotel are empty or the clock passes `until`.
+
+        Returns:
+            GuestTable: The guests still in the hotel.
+        """
+        guests = super().run(until)
+        # Waits of guests read from the table columns are NumPy scalars
+        self.stage_waits = {stage: float(wait) for stage, wait in self.stage_waits.items()}
+        return guests
+
+    # Arrival
+    def _on_arrival(self, index):
+        self.arrived += 1
+        number = self.arrived
+        rng = random if self.streams is None else self.streams.stream("guest", number, block_size=16)
+        row = self.guests.allocate(number, self.now, rng)
+        # The columns are replaced when the table grows
+        self._activity = self.guests.activity
+        self._waiting_since = self.guests.waiting_since
+        self._schedule_arrival()
+        super()._on_arrival(row)
+
+    # Checkout
+    def _on_checkout_done(self, index):
+        super()._on_checkout_done(index)
+        table = self.guests
+        room = int(table.room[index])
+        if self.stays is not None:
+            self.stays.record(int(table.guest[index]), float(table.arrival[index]), float(table.checkin_time[index]),
+                              self.now, room, bool(table.luggage_handled[index]))
+        if room >= 0 and self.inventory is None:
+            self.available_rooms.append(str(room))
+        table.release(index)
+        self.departed += 1
+
+    def summary(self):
+        """
+        Returns the totals of the run: guests, stays, the peak occupancy of the table and its memory.
+        """
+        summary = {
+            "arrived": self.arrived,
+            "departed": self.departed,
+            "in_hotel": len(self.guests),
+            "peak_guests": self.guests.peak,
+            "table_bytes": self.guests.nbytes,
+            "virtual_seconds": self.now,
+            "events": self.events_processed,
+        }
+        if self.stays is not None:
+            summary["checked_in"] = self.stays.checked_in
+            if self.stays.checked_in:
+                summary["mean_time_in_hotel"] = self.stays.total_time_in_hotel / self.stays.checked_in
+                summary["median_time_in_hotel"] = self.stays.time_in_hotel.quantile(0.5)
+                summary["p90_time_in_hotel"] = self.stays.time_in_hotel.quantile(0.9)
+        return summary
+
+
+def make_streaming_simulation(arrivals, streams=None, stays=None, trace=None, capacities=None, max_guests=None,
+                              inventory=None, night_seconds=86400.0):
+    """
+    Initializes a StreamingHotelSimulation with the staff, seats and rooms of the hotel.
+
+    Args:
+        arrivals: An iterable of increasing arrival times.
+        streams (SeedStreams): Optional source of a seeded random stream per guest and of the room order.
+        stays (StayLog): Optional log to record the completed stays in.
+        trace (EventTrace): Optional trace to record guest events in, stamped with the virtual time.
+        capacities (dict): Optional capacities overriding those of CAPACITIES, by the same names.
+        max_guests (int): Optional number of guests after which no more arrivals are read.
+        inventory (RoomInventory): Optional room inventory for the guests' bookings.
+        night_seconds (float): The virtual seconds per calendar night of the inventory.
+
+    Returns:
+        StreamingHotelSimulation: The simulation, ready to run.
+    """
+    from simulations.hotel.hotel_simulation import CAPACITIES, room_numbers
+
+    capacities = {**CAPACITIES, **(capacities or {})}
+    rooms = room_numbers(capacities.pop("rooms"))
+    (streams.stream("model") if streams is not None else random).shuffle(rooms)
+    return StreamingHotelSimulation(arrivals, rooms, streams=streams, stays=stays, max_guests=max_guests,
+                                    trace=trace, inventory=inventory, night_seconds=night_seconds, **capacities)
@@ -0,0 +1,528 @@
+"""
+Live metrics of a running simulation: periodic gauge sampling and a local Prometheus endpoint.
+
+A `MetricsSampler` holds a set of gauges, small functions that read the current value of
+something in a simulation (free receptionists, a queue length, raised hands), and samples
+them all at a fixed interval: on the wall clock from a background thread for the threaded
+simulations, or on the virtual clock for the discrete-event hotel and the vectorized traffic
+engine, which are run in chunks of one interval. Every gauge keeps a `TimeSeries` of bounded
+size that is downsampled as the run grows, so memory does not depend on the run's length.
+
+Sampling is kept cheap: gauges only read counters the simulations already maintain, and the
+sampler measures its own cost and doubles its interval whenever sampling takes more than
+`max_overhead` (2% by default) of the elapsed time.
+
+`MetricsServer` serves the latest sample over HTTP on localhost, in the Prometheus text
+format at /metrics and as JSON time series at /series.
+
+Example:
+    python -m simulations.metrics hotel --mode event --size 100000 --interval 60 --port 9100
+    python -m simulations.metrics traffic --mode vectorized --size 10000 --grid 50 --interval 10
+    curl localhost:9100/metrics
+"""
+import argparse
+import contextlib
+import http.server
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from simulations import import_model
+from simulations.seeding import SeedStreams
+
+
+class TimeSeries:
+    """
+    A time series of at most `capacity` points, downsampled as it grows.
+
+    Points are appended until the series is full; then every two neighbouring points are
+    replaced by their mean, and from then on only every other appended point is kept. The
+    series always covers the whole run with between capacity / 2 and capacity points.
+
+    Attributes:
+        capacity (int): The maximum number of points.
+        stride (int): The number of appended points each stored point stands for.
+        size (int): The number of stored points.
+    """
+    def __init__(self, capacity=512):
+        self.capacity = capacity - capacity % 2
+        self.stride = 1
+        self.size = 0
+        self._times = np.empty(self.capacity)
+        self._values = np.empty(self.capacity)
+        self._skipped = 0
+
+    def append(self, now, value):
+        """
+        Appends a point, which is dropped if the series is currently keeping one point in `stride`.
+        """
+        self._skipped += 1
+        if self._skipped < self.stride:
+            return
+        self._skipped = 0
+        if self.size == self.capacity:
+            half = self.size // 2
+            self._times[:half] = self._times[1:self.size:2]
+            self._values[:half] = (self._values[0:self.size:2] + self._values[1:self.size:2]) / 2
+            self.size = half
+            self.stride *= 2
+        self._times[self.size] = now
+        self._values[self.size] = value
+        self.size += 1
+
+    @property
+    def times(self):
+        """
+        numpy.ndarray: The times of the stored points.
+        """
+        return self._times[:self.size]
+
+    @property
+    def values(self):
+        """
+        numpy.ndarray: The values of the stored points.
+        """
+        return self._values[:self.size]
+
+
+class Gauge:
+    """
+    A named value read from a simulation on every sample.
+
+    Attributes:
+        name (str): The metric name.
+        read (callable): Returns the current value: a number, or for a labeled gauge a dict
+            mapping tuples of label values to numbers, or a numpy array indexed by them.
+        help (str): The description of the metric.
+        labels (tuple): The label names of a labeled gauge, or () for a plain number.
+        series (TimeSeries): The sampled values; the total over all labels for a labeled gauge.
+    """
+    def __init__(self, name, read, help="", labels=(), capacity=512):
+        self.name = name
+        self.read = read
+        self.help = help
+        self.labels = tuple(labels)
+        self.series = TimeSeries(capacity)
+
+
+class MetricsSampler:
+    """
+    Samples a set of gauges at a fixed wall-clock or virtual-time interval.
+
+    Attributes:
+        interval (float): The time between samples, in seconds of the sampling clock; doubled
+            whenever sampling costs more than `max_overhead` of the elapsed time.
+        max_overhead (float): The largest fraction of the run's time sampling may take.
+        gauges (dict): Maps metric names to Gauge objects.
+        latest (dict): Maps metric names to their value in the latest sample.
+        time (float): The time of the latest sample, or None.
+        samples (int): The number of samples taken.
+        cost (float): The total wall-clock seconds spent sampling.
+    """
+    def __init__(self, interval=1.0, max_overhead=0.02, capacity=512):
+        """
+        Args:
+            interval (float): The initial time between samples.
+            max_overhead (float): The largest fraction of the run's time sampling may take.
+            capacity (int): The maximum number of points of every time series.
+        """
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.capacity = capacity
+        self.gauges = {}
+        self.latest = {}
+        self.time = None
+        self.samples = 0
+        self.cost = 0.0
+        self.start = time.perf_counter()
+        self._last_sample = self.start
+        self._stop = threading.Event()
+        self._thread = None
+
+    def gauge(self, name, read, help="", labels=()):
+        """
+        Registers a gauge (see Gauge) and returns it.
+        """
+        gauge = Gauge(name, read, help, labels, self.capacity)
+        self.gauges[name] = gauge
+        return gauge
+
+    def sample(self, now=None):
+        """
+        Reads every gauge and appends the values to their time series.
+
+        Args:
+            now (float): The time of the sample on the sampling clock; defaults to the wall-clock
+                seconds since the sampler was created.
+        """
+        started = time.perf_counter()
+        now = started - self.start if now is None else now
+        values = {}
+        for name, gauge in self.gauges.items():
+            value = gauge.read()
+            values[name] = value
+            if not gauge.labels:
+                gauge.series.append(now, value)
+            elif isinstance(value, dict):
+                gauge.series.append(now, sum(value.values()))
+            else:
+                gauge.series.append(now, value.sum())
+        # The HTTP server reads `latest` from another thread: it is replaced, never modified.
+        self.latest = values
+        self.time = now
+        self.samples += 1
+
+        finished = time.perf_counter()
+        cost = finished - started
+        self.cost += cost
+        if cost > self.max_overhead * (finished - self._last_sample):
+            self.interval *= 2
+        self._last_sample = finished
+
+    @property
+    def overhead(self):
+        """
+        float: The fraction of the wall-clock time since the sampler was created spent sampling.
+        """
+        return self.cost / max(time.perf_counter() - self.start, 1e-9)
+
+    # Wall clock
+    def start_thread(self):
+        """
+        Starts sampling every `interval` wall-clock seconds from a background thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics sampler", daemon=True)
+        self._thread.start()
+
+    def stop_thread(self):
+        """
+        Stops the background thread and takes a last sample.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    # Exposition
+    def prometheus(self):
+        """
+        Returns the latest sample in the Prometheus text exposition format.
+        """
+        latest = self.latest
+        lines = []
+        for name, gauge in self.gauges.items():
+            if name not in latest:
+                continue
+            lines.append(f"# HELP {name} {gauge.help}")
+            lines.append(f"# TYPE {name} gauge")
+            value = latest[name]
+            if not gauge.labels:
+                lines.append(f"{name} {_number(value)}")
+                continue
+            if isinstance(value, dict):
+                items = value.items()
+            else:
+                items = ((index, value[index]) for index in np.ndindex(value.shape))
+            for key, item in items:
+                labels = ",".join(f'{label}="{_escape(part)}"' for label, part in zip(gauge.labels, key))
+                lines.append(f"{name}{{{labels}}} {_number(item)}")
+        lines += [
+            "# HELP metrics_sample_time Time of the latest sample on the sampling clock, in seconds.",
+            "# TYPE metrics_sample_time gauge",
+            f"metrics_sample_time {_number(self.time or 0)}",
+            "# HELP metrics_sampling_overhead Fraction of the run's wall-clock time spent sampling.",
+            "# TYPE metrics_sampling_overhead gauge",
+            f"metrics_sampling_overhead {self.overhead:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """
+        Returns the time series of every gauge as a dictionary of lists.
+        """
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            "overhead": self.overhead,
+            "series": {name: {"times": gauge.series.times.tolist(), "values": gauge.series.values.tolist(),
+                              "stride": gauge.series.stride}
+                       for name, gauge in self.gauges.items()},
+        }
+
+    def report(self):
+        """
+        Formats a summary of every time series: the minimum, mean, maximum and last value.
+        """
+        lines = [f"{'Metric':<36} {'Points':>6} {'Min':>10} {'Mean':>10} {'Max':>10} {'Last':>10}"]
+        for name, gauge in self.gauges.items():
+            values = gauge.series.values
+            if not values.size:
+                continue
+            lines.append(f"{name:<36} {values.size:>6} {values.min():>10.4g} {values.mean():>10.4g} "
+                         f"{values.max():>10.4g} {values[-1]:>10.4g}")
+        lines += ["", f"{self.samples} samples, final interval {self.interval:g}s, "
+                      f"sampling overhead {self.overhead:.2%} of the run."]
+        return "\n".join(lines)
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsServer:
+    """
+    Serves the latest sample of a MetricsSampler over HTTP, from a background thread.
+
+    GET /metrics returns the Prometheus text format and GET /series the time series as JSON.
+
+    Attributes:
+        sampler (MetricsSampler): The sampler whose values are served.
+        address (tuple): The (host, port) the server listens on.
+    """
+    def __init__(self, sampler, port=9100, host="127.0.0.1"):
+        """
+        Starts listening; port 0 picks a free port.
+        """
+        self.sampler = sampler
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                path = handler.path.split("?")[0]
+                if path == "/metrics":
+                    body, content_type = sampler.prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/series":
+                    body, content_type = json.dumps(sampler.to_dict()), "application/json"
+                else:
+                    handler.send_error(404)
+                    return
+                data = body.encode()
+                handler.send_response(200)
+                handler.send_header("Content-Type", content_type)
+                handler.send_header("Content-Length", str(len(data)))
+                handler.end_headers()
+                handler.wfile.write(data)
+
+            def log_message(handler, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics server", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        """
+        str: The URL of the metrics page.
+        """
+        return f"http://{self.address[0]}:{self.address[1]}/metrics"
+
+    def close(self):
+        """
+        Stops the server and frees its port.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# Simulations
+def watch_hotel(sampler, staff, bar, restaurant):
+    """
+    Registers the hotel's gauges.
+
+    Args:
+        sampler (MetricsSampler): The sampler to register the gauges with.
+        staff (dict): Maps staff names to pools with `available` and waiting counts, as
+            ResourcePool or EventResource objects.
+        bar (callable): Returns the number of guests at the bar.
+        restaurant (callable): Returns the number of guests at the restaurant.
+    """
+    def waiting(pool):
+        return pool.waiting if hasattr(pool, "waiting") else len(pool.queue)
+
+    sampler.gauge("hotel_staff_free", lambda: {(name,): pool.available for name, pool in staff.items()},
+                  "Staff members not serving a guest.", ("staff",))
+    sampler.gauge("hotel_staff_queue", lambda: {(name,): waiting(pool) for name, pool in staff.items()},
+                  "Guests waiting for a staff member.", ("staff",))
+    sampler.gauge("hotel_bar_occupancy", bar, "Guests at the bar.")
+    sampler.gauge("hotel_restaurant_occupancy", restaurant, "Guests at the restaurant.")
+
+
+def watch_office(sampler, simulator):
+    """
+    Registers the number of employees working on and done with each task.
+    """
+    tasks = list(simulator.working)
+    sampler.gauge("office_employees_working", lambda: {(task,): count for task, count in simulator.working.items()},
+                  "Employees currently working on each task.", ("task",))
+    sampler.gauge("office_employees_done",
+                  lambda: {(task,): simulator.task_statistics.snapshot()[task]["count"] for task in tasks},
+                  "Employees who finished each task.", ("task",))
+
+
+def watch_classroom(sampler, classroom):
+    """
+    Registers the raised hands and the students left to present of the running class.
+    """
+    def read(name):
+        scheduler = classroom.current_scheduler
+        return getattr(scheduler, name) if scheduler is not None else 0
+
+    sampler.gauge("classroom_raised_hands", lambda: read("raised_hands"), "Students waiting with a raised hand.")
+    sampler.gauge("classroom_students_remaining", lambda: read("remaining"), "Students not called on yet.")
+
+
+def watch_traffic_threaded(sampler, traffic):
+    """
+    Registers the queue length of every intersection of the threaded traffic simulation.
+    """
+    structures = list(traffic.coordinate_dictionary.values())
+    sampler.gauge("traffic_queue_length",
+                  lambda: {(structure["x"], structure["y"], direction): len(structure[f"{direction}_queue"])
+                           for structure in structures for direction in ("right", "down")},
+                  "Cars waiting at an intersection.", ("x", "y", "direction"))
+
+
+def watch_traffic_grid(sampler, engine):
+    """
+    Registers the queue lengths at every intersection and the cars on the grid of a GridEngine.
+    """
+    # The engine replaces its queue arrays every tick, so reading them needs no copy.
+    sampler.gauge("traffic_right_queue_length", lambda: engine.right_queue,
+                  "Cars waiting to turn right at an intersection.", ("x", "y"))
+    sampler.gauge("traffic_down_queue_length", lambda: engine.down_queue,
+                  "Cars waiting to go down at an intersection.", ("x", "y"))
+    sampler.gauge("traffic_cars_on_grid", lambda: engine.cars_on_grid, "Cars that have not left the grid.")
+
+
+def run_sampled(model, mode, size, sampler, time_scale=0.01, seed=None, grid_size=None):
+    """
+    Runs a simulation while sampling its gauges.
+
+    The threaded modes are sampled on the wall clock from a background thread; the event
+    mode of the hotel and the vectorized traffic engine run on their virtual clock, in
+    chunks of one sampling interval.
+
+    Args:
+        model (str): "hotel", "office", "classroom" or "traffic".
+        mode (str): "threaded", "event" (hotel) or "vectorized" (traffic); the office always
+            runs threaded and the classroom has a single mode.
+        size (int): The number of guests, employees, students or cars.
+        sampler (MetricsSampler): The sampler to register the gauges with.
+        time_scale (float): Multiplier applied to the simulation's sleeps (threaded modes).
+        seed (int): Optional seed of the simulation's random streams.
+        grid_size (int): Squares per side of the vectorized traffic grid.
+    """
+    module = import_model(model)
+    streams = SeedStreams(seed) if seed is not None else None
+    if model == "hotel" and mode == "event":
+        simulation = module.make_event_simulation(size, streams=streams)
+        staff = {"receptionists": simulation.receptionists, "bellhops": simulation.bellhops,
+                 "housekeepers": simulation.housekeepers, "checkout_desk": simulation.checkout_desk}
+        watch_hotel(sampler, staff, lambda: simulation.guests_at_bar, lambda: simulation.guests_at_restaurant)
+        while simulation.pending_events:
+            simulation.run(simulation.now + sampler.interval)
+            sampler.sample(simulation.now)
+        return
+    if model == "traffic" and mode == "vectorized":
+        from simulations.traffic.grid_engine import GridEngine
+
+        grid_size = grid_size if grid_size is not None else module.number_of_x_squares
+        engine = GridEngine(grid_size, grid_size, size, seed=seed)
+        watch_traffic_grid(sampler, engine)
+        while engine.active.any():
+            engine.run(max(1, round(sampler.interval / engine.tick_seconds)))
+            sampler.sample(engine.tick * engine.tick_seconds)
+        return
+
+    if model == "hotel":
+        staff = {"receptionists": module.receptionists, "bellhops": module.bellhops,
+                 "housekeepers": module.housekeepers}
+        watch_hotel(sampler, staff, lambda: module.bar_seats.in_use, lambda: module.restaurant_seats.in_use)
+        run = lambda: module.run_threaded(size, time_scale, streams=streams)
+    elif model == "office":
+        simulator = module.Simulator(size, "threaded", time_scale=time_scale, verbose=False, streams=streams)
+        watch_office(sampler, simulator)
+        run = simulator.start
+    elif model == "classroom":
+        watch_classroom(sampler, module)
+        run = lambda: module.run_simulation(size, time_scale=time_scale, streams=streams)
+    elif model == "traffic":
+        watch_traffic_threaded(sampler, module)
+        run = lambda: module.run_threaded(size, time_scale, streams=streams)
+    else:
+        raise ValueError(f"Unknown simulation: {model}")
+
+    logging.disable(logging.INFO)
+    sampler.start_thread()
+    try:
+        with contextlib.redirect_stdout(None):
+            run()
+    finally:
+        sampler.stop_thread()
+        logging.disable(logging.NOTSET)
+
+
+def main(argv=None):
+    """
+    Parses the command line, runs a simulation with its metrics served over HTTP and prints a summary.
+    """
+    parser = argparse.ArgumentParser(description="Sample live metrics of a simulation and serve them over HTTP.")
+    parser.add_argument("model", choices=["hotel", "office", "classroom", "traffic"])
+    parser.add_argument("--mode", choices=["threaded", "event", "vectorized"], default="threaded",
+                        help="event (hotel) and vectorized (traffic) are sampled on their virtual clock.")
+    parser.add_argument("--size", type=int, default=None,
+                        help="The number of guests, employees, students or cars (default: the simulation's own).")
+    parser.add_argument("--grid", type=int, default=None, help="Squares per side of the vectorized traffic grid.")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiplier applied to every sleep.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the simulation's random streams.")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Seconds between samples: wall-clock seconds in threaded mode (default 0.05), "
+                             "virtual seconds otherwise (default 1).")
+    parser.add_argument("--max-overhead", type=float, default=0.02,
+                        help="Fraction of the run's time above which the interval is doubled.")
+    parser.add_argument("--port", type=int, default=9100, help="Port of the HTTP endpoint on localhost; 0 picks one.")
+    parser.add_argument("--no-server", action="store_true", help="Only sample, without serving the metrics.")
+    parser.add_argument("--hold", type=float, default=0,
+                        help="Keep serving the final values for this many seconds after the run.")
+    parser.add_argument("--json", default=None, metavar="FILE", help="Also write the time series as JSON.")
+    args = parser.parse_args(argv)
+
+    if (args.mode == "event" and args.model != "hotel") or (args.mode == "vectorized" and args.model != "traffic"):
+        parser.error(f"The {args.model} simulation has no {args.mode} mode.")
+    size = args.size if args.size is not None else {"hotel": 400, "office": 5, "classroom": 50, "traffic": 2}[args.model]
+    interval = args.interval if args.interval is not None else (0.05 if args.mode == "threaded" else 1.0)
+    sampler = MetricsSampler(interval, args.max_overhead)
+    server = None if args.no_server else MetricsServer(sampler, args.port)
+    if server is not None:
+        print(f"Serving metrics at {server.url}")
+    try:
+        run_sampled(args.model, args.mode, size, sampler, args.time_scale, args.seed, args.grid)
+        print(sampler.report())
+        if server is not None and args.hold:
+            time.sleep(args.hold)
+    finally:
+        if server is not None:
+            server.close()
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(sampler.to_dict(), file)
+
+
+if __name__ == "__main__":
+    main()
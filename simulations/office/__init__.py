@@ -0,0 +1,10 @@
+"""
+The busy office simulation, threaded or on asyncio.
+"""
+from simulations import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "Employee": "office_simulation",
+    "Simulator": "office_simulation",
+    "TaskAggregates": "task_statistics",
+})
@@ -0,0 +1,273 @@
+import asyncio
+import contextlib
+import sys
+import threading
+import random
+import time
+import concurrent.futures
+import traceback
+
+from simulations.office.task_statistics import TaskAggregates
+
+TASKS = ["Typing on a computer", "Making phone calls", "Taking breaks"]
+
+# Times the stages of an employee; simulations.profiling swaps in a timer when a run is profiled
+profile_stage = contextlib.nullcontext
+
+
+def draw_assignments(generator, size):
+    """
+    Draws the task and time spent of `size` employees at once from a NumPy Generator.
+
+    Returns:
+        tuple: The index in TASKS and the hours spent (1 to 10) of each employee.
+    """
+    return generator.integers(0, len(TASKS), size), generator.integers(1, 11, size)
+
+
+class Employee:
+    """
+    Represents an employee performing various tasks in a simulated office environment.
+
+    Attributes:
+        employee_id (int): The unique ID of the employee.
+        task (str): The task assigned to the employee.
+        time_spent (int): The time the employee spends on the task.
+        simulator (Simulator): The simulator instance managing the simulation.
+    """
+    __slots__ = ("employee_id", "task", "time_spent", "simulator")
+
+    def __init__(self, employee_id, simulator):
+        """
+        Initializes an Employee instance with a unique ID, assigned task, and time spent on the task.
+
+        Args:
+            employee_id (int): The unique ID of the employee.
+            simulator (Simulator): The simulator instance managing the simulation.
+        """
+        self.employee_id = employee_id
+        if simulator.assignments is not None:
+            task, self.time_spent = simulator.assignments[employee_id]
+            self.task = TASKS[task]
+        else:
+            self.task = random.choice(TASKS)
+            self.time_spent = random.randint(1, 10)
+        self.simulator = simulator
+
+    def start(self):
+        """
+        Simulates the employee performing their task for a random amount of time.
+        After completing the task, the employee adds themselves to the simulator's queue.
+        """
+        try:
+            with profile_stage("Employee.start"):
+                if self.simulator.verbose:
+                    print(f"Employee {self.employee_id} is {self.task}.")
+                with self.simulator.queue_lock:
+                    self.simulator.working[self.task] += 1
+                with profile_stage("task"):
+                    time.sleep(self.time_spent * self.simulator.time_scale)
+                if self.simulator.verbose:
+                    print(f"Employee {self.employee_id} finished their task after {self.time_spent} hours.")
+                with profile_stage("queue"):
+                    self.simulator.addEmployeeToQueue(self)
+        except Exception:
+            traceback.print_exc()
+
+    async def start_async(self):
+        """
+        Coroutine version of `start`, used by the asyncio execution mode.
+        The employee waits on the event loop instead of blocking a thread while performing their task.
+        """
+        try:
+            if self.simulator.verbose:
+                print(f"Employee {self.employee_id} is {self.task}.")
+            with self.simulator.queue_lock:
+                self.simulator.working[self.task] += 1
+            await asyncio.sleep(self.time_spent * self.simulator.time_scale)
+            if self.simulator.verbose:
+                print(f"Employee {self.employee_id} finished their task after {self.time_spent} hours.")
+            self.simulator.addEmployeeToQueue(self)
+        except Exception:
+            traceback.print_exc()
+
+class Simulator:
+    """
+    Manages the simulation of the office environment, including the behavior of multiple employees.
+
+    Attributes:
+        num_employees (int): The number of employees in the simulation.
+        employee_queue (list): The queue of employees in the simulation.
+        queue_lock (threading.Lock): A lock for synchronizing access to the employee queue.
+        report_lock (threading.Lock): A lock for synchronizing access to the final report.
+        final_report (dict): A dictionary storing the behavior and time spent by each employee, or
+            None when only the task statistics are kept.
+        task_statistics (TaskAggregates): Running statistics of the time spent on each task.
+        working (dict): The number of employees currently working on each task.
+        mode (str): The execution mode, "threaded" or "asyncio".
+        time_scale (float): Wall-clock seconds per simulated hour of work.
+        max_concurrency (int): In asyncio mode, the maximum number of employees working at once.
+        verbose (bool): Whether employees print their progress.
+        assignments: The employees' tasks and times, drawn in seeded blocks, or None to use the random module.
+    """
+    def __init__(self, num_employees, mode="threaded", time_scale=1.0, max_concurrency=None, verbose=True,
+                 streams=None, keep_report=True):
+        """
+        Initializes the Simulator instance with a specified number of employees.
+
+        Args:
+            num_employees (int): The number of employees in the simulation.
+            mode (str): "threaded" runs one thread per employee; "asyncio" runs one coroutine per employee.
+            time_scale (float): Wall-clock seconds per simulated hour of work.
+            max_concurrency (int): In asyncio mode, the maximum number of employees working at once;
+                None lets every employee work at the same time.
+            verbose (bool): Whether employees print their progress.
+            streams (SeedStreams): Optional source of seeded random streams; each employee's task and
+                time are then drawn in vectorized blocks and depend only on the seed and employee ID.
+            keep_report (bool): Whether to keep each employee's task and time in `final_report`, for
+                the per-employee table; without it, memory does not grow with the number of employees.
+        """
+        if mode not in ("threaded", "asyncio"):
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.num_employees = num_employees
+        self.mode = mode
+        self.time_scale = time_scale
+        self.max_concurrency = max_concurrency
+        self.verbose = verbose
+        self.employee_queue = []
+        self.queue_lock = threading.Lock()
+        self.report_lock = threading.Lock()
+        self.final_report = {} if keep_report else None
+        self.task_statistics = TaskAggregates(TASKS)
+        self.working = dict.fromkeys(TASKS, 0)
+        self.assignments = streams.blocks("employee", draw_assignments) if streams is not None else None
+
+    def start(self):
+        """
+        Starts the simulation in the configured execution mode.
+        In threaded mode a new thread is created for each employee, each simulating the behavior of a different employee.
+        """
+        if self.mode == "asyncio":
+            asyncio.run(self.start_async())
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_employees) as executor:
+            self.employee_queue = [Employee(employee_id, self) for employee_id in range(1, self.num_employees + 1)]
+            for i in self.employee_queue:
+                executor.submit(i.start)
+
+    async def start_async(self):
+        """
+        Runs the simulation on an asyncio event loop with one lightweight coroutine per employee.
+        Employees are created as they start working and dropped once they have reported. With
+        `max_concurrency`, memory is therefore bounded by that limit; without it, every employee
+        works at once and all of them are in memory together. The per-employee `final_report`
+        grows with the total unless it is turned off with `keep_report`.
+        """
+        limit = asyncio.Semaphore(self.max_concurrency or self.num_employees)
+        async with asyncio.TaskGroup() as group:
+            for employee_id in range(1, self.num_employees + 1):
+                await limit.acquire()
+                task = group.create_task(Employee(employee_id, self).start_async())
+                task.add_done_callback(lambda _: limit.release())
+
+    def addEmployeeToQueue(self, employee):
+        """
+        Allows an employee to add themselves to the simulator's queue after completing their task.
+        The running task statistics are updated at the same time, so reports never have to rescan the employees.
+
+        Args:
+            employee (Employee): The employee adding themselves to the queue.
+        """
+        with self.queue_lock:
+            self.working[employee.task] -= 1
+        if self.final_report is None:
+            self.task_statistics.add(employee.task, employee.time_spent)
+            return
+        entry = [employee.task, employee.time_spent]
+        if self.final_report.setdefault(employee.employee_id, entry) is entry:
+            self.task_statistics.add(employee.task, employee.time_spent)
+
+    def snapshot(self):
+        """
+        Returns the current statistics of each task. This is O(number of tasks), so it can be called
+        repeatedly while the simulation is running.
+
+        Returns:
+            dict: Maps each task to its count, total, mean, variance, min, max and quantiles.
+        """
+        return self.task_statistics.snapshot()
+
+    def getReport(self, tabular=False):
+        """
+        Generates and prints a report of the simulation.
+        The report includes a count of unique tasks, the total time spent on each task and its distribution.
+
+        Args:
+            tabular (bool): Also print the behavior and time spent by each employee as a pandas table
+                (only if the simulator keeps the per-employee report).
+        """
+        with self.report_lock:
+            snapshot = self.snapshot()
+            if tabular and self.final_report is not None:
+                import pandas as pd
+
+                print("\nEmployee Report:\n")
+                df = pd.DataFrame.from_dict(dict(self.final_report), orient='index', columns=["Task", "Time Spent"])
+                df.index.name = 'Employee ID'
+                print(df.to_string(index=True, header=True))
+
+                print("\nTask Report:\n")
+                columns = ["Task", "Amount of Employees", "Total Task Time"]
+                values = [[task, info["count"], info["total"]] for task, info in snapshot.items()]
+                df2 = pd.DataFrame(values, columns=columns)
+                print(df2.to_string(index=False, header=True))
+                return
+
+            print("\nTask Report:\n")
+            columns = ["Task", "Amount of Employees", "Total Task Time", "Mean", "Std Dev", "Median", "P90"]
+            rows = [columns]
+            for task, info in snapshot.items():
+                rows.append([
+                    task,
+                    info["count"],
+                    info["total"],
+                    f"{info['mean']:.2f}",
+                    f"{info['variance'] ** 0.5:.2f}",
+                    "" if info["p50"] is None else f"{info['p50']:.2f}",
+                    "" if info["p90"] is None else f"{info['p90']:.2f}",
+                ])
+            widths = [max(len(str(row[i])) for row in rows) for i in range(len(columns))]
+            for row in rows:
+                print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+def run_command(args):
+    """
+    Runs the simulation configured on the command line and prints its report.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments of the office command (see simulations.cli).
+    """
+    streams = None
+    if args.seed is not None:
+        from simulations.seeding import SeedStreams
+
+        streams = SeedStreams(args.seed)
+    simulator = Simulator(args.employees, args.mode, args.time_scale, args.max_concurrency, not args.quiet, streams,
+                          keep_report=args.table)
+    with profile_stage("simulate"):
+        simulator.start()
+    with profile_stage("report"):
+        simulator.getReport(tabular=args.table)
+
+
+def main(argv=None):
+    """
+    Parses the command line, runs the simulation and prints its report.
+    """
+    from simulations.cli import main as cli_main
+
+    cli_main(["office", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import itertools
+import threading
+
+from simulations.sketches import QuantileSketch
+
+
+class RunningStatistics:
+    """
+    Streaming count, total, mean, variance, minimum and maximum of a series of values.
+
+    Uses Welford's algorithm, so values are never stored, and two instances can be merged.
+
+    Attributes:
+        count (int): The number of values added.
+        total (float): The sum of the values.
+        mean (float): The mean of the values.
+        minimum (float): The smallest value, or None if no value has been added.
+        maximum (float): The largest value, or None if no value has been added.
+    """
+    __slots__ = ("count", "total", "mean", "_m2", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        """
+        Adds one value to the statistics.
+        """
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        """
+        Adds the values summarized by another RunningStatistics to this one.
+        """
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.total, self.mean, self._m2 = other.count, other.total, other.mean, other._m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self):
+        """
+        float: The sample variance of the values, or 0.0 for fewer than two values.
+        """
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+class _TaskShard:
+    """
+    The statistics of every task updated by the threads assigned to one shard.
+    """
+    __slots__ = ("lock", "statistics", "sketches")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statistics = {}
+        self.sketches = {}
+
+
+class TaskAggregates:
+    """
+    Per-task running statistics, updated concurrently as employees finish their tasks.
+
+    Updates are spread over a fixed number of shards, each with its own lock; threads are
+    assigned to shards round-robin the first time they record a value, so concurrent
+    employees rarely contend. A snapshot merges the shards, which costs O(shards * tasks)
+    no matter how many employees have reported.
+
+    Attributes:
+        tasks (list): The task names, in report order.
+        quantiles (tuple): The quantiles included in snapshots.
+    """
+    def __init__(self, tasks, shards=16, quantiles=(0.5, 0.9, 0.99), relative_accuracy=0.01):
+        """
+        Initializes empty statistics for each task.
+
+        Args:
+            tasks (list): The task names, in report order.
+            shards (int): The number of independently locked shards.
+            quantiles (tuple): The quantiles included in snapshots.
+            relative_accuracy (float): The relative accuracy of the quantile sketches.
+        """
+        self.tasks = list(tasks)
+        self.quantiles = quantiles
+        self.relative_accuracy = relative_accuracy
+        self._shards = [_TaskShard() for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._shards[next(self._next_shard) % len(self._shards)]
+            self._local.shard = shard
+        return shard
+
+    def add(self, task, value):
+        """
+        Records that an employee spent `value` hours on `task`.
+        """
+        shard = self._shard()
+        with shard.lock:
+            statistics = shard.statistics.get(task)
+            if statistics is None:
+                statistics = shard.statistics[task] = RunningStatistics()
+                shard.sketches[task] = QuantileSketch(self.relative_accuracy)
+            statistics.add(value)
+            shard.sketches[task].add(value)
+
+    def snapshot(self):
+        """
+        Returns the current statistics of every task.
+
+        Returns:
+            dict: Maps each task to its count, total, mean, variance, min, max and quantiles (p50, p90, ...).
+        """
+        merged = {task: (RunningStatistics(), QuantileSketch(self.relative_accuracy)) for task in self.tasks}
+        for shard in self._shards:
+            with shard.lock:
+                for task, statistics in shard.statistics.items():
+                    if task not in merged:
+                        merged[task] = (RunningStatistics(), QuantileSketch(self.relative_accuracy))
+                    merged[task][0].merge(statistics)
+                    merged[task][1].merge(shard.sketches[task])
+
+        snapshot = {}
+        for task, (statistics, sketch) in merged.items():
+            snapshot[task] = {
+                "count": statistics.count,
+                "total": statistics.total,
+                "mean": statistics.mean,
+                "variance": statistics.variance,
+                "min": statistics.minimum,
+                "max": statistics.maximum,
+            }
+            for q in self.quantiles:
+                snapshot[task][f"p{q * 100:g}"] = sketch.quantile(q)
+        return snapshot
@@ -0,0 +1,518 @@
+"""
+Profiling of a simulation run: per-stage timings, memory peaks and CPU profiles.
+
+`python -m simulations <simulation> --profile DIR` runs a simulation under a `Profiler` and
+writes its report to DIR when the run ends, even if it fails or is interrupted:
+
+- Stage timings. The hot paths of the threaded simulations are split into named stages
+  (each stage of `guest_process`, each car move, each teacher iteration of
+  `call_on_student`, each `Employee.start`, and the simulation and report of every run).
+  The simulation modules time them with a module-level `profile_stage`, which is
+  `contextlib.nullcontext` until a profiler swaps in a `StageTimer`. The timer records the
+  calls, wall time (`perf_counter_ns`) and CPU time of the thread (`thread_time_ns`) of every
+  stack of nested stages. Each thread keeps its own totals, so timing takes no lock.
+  The wall time that a stage does not spend on CPU is spent sleeping or waiting for locks.
+- Memory. `tracemalloc` traces allocations, and a background thread takes a snapshot each
+  time the traced memory grows 10% past the last snapshot, so the last snapshot shows what
+  was allocated near the peak.
+- Optionally, the stacks of all threads are sampled at a fixed interval (`--profile-sample`),
+  and cProfile runs in every thread (`--profile-cprofile`).
+
+Stage times, samples and allocations at the peak are written as folded stacks (`a;b;c value`
+per line), which flamegraph.pl, speedscope and inferno render as flame graphs. The text report
+summarizes everything in one place.
+
+Example:
+    python -m simulations hotel --guests 400 --time-scale 0.01 --profile profile
+    python -m simulations traffic --cars 50 --time-scale 0.01 --profile profile --profile-sample 0.005
+    flamegraph.pl profile/stages.folded > stages.svg
+"""
+import contextlib
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "stack", "totals", "wall", "cpu")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.stack, self.totals = self.timer._thread_state()
+        self.stack.append(self.name)
+        self.cpu = time.thread_time_ns()
+        self.wall = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter_ns() - self.wall
+        cpu = time.thread_time_ns() - self.cpu
+        path = tuple(self.stack)
+        self.stack.pop()
+        entry = self.totals.get(path)
+        if entry is None:
+            self.totals[path] = [1, wall, cpu]
+        else:
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+        return False
+
+
+class StageTimer:
+    """
+    Times named, nested stages in every thread.
+
+    Calling the timer with a stage name returns a context manager timing that stage, so a
+    timer replaces `contextlib.nullcontext` as the `profile_stage` of a simulation module.
+    Stages opened inside another stage of the same thread are recorded under its path.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._tables = []
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        return _Stage(self, name)
+
+    def _thread_state(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = ([], {})
+            with self._lock:
+                self._tables.append(state[1])
+            return state
+
+    def totals(self):
+        """
+        Returns the totals of all threads.
+
+        Returns:
+            dict: Maps each path of stage names (tuple) to [calls, wall ns, CPU ns].
+        """
+        merged = {}
+        with self._lock:
+            tables = list(self._tables)
+        for table in tables:
+            for path, (calls, wall, cpu) in list(table.items()):
+                entry = merged.setdefault(path, [0, 0, 0])
+                entry[0] += calls
+                entry[1] += wall
+                entry[2] += cpu
+        return merged
+
+    def overhead(self, repeat=10000):
+        """
+        Measures the cost of timing one stage, by timing empty stages.
+
+        Returns:
+            float: The mean cost of a stage, in nanoseconds.
+        """
+        timer = StageTimer()
+        start = time.perf_counter_ns()
+        for _ in range(repeat):
+            with timer("overhead"):
+                pass
+        return (time.perf_counter_ns() - start) / repeat
+
+
+def self_times(totals, column=1):
+    """
+    Subtracts from each stage the time of the stages nested directly inside it.
+
+    Args:
+        totals (dict): The totals of a StageTimer.
+        column (int): 1 for the wall time, 2 for the CPU time.
+
+    Returns:
+        dict: Maps each path to the time spent in the stage itself, in nanoseconds.
+    """
+    result = {path: entry[column] for path, entry in totals.items()}
+    for path, entry in totals.items():
+        if len(path) > 1 and path[:-1] in result:
+            result[path[:-1]] -= entry[column]
+    return {path: max(0, value) for path, value in result.items()}
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of all threads from a background thread.
+
+    Attributes:
+        interval (float): The seconds between samples.
+        counts (dict): Maps each folded stack (root first) to its number of samples.
+        samples (int): The number of times the threads were sampled.
+        ignore (set): The identifiers of threads not to sample, besides the sampler's own.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self.ignore = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        self.ignore.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident in self.ignore:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code.co_name, frame.f_code.co_filename, frame.f_code.co_firstlineno))
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+
+def _frame_name(function, filename, line):
+    return f"{function} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+class MemoryTracker:
+    """
+    Traces allocations with tracemalloc and keeps a snapshot taken close to the peak.
+
+    A background thread polls the traced memory and takes a new snapshot whenever it has grown
+    by `growth` since the last one, so at most a few snapshots are taken however long the run.
+
+    Attributes:
+        frames (int): The number of frames kept per allocation.
+        peak (int): The peak traced memory, in bytes.
+        snapshot (tracemalloc.Snapshot): The last snapshot, or None.
+        snapshot_size (int): The traced memory when the snapshot was taken, in bytes.
+        snapshot_time (float): The seconds since the start when the snapshot was taken.
+    """
+    def __init__(self, frames=8, interval=0.05, growth=0.1):
+        self.frames = frames
+        self.interval = interval
+        self.growth = growth
+        self.peak = 0
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.snapshot_time = 0.0
+        self._filtered = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="memory tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._check()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._check()
+
+    def _check(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current > self.snapshot_size * (1 + self.growth):
+            self.snapshot_time = time.perf_counter() - self.start_time
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+            self._filtered = None
+
+    def _statistics(self, key):
+        if self._filtered is None:
+            # Filtering is slow, so it waits for the report rather than slowing the run.
+            self._filtered = self.snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+        return self._filtered.statistics(key)
+
+    def top(self, limit=10):
+        """
+        Returns the source lines that had the most memory allocated at the snapshot.
+
+        Returns:
+            list: tracemalloc.Statistic objects, largest first.
+        """
+        return self._statistics("lineno")[:limit] if self.snapshot is not None else []
+
+    def folded(self):
+        """
+        Returns the allocations of the snapshot as folded stacks.
+
+        Returns:
+            dict: Maps each folded traceback (root first) to the bytes allocated there.
+        """
+        stacks = {}
+        if self.snapshot is not None:
+            for statistic in self._statistics("traceback"):
+                key = ";".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in statistic.traceback)
+                stacks[key] = stacks.get(key, 0) + statistic.size
+        return stacks
+
+
+class ThreadProfiles:
+    """
+    Runs a cProfile profiler in the current thread and in every thread started afterwards.
+
+    Attributes:
+        profiles (list): The cProfile.Profile objects, one per thread.
+    """
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        self._enable()
+
+    def stop(self):
+        threading.setprofile(None)
+        for profile in self.profiles:
+            profile.disable()
+
+    def _enable(self):
+        import cProfile
+
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def _start_thread(self, frame, event, arg):
+        sys.setprofile(None)
+        self._enable()
+
+    def stats(self):
+        """
+        Returns the statistics of all threads merged.
+
+        Returns:
+            pstats.Stats: The merged statistics.
+        """
+        import io
+        import pstats
+
+        stats = pstats.Stats(self.profiles[0], stream=io.StringIO())
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+class Profiler:
+    """
+    Profiles a simulation run and writes its report.
+
+    Attributes:
+        name (str): The name of the run, the root of every folded stack.
+        directory (str): The directory the report is written to.
+        stages (StageTimer): The timer of the simulation's stages.
+        memory (MemoryTracker): The allocation tracker, or None.
+        sampler (StackSampler): The stack sampler, or None.
+        cpu_profiles (ThreadProfiles): The cProfile profilers, or None.
+        wall (float): The wall-clock duration of the run, in seconds.
+        cpu (float): The CPU time of the process during the run, in seconds.
+    """
+    def __init__(self, name, directory, sample=None, cprofile=False, frames=8):
+        """
+        Initializes a profiler; nothing is traced until `start`.
+
+        Args:
+            name (str): The name of the run.
+            directory (str): The directory the report is written to.
+            sample (float): Optional interval in seconds at which to sample the stacks of all threads.
+            cprofile (bool): Whether to run cProfile in every thread.
+            frames (int): The number of frames kept per allocation; 0 does not trace memory.
+        """
+        self.name = name
+        self.directory = directory
+        self.stages = StageTimer()
+        self.memory = MemoryTracker(frames) if frames > 0 else None
+        self.sampler = StackSampler(sample) if sample else None
+        self.cpu_profiles = ThreadProfiles() if cprofile else None
+        self.wall = self.cpu = 0.0
+        self._undo = []
+
+    def attach(self, module):
+        """
+        Replaces the `profile_stage` of a simulation module by the profiler's stage timer.
+        """
+        original = module.profile_stage
+        module.profile_stage = self.stages
+        self._undo.append(lambda: setattr(module, "profile_stage", original))
+
+    def start(self):
+        self._overhead = self.stages.overhead()
+        if self.memory is not None:
+            self.memory.start()
+        if self.sampler is not None:
+            if self.memory is not None:
+                self.sampler.ignore.add(self.memory._thread.ident)
+            self.sampler.start()
+        if self.cpu_profiles is not None:
+            self.cpu_profiles.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def stop(self):
+        self.wall = time.perf_counter() - self._wall
+        self.cpu = time.process_time() - self._cpu
+        if self.cpu_profiles is not None:
+            self.cpu_profiles.stop()
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.memory is not None:
+            self.memory.stop()
+        while self._undo:
+            self._undo.pop()()
+
+    # Report
+    def report(self):
+        """
+        Returns the text report of the run.
+        """
+        totals = self.stages.totals()
+        lines = [f"Profile of {self.name}: {self.wall:.3f}s wall-clock time, {self.cpu:.3f}s CPU time.", ""]
+        if totals:
+            lines += self._stage_report(totals)
+        else:
+            lines.append("No stages were timed in this mode; see the samples or the CPU profile.")
+        if self.memory is not None:
+            lines += ["", f"Memory (tracemalloc, {self.memory.frames} frames): peak {_mib(self.memory.peak)}, "
+                          f"snapshot at {_mib(self.memory.snapshot_size)} after {self.memory.snapshot_time:.3f}s.",
+                      "Largest allocations at the snapshot:"]
+            for statistic in self.memory.top():
+                frame = statistic.traceback[-1]
+                lines.append(f"  {_mib(statistic.size):>10}  {statistic.count:>8} blocks  "
+                             f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        if self.sampler is not None:
+            lines += ["", f"Stacks of all threads sampled {self.sampler.samples} times, "
+                          f"every {self.sampler.interval * 1000:g} ms."]
+        if self.cpu_profiles is not None:
+            import io
+
+            stream = io.StringIO()
+            stats = self.cpu_profiles.stats()
+            stats.stream = stream
+            stats.sort_stats("cumulative").print_stats(20)
+            lines += ["", f"CPU profile (cProfile, {len(self.cpu_profiles.profiles)} threads):",
+                      stream.getvalue().strip("\n")]
+        return "\n".join(lines) + "\n"
+
+    def _stage_report(self, totals):
+        self_wall = self_times(totals, 1)
+        stages = sum(entry[0] for entry in totals.values())
+        header = f"  {'stage':<36}{'calls':>10}{'wall ms':>12}{'mean us':>12}{'self ms':>12}{'cpu ms':>12}{'cpu %':>8}"
+        lines = ["Stages, summed over threads (wall time not spent on CPU is spent sleeping or waiting):", header]
+
+        def add(parent):
+            children = sorted((path for path in totals if path[:-1] == parent), key=lambda path: -totals[path][1])
+            for path in children:
+                calls, wall, cpu = totals[path]
+                label = "  " * (len(path) - 1) + path[-1]
+                lines.append(f"  {label:<36}{calls:>10}{wall / 1e6:>12.3f}{wall / calls / 1e3:>12.1f}"
+                             f"{self_wall[path] / 1e6:>12.3f}{cpu / 1e6:>12.3f}{100 * cpu / max(wall, 1):>7.1f}%")
+                add(path)
+
+        add(())
+        lines.append(f"Timing cost about {self._overhead / 1e3:.2f} us per stage, "
+                     f"{stages * self._overhead / 1e9:.3f}s for {stages} stages.")
+        return lines
+
+    def write(self):
+        """
+        Writes the report and the folded stacks to the directory.
+
+        Returns:
+            list: The paths of the files written.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+
+        def write(filename, text):
+            path = os.path.join(self.directory, filename)
+            with open(path, "w") as file:
+                file.write(text)
+            paths.append(path)
+
+        totals = self.stages.totals()
+        if totals:
+            # Flame graphs add up the children, so each stack holds the time of the stage itself.
+            write("stages.folded", _folded(self.name, {";".join(path): value // 1000
+                                                       for path, value in self_times(totals, 1).items()}))
+            write("stages-cpu.folded", _folded(self.name, {";".join(path): value // 1000
+                                                           for path, value in self_times(totals, 2).items()}))
+        if self.sampler is not None:
+            write("samples.folded", _folded(self.name, self.sampler.counts))
+        if self.memory is not None:
+            write("memory.folded", _folded(self.name, self.memory.folded()))
+        if self.cpu_profiles is not None:
+            path = os.path.join(self.directory, "cprofile.pstats")
+            self.cpu_profiles.stats().dump_stats(path)
+            paths.append(path)
+        write("report.txt", self.report())
+        return paths
+
+
+def _folded(root, stacks):
+    return "".join(f"{root};{stack} {value}\n" for stack, value in sorted(stacks.items()) if value > 0)
+
+
+def _mib(size):
+    return f"{size / 2 ** 20:.2f} MiB"
+
+
+@contextlib.contextmanager
+def profiling(profiler, *modules):
+    """
+    Profiles the body of the `with` block, with the stages of the given modules timed, and
+    writes the report at the end, even if the block fails.
+
+    Args:
+        profiler (Profiler): The profiler.
+        modules: The simulation modules whose `profile_stage` is timed.
+    """
+    for module in modules:
+        profiler.attach(module)
+    profiler.start()
+    try:
+        with profiler.stages("run"):
+            yield profiler
+    finally:
+        profiler.stop()
+        paths = profiler.write()
+        print(profiler.report(), end="")
+        print(f"Profile written to {', '.join(paths)}.")
+
+
+def run_profiled(module, args):
+    """
+    Runs a simulation command under a profiler configured on the command line.
+
+    Args:
+        module (module): The simulation module, with a run_command(args) function and a profile_stage.
+        args (argparse.Namespace): The parsed arguments, with the profiling options of simulations.cli.
+    """
+    profiler = Profiler(args.command, args.profile, args.profile_sample, args.profile_cprofile, args.profile_frames)
+    with profiling(profiler, module):
+        return module.run_command(args)
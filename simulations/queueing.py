@@ -0,0 +1,436 @@
+"""
+Closed-form queueing estimates of the hotel and the office, with a simulation fallback.
+
+The hotel's reception desk, bellhops and checkout desk are multi-server FIFO queues
+(M/G/c under Poisson arrivals: Erlang-C with the Allen-Cunneen correction for the service
+time variability, which is exact for the single checkout desk), and the housekeepers are a
+loss system whose blocked guests retry (Erlang-B). The office with a concurrency limit is a
+batch of employees served by c slots. From the staffing and the service-time distributions
+of the models, these give expected waits, utilizations, queue lengths and stay times
+instantly.
+
+The formulas only hold under their assumptions: Poisson arrivals, stable queues, bar and
+restaurant seats and rooms that never run out, and enough employees per slot. When an
+assumption fails, the estimate falls back to simulating the model on the virtual clock,
+and reports which assumptions failed and how far the formulas were from the simulation.
+
+Example:
+    python -m simulations.queueing hotel --arrival-rate 10 --set receptionists=4
+    python -m simulations.queueing office --employees 5000 --max-concurrency 50
+"""
+import argparse
+import heapq
+import math
+
+import numpy as np
+
+from simulations import import_model
+from simulations.seeding import SeedStreams
+
+# Blocking probability of bar or restaurant seats above which their capacity is considered binding
+SEAT_TOLERANCE = 0.01
+
+# Blocking probability of housekeepers above which the retrial approximation is not trusted
+RETRY_TOLERANCE = 0.2
+
+# Minimum number of employees per slot for the office's fluid approximation
+OFFICE_MIN_LOAD = 20
+
+
+# Formulas
+def uniform_moments(low, high):
+    """
+    Returns the mean and second moment of a uniform distribution on [low, high].
+    """
+    return (low + high) / 2, (low * low + low * high + high * high) / 3
+
+
+def mixture_moments(*components):
+    """
+    Returns the mean and second moment of a mixture of (probability, mean, second moment) components.
+    """
+    return (sum(p * mean for p, mean, _ in components),
+            sum(p * second for p, _, second in components))
+
+
+def erlang_b(servers, load):
+    """
+    Returns the Erlang-B blocking probability of `servers` servers offered `load` Erlangs.
+    """
+    blocking = 1.0
+    for k in range(1, servers + 1):
+        blocking = load * blocking / (k + load * blocking)
+    return blocking
+
+
+def erlang_c(servers, load):
+    """
+    Returns the Erlang-C probability that an arrival waits, or 1 if the queue is unstable.
+    """
+    utilization = load / servers
+    if utilization >= 1:
+        return 1.0
+    blocking = erlang_b(servers, load)
+    return blocking / (1 - utilization * (1 - blocking))
+
+
+def mgc(arrival_rate, mean_service, second_moment, servers):
+    """
+    Estimates an M/G/c queue with the Allen-Cunneen approximation (exact for M/M/c and M/G/1).
+
+    Args:
+        arrival_rate (float): Arrivals per unit of time.
+        mean_service (float): The mean service time.
+        second_moment (float): The second moment of the service time.
+        servers (int): The number of servers.
+
+    Returns:
+        dict: utilization, p_wait (probability of waiting), wait (mean wait in queue) and
+            queue_length (mean number waiting); the wait and queue length are inf if unstable.
+    """
+    load = arrival_rate * mean_service
+    utilization = load / servers
+    if utilization >= 1:
+        return {"utilization": utilization, "p_wait": 1.0, "wait": math.inf, "queue_length": math.inf}
+    p_wait = erlang_c(servers, load)
+    scv = second_moment / mean_service ** 2 - 1 if mean_service else 0.0
+    wait = p_wait * mean_service / (servers - load) * (1 + scv) / 2
+    return {"utilization": utilization, "p_wait": p_wait, "wait": wait, "queue_length": arrival_rate * wait}
+
+
+# Hotel
+def hotel_capacities(capacities=None):
+    """
+    Returns the hotel's default capacities (see hotel_simulation.CAPACITIES) updated with `capacities`.
+    """
+    return {**import_model("hotel").CAPACITIES, **(capacities or {})}
+
+
+def hotel_analytic(arrival_rate, capacities=None):
+    """
+    Computes the hotel's waits, utilizations and stay time in closed form.
+
+    Guests arrive as a Poisson process. Each visits the reception twice (reservation in
+    U(0.1, 0.2), check-in in U(0.1, 0.3)), then a bellhop and at the end the checkout desk,
+    who both take U(0.1, 0.5) for guests with luggage (half of them) and no time otherwise.
+    For their activity, half of the guests pick a housekeeper; if all are busy they wait
+    U(0.1, 0.3) and pick again.
+
+    Args:
+        arrival_rate (float): Guests arriving per second.
+        capacities (dict): Capacities overriding the defaults.
+
+    Returns:
+        dict: Flat metrics: wait_<stage> (mean seconds per guest), utilization_<staff>,
+            queue_<staff> (mean number of guests waiting) and mean_time_in_hotel.
+    """
+    capacities = hotel_capacities(capacities)
+    luggage = mixture_moments((0.5, *uniform_moments(0.1, 0.5)), (0.5, 0.0, 0.0))
+    reception = mgc(2 * arrival_rate, *mixture_moments((0.5, *uniform_moments(0.1, 0.2)),
+                                                       (0.5, *uniform_moments(0.1, 0.3))),
+                    capacities["receptionists"])
+    bellhops = mgc(arrival_rate, *luggage, capacities["bellhops"])
+    checkout = mgc(arrival_rate, *luggage, 1)
+
+    activity_time, _ = uniform_moments(0.1, 0.5)
+    retry_time, _ = uniform_moments(0.1, 0.3)
+    blocking = erlang_b(capacities["housekeepers"], arrival_rate / 2 * activity_time)
+    retry = blocking / 2
+    activity_wait = retry_time * retry / (1 - retry)
+    served = arrival_rate * 0.5 * (1 - blocking) / (1 - retry)
+
+    metrics = {
+        "wait_reservation": reception["wait"],
+        "wait_checkin": reception["wait"],
+        "wait_luggage": bellhops["wait"],
+        "wait_activity": activity_wait,
+        "wait_checkout": checkout["wait"],
+        "utilization_receptionists": reception["utilization"],
+        "utilization_bellhops": bellhops["utilization"],
+        "utilization_housekeepers": served * activity_time / capacities["housekeepers"],
+        "utilization_checkout_desk": checkout["utilization"],
+        "queue_receptionists": reception["queue_length"],
+        "queue_bellhops": bellhops["queue_length"],
+        "queue_housekeepers": arrival_rate * activity_wait,
+        "queue_checkout_desk": checkout["queue_length"],
+    }
+    metrics["mean_time_in_hotel"] = (bellhops["wait"] + luggage[0] + activity_wait + activity_time
+                                     + checkout["wait"] + luggage[0])
+    return metrics
+
+
+def hotel_assumptions(arrival_rate, capacities=None, guests=None):
+    """
+    Returns the assumptions of `hotel_analytic` that do not hold, as sentences; empty if all hold.
+    """
+    if arrival_rate is None:
+        return ["guests all arrive at once, so the queues never reach a steady state"]
+    capacities = hotel_capacities(capacities)
+    metrics = hotel_analytic(arrival_rate, capacities)
+    failed = []
+    for staff in ("receptionists", "bellhops", "checkout_desk"):
+        if metrics[f"utilization_{staff}"] >= 1:
+            failed.append(f"the {staff.replace('_', ' ')} {'is' if staff == 'checkout_desk' else 'are'} overloaded "
+                          f"(utilization {metrics[f'utilization_{staff}']:.2f})")
+    activity_time, _ = uniform_moments(0.1, 0.5)
+    if erlang_b(capacities["housekeepers"], arrival_rate / 2 * activity_time) > RETRY_TOLERANCE:
+        failed.append("housekeepers are busy too often for the retrial approximation")
+    for seats, share in (("bar_capacity", 0.25), ("restaurant_capacity", 0.25)):
+        blocking = erlang_b(capacities[seats], arrival_rate * share * activity_time)
+        if blocking > SEAT_TOLERANCE:
+            failed.append(f"the {seats.split('_')[0]} is full {blocking:.1%} of the time")
+    if guests is not None and capacities["rooms"] < guests:
+        failed.append(f"only {capacities['rooms']} rooms for {guests} guests, so most guests never check in")
+    return failed
+
+
+def hotel_simulated(arrival_rate, capacities=None, guests=5000, seed=None, replications=3):
+    """
+    Measures the metrics of `hotel_analytic` by simulating the hotel on the virtual clock.
+
+    Args:
+        arrival_rate (float): Guests arriving per second; None makes them all arrive at once.
+        capacities (dict): Capacities overriding the defaults.
+        guests (int): The number of guests per replication.
+        seed (int): The root seed of the replications.
+        replications (int): The number of replications averaged.
+
+    Returns:
+        dict: The same metrics as `hotel_analytic`, averaged over the replications.
+    """
+    hotel = import_model("hotel")
+    capacities = hotel_capacities(capacities)
+    results = []
+    for streams in SeedStreams(seed).spawn(replications):
+        simulation = hotel.make_event_simulation(guests, streams=streams, capacities=capacities,
+                                                 arrival_rate=arrival_rate)
+        result = simulation.run()
+        metrics = {f"wait_{stage}": wait / guests for stage, wait in simulation.stage_waits.items()}
+        staff_waits = {
+            "receptionists": simulation.stage_waits["reservation"] + simulation.stage_waits["checkin"],
+            "bellhops": simulation.stage_waits["luggage"],
+            "housekeepers": simulation.stage_waits["activity"],
+            "checkout_desk": simulation.stage_waits["checkout"],
+        }
+        for staff, busy in simulation.busy_time.items():
+            servers = 1 if staff == "checkout_desk" else capacities[staff]
+            metrics[f"utilization_{staff}"] = busy / (servers * simulation.now)
+            metrics[f"queue_{staff}"] = staff_waits[staff] / simulation.now
+        stays = [guest.time_in_hotel for guest in result if guest.room_number is not None]
+        metrics["mean_time_in_hotel"] = sum(stays) / len(stays) if stays else math.nan
+        results.append(metrics)
+    return {name: float(np.mean([metrics[name] for metrics in results])) for name in results[0]}
+
+
+def estimate_hotel(arrival_rate=None, capacities=None, guests=5000, seed=None, replications=3, verify=False):
+    """
+    Estimates the hotel's metrics in closed form, or by simulation when the formulas do not apply.
+
+    Args:
+        arrival_rate (float): Guests arriving per second; None makes them all arrive at once.
+        capacities (dict): Capacities overriding the defaults.
+        guests (int): The number of guests, checked against the rooms and simulated if needed.
+        seed (int): The root seed of the simulation.
+        replications (int): The number of simulated replications.
+        verify (bool): Also simulate when the assumptions hold, to measure the error of the formulas.
+
+    Returns:
+        Estimate: The estimate.
+    """
+    failed = hotel_assumptions(arrival_rate, capacities, guests)
+    analytic = hotel_analytic(arrival_rate, capacities) if arrival_rate is not None else None
+    simulated = None
+    if failed or verify:
+        simulated = hotel_simulated(arrival_rate, capacities, guests, seed, replications)
+    return Estimate("hotel", failed, analytic, simulated)
+
+
+# Office
+def office_analytic(employees, max_concurrency=None):
+    """
+    Computes the office's waits and makespan in closed form.
+
+    Every employee arrives at once and works U{1, ..., 10} hours. Without a concurrency
+    limit nobody waits and the makespan is the expected maximum of the hours. With c slots,
+    the slots stay busy and free up at a rate of c / E[S], so employee k waits about
+    (k - c + 1) E[S] / c.
+
+    Returns:
+        dict: mean_wait and makespan in hours, and the utilization of the slots.
+    """
+    hours = range(1, 11)
+    mean = sum(hours) / len(hours)
+    slots = min(max_concurrency or employees, employees)
+    if slots >= employees:
+        makespan = sum(1 - ((m - 1) / len(hours)) ** employees for m in hours)
+        mean_wait = 0.0
+    else:
+        makespan = employees * mean / slots
+        waiting = employees - slots
+        mean_wait = mean * waiting * (waiting + 1) / (2 * slots * employees)
+    return {"mean_wait": mean_wait, "makespan": makespan, "utilization": employees * mean / (slots * makespan)}
+
+
+def office_assumptions(employees, max_concurrency=None):
+    """
+    Returns the assumptions of `office_analytic` that do not hold, as sentences; empty if all hold.
+    """
+    slots = min(max_concurrency or employees, employees)
+    if slots < employees < OFFICE_MIN_LOAD * slots:
+        return [f"{employees / slots:.1f} employees per slot are too few for the slots to stay busy"]
+    return []
+
+
+def office_simulated(employees, max_concurrency=None, seed=None, replications=3):
+    """
+    Measures the metrics of `office_analytic` by replaying the office's asyncio mode on a virtual clock.
+
+    Employees start in ID order as soon as one of the slots is free, and their hours are
+    drawn in seeded blocks as `Simulator` draws them.
+    """
+    results = [replay_office(streams, employees, max_concurrency) for streams in SeedStreams(seed).spawn(replications)]
+    return {name: float(np.mean([metrics[name] for metrics in results])) for name in results[0]}
+
+
+def replay_office(streams, employees, max_concurrency=None):
+    """
+    Replays one run of the office's asyncio mode on a virtual clock.
+
+    Args:
+        streams (SeedStreams): The streams the employees' tasks and hours are drawn from.
+        employees (int): The number of employees.
+        max_concurrency (int): The number of employees working at once; None lets everyone work.
+
+    Returns:
+        dict: The mean wait before starting, the makespan and the utilization of the slots, in hours.
+    """
+    office = import_model("office")
+    slots = min(max_concurrency or employees, employees)
+    assignments = streams.blocks("employee", office.draw_assignments)
+    free = [0.0] * slots
+    total_wait = busy = makespan = 0.0
+    for employee_id in range(1, employees + 1):
+        hours = assignments[employee_id][1]
+        start = heapq.heappop(free)
+        heapq.heappush(free, start + hours)
+        total_wait += start
+        busy += hours
+        makespan = max(makespan, start + hours)
+    return {"mean_wait": total_wait / employees, "makespan": makespan, "utilization": busy / (slots * makespan)}
+
+
+def estimate_office(employees, max_concurrency=None, seed=None, replications=3, verify=False):
+    """
+    Estimates the office's metrics in closed form, or by simulation when the formulas do not apply.
+
+    Accepts the arguments of `office_simulated`, plus `verify` to simulate even when the assumptions hold.
+
+    Returns:
+        Estimate: The estimate.
+    """
+    failed = office_assumptions(employees, max_concurrency)
+    simulated = None
+    if failed or verify:
+        simulated = office_simulated(employees, max_concurrency, seed, replications)
+    return Estimate("office", failed, office_analytic(employees, max_concurrency), simulated)
+
+
+class Estimate:
+    """
+    The result of an estimate: closed-form metrics, simulated metrics, or both.
+
+    Attributes:
+        model (str): "hotel" or "office".
+        failed (list): The assumptions of the formulas that do not hold.
+        analytic (dict): The closed-form metrics, or None if they cannot be computed.
+        simulated (dict): The simulated metrics, or None if nothing was simulated.
+    """
+    def __init__(self, model, failed, analytic, simulated):
+        self.model = model
+        self.failed = failed
+        self.analytic = analytic
+        self.simulated = simulated
+
+    @property
+    def method(self):
+        """
+        str: "analytic" if the formulas apply, otherwise "simulation".
+        """
+        return "simulation" if self.failed else "analytic"
+
+    @property
+    def metrics(self):
+        """
+        dict: The metrics of the estimate: simulated when the formulas do not apply, otherwise closed-form.
+        """
+        return self.simulated if self.failed else self.analytic
+
+    def discrepancy(self):
+        """
+        Returns the relative difference of the closed-form metrics from the simulated ones, when both exist.
+        """
+        if self.analytic is None or self.simulated is None:
+            return {}
+        return {name: (self.analytic[name] - value) / value if value else math.nan
+                for name, value in self.simulated.items()}
+
+
+def print_estimate(estimate):
+    """
+    Prints how an estimate was obtained and its metrics, next to the simulation if there is one.
+    """
+    print(f"\n{estimate.model}: {estimate.method} estimate")
+    for reason in estimate.failed:
+        print(f"  assumption failed: {reason}")
+    print()
+    discrepancy = estimate.discrepancy()
+    rows = [["Metric", "Analytic", "Simulated", "Difference"]]
+    for name in (estimate.analytic or estimate.simulated):
+        rows.append([
+            name,
+            "" if estimate.analytic is None else f"{estimate.analytic[name]:.4g}",
+            "" if estimate.simulated is None else f"{estimate.simulated[name]:.4g}",
+            f"{discrepancy[name]:+.1%}" if name in discrepancy and not math.isnan(discrepancy[name]) else "",
+        ])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def _parse_capacity(text):
+    name, _, value = text.partition("=")
+    return name, int(value)
+
+
+def main(argv=None):
+    """
+    Parses the command line and prints the estimate of the hotel or the office.
+    """
+    parser = argparse.ArgumentParser(description="Estimate waits and utilizations in closed form, "
+                                                 "falling back to simulation.")
+    models = parser.add_subparsers(dest="model", required=True)
+    hotel = models.add_parser("hotel", help="The hotel with Poisson guest arrivals.")
+    hotel.add_argument("--arrival-rate", type=float, default=None, help="Guests arriving per second.")
+    hotel.add_argument("--set", action="append", default=[], type=_parse_capacity, metavar="NAME=VALUE",
+                       help="A capacity, e.g. receptionists=8 or rooms=10000 (repeatable).")
+    hotel.add_argument("--guests", type=int, default=5000, help="The number of guests.")
+    office = models.add_parser("office", help="The office with a limit on concurrent employees.")
+    office.add_argument("--employees", type=int, default=1000, help="The number of employees.")
+    office.add_argument("--max-concurrency", type=int, default=None, help="The number of employees working at once.")
+    for subparser in (hotel, office):
+        subparser.add_argument("--seed", type=int, default=None, help="Root seed of the simulation.")
+        subparser.add_argument("-r", "--replications", type=int, default=3, help="Simulated replications.")
+        subparser.add_argument("--verify", action="store_true",
+                               help="Also simulate when the formulas apply, and show the difference.")
+    args = parser.parse_args(argv)
+
+    if args.model == "hotel":
+        estimate = estimate_hotel(args.arrival_rate, dict(args.set), args.guests, args.seed,
+                                  args.replications, args.verify)
+    else:
+        estimate = estimate_office(args.employees, args.max_concurrency, args.seed, args.replications, args.verify)
+    print_estimate(estimate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Monte Carlo replication runner for the simulations.
+
+Runs N independently seeded replications of a simulation in a process pool, streams the
+summary of each replication back as it finishes, and reports the mean of every metric with
+a confidence interval. The run stops early once the interval of a target metric is narrow
+enough.
+
+Example:
+    python -m simulations.replication hotel -n 200 --target mean_time_in_hotel --precision 0.01
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import inspect
+import io
+import json
+import logging
+import math
+import os
+import statistics
+import time
+
+import numpy as np
+
+from simulations import import_model
+from simulations.seeding import SeedStreams
+
+
+# Replications
+def replicate_hotel(seed, guests=400):
+    """
+    Runs one replication of the hotel on the virtual clock.
+
+    Args:
+        seed (int): The seed of the replication.
+        guests (int): The number of guests.
+
+    Returns:
+        dict: Check-ins, the distribution of `time_in_hotel` and the makespan of the run.
+    """
+    hotel = import_model("hotel")
+    logging.disable(logging.INFO)
+    result = hotel.run_discrete_event(guests, streams=SeedStreams(seed))
+    stays = np.array([guest.time_in_hotel for guest in result if guest.room_number is not None])
+    return {
+        "guests_checked_in": stays.size,
+        "mean_time_in_hotel": stays.mean() if stays.size else math.nan,
+        "p50_time_in_hotel": np.quantile(stays, 0.5) if stays.size else math.nan,
+        "p90_time_in_hotel": np.quantile(stays, 0.9) if stays.size else math.nan,
+        "max_time_in_hotel": stays.max() if stays.size else math.nan,
+        "makespan": max(guest.checkout_time for guest in result),
+    }
+
+
+def replicate_office(seed, employees=5):
+    """
+    Runs one replication of the office on the asyncio engine, without waiting in real time.
+
+    Args:
+        seed (int): The seed of the replication.
+        employees (int): The number of employees.
+
+    Returns:
+        dict: The number of employees and the total time for every task.
+    """
+    office = import_model("office")
+    simulator = office.Simulator(employees, mode="asyncio", time_scale=0, verbose=False, streams=SeedStreams(seed),
+                                 keep_report=False)
+    simulator.start()
+    summary = {}
+    for task, info in simulator.snapshot().items():
+        name = task.lower().replace(" ", "_")
+        summary[f"{name}_employees"] = info["count"]
+        summary[f"{name}_total_time"] = info["total"]
+    return summary
+
+
+def replicate_classroom(seed, students=50, teachers=2, timeout=60, time_scale=0.01):
+    """
+    Runs one replication of the classroom, with every duration scaled by `time_scale`.
+
+    Args:
+        seed (int): The seed of the replication.
+        students (int): The number of students.
+        teachers (int): The number of teachers.
+        timeout (float): The length of the class in seconds.
+        time_scale (float): Multiplier applied to every duration.
+
+    Returns:
+        dict: The number of students who presented, did not present and had a raised hand at the end.
+    """
+    classroom = import_model("classroom")
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = classroom.run_simulation(students, teachers, timeout, time_scale, SeedStreams(seed))
+    presented = sum(student.has_presented for student in result)
+    return {
+        "presented": presented,
+        "not_presented": len(result) - presented,
+        "raised_hands": sum(student.hand_raised for student in result),
+    }
+
+
+def replicate_traffic(seed, cars=2, grid=5):
+    """
+    Runs one replication of the traffic grid on the vectorized engine.
+
+    Args:
+        seed (int): The seed of the replication.
+        cars (int): The number of cars.
+        grid (int): The number of squares per side of the grid.
+
+    Returns:
+        dict: The distribution of trip times, in simulated seconds.
+    """
+    from simulations.traffic.grid_engine import GridEngine
+
+    engine = GridEngine(grid, grid, cars, seed=seed)
+    engine.run()
+    trips = engine.trip_times()
+    return {
+        "cars_finished": trips.size,
+        "mean_trip_time": trips.mean(),
+        "p90_trip_time": np.quantile(trips, 0.9),
+        "max_trip_time": trips.max(),
+    }
+
+
+MODELS = {
+    "hotel": (replicate_hotel, "mean_time_in_hotel"),
+    "office": (replicate_office, "typing_on_a_computer_total_time"),
+    "classroom": (replicate_classroom, "presented"),
+    "traffic": (replicate_traffic, "mean_trip_time"),
+}
+
+
+def check_params(model, params):
+    """
+    Checks that parameters are keyword arguments of the model's replicate function.
+
+    Raises:
+        ValueError: If a parameter is unknown to the model.
+    """
+    replicate, _ = MODELS[model]
+    names = [name for name in inspect.signature(replicate).parameters if name != "seed"]
+    unknown = set(params) - set(names)
+    if unknown:
+        raise ValueError(f"Unknown {model} parameters: {', '.join(sorted(unknown))}; expected {', '.join(names)}.")
+
+
+def _run_one(model, index, seed, params):
+    replicate, _ = MODELS[model]
+    start = time.perf_counter()
+    summary = {name: float(value) for name, value in replicate(seed, **params).items()}
+    return index, seed, time.perf_counter() - start, summary
+
+
+# Statistics
+def t_quantile(p, df):
+    """
+    Returns the p-quantile of Student's t distribution with `df` degrees of freedom.
+
+    Exact for one and two degrees of freedom; otherwise uses the Cornish-Fisher expansion
+    around the normal quantile (Abramowitz and Stegun 26.7.5), which is accurate to about
+    1e-3 from three degrees of freedom up.
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = statistics.NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def confidence_interval(values, confidence=0.95):
+    """
+    Returns the mean of the values and the half-width of its t confidence interval.
+
+    Args:
+        values (list): The observations (NaNs are ignored).
+        confidence (float): The confidence level.
+
+    Returns:
+        tuple: (mean, half_width); the half-width is inf with fewer than two observations.
+    """
+    values = [value for value in values if not math.isnan(value)]
+    if not values:
+        return math.nan, math.inf
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, math.inf
+    stdev = statistics.stdev(values)
+    return mean, t_quantile((1 + confidence) / 2, len(values) - 1) * stdev / math.sqrt(len(values))
+
+
+def _precision_reached(values, relative_precision, confidence):
+    mean, half_width = confidence_interval(values, confidence)
+    if math.isnan(mean) or math.isinf(half_width):
+        return False
+    return half_width <= relative_precision * abs(mean) if mean else half_width == 0
+
+
+# Runner
+def iter_replications(model, replications=30, params=None, seed=None, max_workers=None,
+                      target=None, relative_precision=None, min_replications=5, confidence=0.95):
+    """
+    Runs replications in a process pool and yields their summaries as they complete.
+
+    Replication seeds are spawned from one numpy SeedSequence, so every replication uses an
+    independent random stream and the same `seed` reproduces the same set of seeds. When a
+    `relative_precision` is given, no new replications are started once the confidence
+    interval half-width of `target` is at most that fraction of its mean.
+
+    Args:
+        model (str): The simulation: "hotel", "office", "classroom" or "traffic".
+        replications (int): The maximum number of replications.
+        params (dict): Keyword arguments of the model's replicate function.
+        seed (int): The root seed; None draws fresh entropy.
+        max_workers (int): The number of worker processes; defaults to the number of CPUs.
+        target (str): The metric used for early stopping; defaults to the model's main metric.
+        relative_precision (float): Optional relative half-width at which to stop.
+        min_replications (int): The minimum number of replications before stopping early.
+        confidence (float): The confidence level of the stopping rule.
+
+    Yields:
+        tuple: (replication index, seed, wall-clock seconds, summary dict).
+
+    Raises:
+        ValueError: If a parameter is unknown to the model (see `check_params`).
+    """
+    params = params or {}
+    check_params(model, params)
+    target = target or MODELS[model][1]
+    max_workers = max_workers or os.cpu_count() or 1
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(replications)]
+
+    values = []
+    submitted = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        while submitted < min(replications, max_workers * 2):
+            pending.add(executor.submit(_run_one, model, submitted, seeds[submitted], params))
+            submitted += 1
+
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                values.append(result[3].get(target, math.nan))
+                yield result
+
+            stop = (relative_precision is not None and len(values) >= min_replications
+                    and _precision_reached(values, relative_precision, confidence))
+            if stop:
+                executor.shutdown(cancel_futures=True)
+                break
+            while submitted < replications and len(pending) < max_workers * 2:
+                pending.add(executor.submit(_run_one, model, submitted, seeds[submitted], params))
+                submitted += 1
+
+
+def run_replications(model, replications=30, params=None, seed=None, max_workers=None, target=None,
+                     relative_precision=None, min_replications=5, confidence=0.95, on_result=None):
+    """
+    Runs replications of a simulation and summarizes every metric with a confidence interval.
+
+    Accepts the same arguments as `iter_replications`, plus:
+
+    Args:
+        on_result (callable): Optional function called with each (index, seed, seconds, summary) as it arrives.
+
+    Returns:
+        dict: The model, parameters, number of replications, whether the run stopped early,
+            per-metric intervals ({"mean", "half_width", "low", "high"}) and the per-replication results.
+    """
+    results = []
+    for result in iter_replications(model, replications, params, seed, max_workers, target,
+                                    relative_precision, min_replications, confidence):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    results.sort()
+
+    metrics = {}
+    for name in results[0][3] if results else []:
+        mean, half_width = confidence_interval([summary[name] for *_, summary in results], confidence)
+        metrics[name] = {"mean": mean, "half_width": half_width, "low": mean - half_width, "high": mean + half_width}
+    return {
+        "model": model,
+        "params": params or {},
+        "confidence": confidence,
+        "replications": len(results),
+        "stopped_early": len(results) < replications,
+        "metrics": metrics,
+        "results": [{"index": index, "seed": seed, "seconds": seconds, "summary": summary}
+                    for index, seed, seconds, summary in results],
+    }
+
+
+def print_summary(report):
+    """
+    Prints the confidence intervals of a replication report as a table.
+    """
+    print(f"\n{report['model']}: {report['replications']} replications"
+          f"{' (stopped early)' if report['stopped_early'] else ''}, {report['confidence']:.0%} confidence\n")
+    rows = [["Metric", "Mean", "Half-width", "Low", "High"]]
+    for name, interval in report["metrics"].items():
+        rows.append([name] + [f"{interval[key]:.4g}" for key in ("mean", "half_width", "low", "high")])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def _parse_param(text):
+    key, _, value = text.partition("=")
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main(argv=None):
+    """
+    Parses the command line and runs replications of one simulation.
+    """
+    parser = argparse.ArgumentParser(description="Run seeded Monte Carlo replications of a simulation.")
+    parser.add_argument("model", choices=sorted(MODELS))
+    parser.add_argument("-n", "--replications", type=int, default=30, help="Maximum number of replications.")
+    parser.add_argument("--param", action="append", default=[], type=_parse_param, metavar="KEY=VALUE",
+                        help="A parameter of the model, e.g. guests=400 (repeatable).")
+    parser.add_argument("--seed", type=int, default=None, help="Root seed of the replications.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--target", default=None, help="Metric used for early stopping.")
+    parser.add_argument("--precision", type=float, default=None,
+                        help="Stop once the interval half-width of the target is this fraction of its mean.")
+    parser.add_argument("--min-replications", type=int, default=5)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--output", default=None, help="Write the full report as JSON to this file.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print each replication as it finishes.")
+    args = parser.parse_args(argv)
+    try:
+        check_params(args.model, dict(args.param))
+    except ValueError as error:
+        parser.error(str(error))
+
+    def show(result):
+        index, seed, seconds, summary = result
+        values = ", ".join(f"{name}={value:.4g}" for name, value in summary.items())
+        print(f"Replication {index} (seed {seed}, {seconds:.2f}s): {values}")
+
+    report = run_replications(args.model, args.replications, dict(args.param), args.seed, args.workers,
+                              args.target, args.precision, args.min_replications, args.confidence,
+                              None if args.quiet else show)
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Seeded, per-entity random number streams for the simulations.
+
+A single `SeedStreams` object, created from one seed, hands out an independent NumPy
+`Generator` for every guest, car, student, employee, traffic light or teacher. Each stream
+is derived from the root `SeedSequence` and the entity's kind and index alone, so the values
+an entity draws do not depend on which thread runs first, on how many other entities exist
+or on which process of a parallel replication runs it: runs are reproducible bit for bit.
+
+The simulations draw one value at a time through the `random` module's API. `RandomStream`
+offers the same methods, but serves them from a block of values drawn at once by the
+entity's generator, so the per-call cost is an array lookup rather than a generator call.
+
+Streams created with `antithetic=True` draw the mirror image of the values of the same seed
+(1 - u for every uniform u), so a run and its antithetic twin are negatively correlated and
+their average has a lower variance than that of two independent runs.
+
+Example:
+    streams = SeedStreams(42)
+    guest = streams.stream("guest", 7)
+    guest.uniform(0.1, 0.5)
+"""
+import math
+
+import numpy as np
+
+# Entity kinds (the first element of every stream's spawn key)
+KINDS = {
+    "model": 0,
+    "guest": 1,
+    "employee": 2,
+    "student": 3,
+    "teacher": 4,
+    "car": 5,
+    "light": 6,
+    "arrivals": 7,
+}
+
+# Extra spawn key element distinguishing the generators of BlockDraws from per-entity streams
+_BLOCK = 1
+
+# The largest float below 1, which mirrored uniforms are capped at to stay in [0, 1)
+_BELOW_ONE = np.nextafter(1.0, 0.0)
+
+
+class RandomStream:
+    """
+    A `random`-module-like source of random values backed by a NumPy Generator.
+
+    Uniform variates are drawn from the generator in blocks of `block_size` and consumed one
+    by one; every other method is derived from them. The stream is not thread-safe: each
+    entity owns its stream and is the only one drawing from it.
+
+    Attributes:
+        generator (numpy.random.Generator): The generator the blocks are drawn from.
+        block_size (int): The number of values drawn at a time.
+        antithetic (bool): Whether every uniform u of the generator is served as 1 - u.
+    """
+    def __init__(self, generator, block_size=64, antithetic=False):
+        """
+        Initializes the stream with an empty block.
+
+        Args:
+            generator (numpy.random.Generator): The generator to draw from.
+            block_size (int): The number of values drawn at a time.
+            antithetic (bool): Serve 1 - u for every uniform u of the generator.
+        """
+        self.generator = generator
+        self.block_size = block_size
+        self.antithetic = antithetic
+        self._block = []
+        self._position = 0
+
+    def random(self):
+        """
+        Returns a float uniformly distributed in [0, 1).
+        """
+        if self._position == len(self._block):
+            block = self.generator.random(self.block_size)
+            if self.antithetic:
+                block = np.minimum(1.0 - block, _BELOW_ONE)
+            self._block = block.tolist()
+            self._position = 0
+        value = self._block[self._position]
+        self._position += 1
+        return value
+
+    def uniform(self, a, b):
+        """
+        Returns a float uniformly distributed between a and b.
+        """
+        return a + (b - a) * self.random()
+
+    def expovariate(self, lambd):
+        """
+        Returns an exponentially distributed float with rate lambd (mean 1 / lambd).
+        """
+        return -math.log(1.0 - self.random()) / lambd
+
+    def randrange(self, start, stop=None):
+        """
+        Returns an integer uniformly distributed in range(start, stop), or range(start) without stop.
+        """
+        if stop is None:
+            start, stop = 0, start
+        if stop <= start:
+            raise ValueError(f"empty range for randrange({start}, {stop})")
+        return start + int(self.random() * (stop - start))
+
+    def randint(self, a, b):
+        """
+        Returns an integer uniformly distributed in [a, b], both included.
+        """
+        return self.randrange(a, b + 1)
+
+    def choice(self, sequence):
+        """
+        Returns a uniformly chosen element of a non-empty sequence.
+        """
+        if not sequence:
+            raise IndexError("Cannot choose from an empty sequence")
+        return sequence[int(self.random() * len(sequence))]
+
+    def shuffle(self, items):
+        """
+        Shuffles a list in place (Fisher-Yates).
+        """
+        for i in range(len(items) - 1, 0, -1):
+            j = int(self.random() * (i + 1))
+            items[i], items[j] = items[j], items[i]
+
+    def getstate(self):
+        """
+        Returns the state of the stream: the generator's state and the values not consumed yet.
+        """
+        return self.generator.bit_generator.state, self._block[self._position:]
+
+    def setstate(self, state):
+        """
+        Restores a state returned by `getstate`.
+        """
+        self.generator.bit_generator.state, remaining = state
+        self._block = list(remaining)
+        self._position = 0
+
+
+class MirroredGenerator:
+    """
+    Wraps a NumPy Generator and returns the mirror image of its draws within their range.
+
+    A uniform float u becomes 1 - u and an integer k in [low, high) becomes low + high - 1 - k,
+    so the values are the antithetic twins of those the wrapped generator draws.
+    """
+    def __init__(self, generator):
+        self.generator = generator
+
+    def random(self, size=None):
+        return np.minimum(1.0 - self.generator.random(size), _BELOW_ONE)
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        return low + high - self.generator.uniform(low, high, size)
+
+    def integers(self, low, high=None, size=None):
+        if high is None:
+            low, high = 0, low
+        return low + high - 1 - self.generator.integers(low, high, size)
+
+
+class BlockDraws:
+    """
+    Per-entity values drawn in vectorized blocks, for entities that only draw a few values each.
+
+    Entity i gets row i % block_size of block i // block_size, and every block is drawn by
+    its own generator, so an entity's values depend only on the seed and its index, while
+    creating them costs one vectorized draw per block instead of one generator per entity.
+
+    Attributes:
+        block_size (int): The number of entities per block.
+    """
+    def __init__(self, streams, kind, draw, block_size=4096):
+        """
+        Args:
+            streams (SeedStreams): The streams the block generators are derived from.
+            kind (str): The kind of entity.
+            draw (callable): Called as draw(generator, size); returns a tuple of arrays of length size.
+            block_size (int): The number of entities per block.
+        """
+        self.streams = streams
+        self.kind = kind
+        self.draw = draw
+        self.block_size = block_size
+        self._blocks = {}
+
+    def __getitem__(self, index):
+        number, row = divmod(index, self.block_size)
+        block = self._blocks.get(number)
+        if block is None:
+            generator = self.streams.generator(self.kind, number, _BLOCK)
+            if self.streams.antithetic:
+                generator = MirroredGenerator(generator)
+            block = [column.tolist() for column in self.draw(generator, self.block_size)]
+            block = self._blocks.setdefault(number, block)
+        return tuple(column[row] for column in block)
+
+
+class SeedStreams:
+    """
+    The root of all random streams of one simulation run.
+
+    Attributes:
+        sequence (numpy.random.SeedSequence): The root seed sequence.
+        antithetic (bool): Whether the streams and blocks draw the mirror image of the seed's values.
+    """
+    def __init__(self, seed=None, antithetic=False):
+        """
+        Args:
+            seed (int or numpy.random.SeedSequence): The seed of the run; None draws fresh entropy.
+            antithetic (bool): Draw the antithetic twin of the run with the same seed.
+        """
+        self.sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.antithetic = antithetic
+
+    @property
+    def entropy(self):
+        """
+        The entropy of the root sequence, which recreates these streams when passed as the seed.
+        """
+        return self.sequence.entropy
+
+    def _sequence(self, kind, index, *key):
+        return np.random.SeedSequence(self.sequence.entropy,
+                                      spawn_key=self.sequence.spawn_key + (KINDS[kind], index) + key)
+
+    def generator(self, kind, index=0, *key):
+        """
+        Returns the NumPy Generator of an entity (never mirrored: see `stream` and `blocks`).
+
+        Args:
+            kind (str): The kind of entity (see KINDS).
+            index (int): The index of the entity among those of its kind.
+            key (int): Optional further elements of the spawn key.
+        """
+        return np.random.default_rng(self._sequence(kind, index, *key))
+
+    def stream(self, kind, index=0, block_size=64):
+        """
+        Returns a RandomStream for an entity.
+
+        Args:
+            kind (str): The kind of entity (see KINDS).
+            index (int): The index of the entity among those of its kind.
+            block_size (int): The number of values the stream draws at a time.
+        """
+        return RandomStream(self.generator(kind, index), block_size, self.antithetic)
+
+    def blocks(self, kind, draw, block_size=4096):
+        """
+        Returns BlockDraws drawing the values of entities of a kind in vectorized blocks.
+        """
+        return BlockDraws(self, kind, draw, block_size)
+
+    def spawn(self, count):
+        """
+        Returns `count` independent child SeedStreams, e.g. one per replication.
+        """
+        return [SeedStreams(child, self.antithetic) for child in self.sequence.spawn(count)]
+
+    def key(self, kind="model", index=0):
+        """
+        Returns a 64-bit integer key for counter-based generators such as the GridEngine's.
+        """
+        return int(self._sequence(kind, index).generate_state(1, np.uint64)[0])
@@ -0,0 +1,63 @@
+"""
+Streaming summaries of values shared by the simulations, kept without storing the values.
+"""
+import math
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error (logarithmic buckets, as in DDSketch).
+
+    A positive value v is counted in bucket ceil(log(v) / log(gamma)); any quantile is then
+    returned with a relative error of at most `relative_accuracy`, using one counter per
+    occupied bucket instead of storing the values.
+
+    Attributes:
+        relative_accuracy (float): The maximum relative error of the returned quantiles.
+        count (int): The number of values added.
+    """
+    __slots__ = ("relative_accuracy", "count", "_gamma", "_log_gamma", "_buckets", "_zero_count")
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = {}
+        self._zero_count = 0
+
+    def add(self, value):
+        """
+        Adds one value to the sketch. Values of zero or less are counted together as zero.
+        """
+        self.count += 1
+        if value <= 0:
+            self._zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        """
+        Adds the values counted by another sketch with the same accuracy to this one.
+        """
+        self.count += other.count
+        self._zero_count += other._zero_count
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        """
+        Returns the estimated q-quantile (0 <= q <= 1), or None if the sketch is empty.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
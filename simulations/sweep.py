@@ -0,0 +1,328 @@
+"""
+Parameter sweeps of the hotel's staffing and capacities, for capacity planning.
+
+A design is a list of configurations, each mapping some of the hotel's capacities
+(receptionists, bellhops, housekeepers, bar and restaurant seats, rooms) to values; the
+others keep their defaults. Designs are built as a full grid of values or as random or
+Latin hypercube samples of integer ranges. Every configuration is run on the virtual clock
+for a few seeded replications in a process pool, and the result of each (configuration,
+seed) point is memoized on disk under a key that also covers the number of guests and a
+hash of the model's source code: re-running a sweep, or a larger one that contains it, only
+computes the new points, and editing the model invalidates the cache.
+
+Every configuration uses the same replication seeds, so configurations are compared on
+common random numbers.
+
+Example:
+    python -m simulations.sweep --grid receptionists=4,6,8 --grid bellhops=3,5,7
+    python -m simulations.sweep --lhs 40 --range receptionists=2:12 --range rooms=20:80 -r 5
+"""
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import itertools
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+from simulations import import_model
+from simulations.seeding import SeedStreams
+
+PARAMETERS = ("receptionists", "bellhops", "housekeepers", "bar_capacity", "restaurant_capacity", "rooms")
+
+METRICS = ("guests_checked_in", "throughput", "mean_time_in_hotel", "makespan", "wait_reservation",
+           "wait_checkin", "wait_luggage", "wait_activity", "wait_checkout")
+
+# Source files whose contents are part of every cache key (sweep.py holds `evaluate` and METRICS)
+MODEL_SOURCES = ("hotel/*.py", "seeding.py", "sweep.py")
+
+
+# Designs
+def grid_design(space):
+    """
+    Returns every combination of the values of the parameters.
+
+    Args:
+        space (dict): Maps each parameter to the list of its values.
+
+    Returns:
+        list: The configurations, as dicts.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_design(space, count, seed=None):
+    """
+    Returns configurations with every parameter drawn uniformly from its integer range.
+
+    Args:
+        space (dict): Maps each parameter to its (low, high) range, both included.
+        count (int): The number of configurations.
+        seed (int): The seed of the draws.
+    """
+    generator = np.random.default_rng(seed)
+    columns = {name: generator.integers(low, high + 1, count).tolist() for name, (low, high) in space.items()}
+    return [{name: columns[name][i] for name in space} for i in range(count)]
+
+
+def latin_hypercube_design(space, count, seed=None):
+    """
+    Returns a Latin hypercube sample of configurations over integer ranges.
+
+    Each range is split into `count` equal strata and every stratum of every parameter is
+    sampled exactly once, so the design covers each range evenly with few configurations.
+
+    Args:
+        space (dict): Maps each parameter to its (low, high) range, both included.
+        count (int): The number of configurations.
+        seed (int): The seed of the draws.
+    """
+    generator = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in space.items():
+        position = (generator.permutation(count) + generator.random(count)) / count
+        columns[name] = np.minimum(low + np.floor(position * (high - low + 1)), high).astype(int).tolist()
+    return [{name: columns[name][i] for name in space} for i in range(count)]
+
+
+# Evaluation
+def evaluate(config, seed, guests=400):
+    """
+    Runs one replication of the hotel on the virtual clock with the given capacities.
+
+    Args:
+        config (dict): Capacities overriding the defaults (see PARAMETERS).
+        seed (int): The seed of the replication.
+        guests (int): The number of guests.
+
+    Returns:
+        dict: The metrics of METRICS. Throughput is in guests checked in per second of virtual
+            time and waits are mean seconds per guest.
+    """
+    hotel = import_model("hotel")
+    simulation = hotel.make_event_simulation(guests, streams=SeedStreams(seed), capacities=config)
+    result = simulation.run()
+    stays = [guest.time_in_hotel for guest in result if guest.room_number is not None]
+    summary = {
+        "guests_checked_in": len(stays),
+        "throughput": len(stays) / simulation.now if simulation.now else math.nan,
+        "mean_time_in_hotel": sum(stays) / len(stays) if stays else math.nan,
+        "makespan": simulation.now,
+    }
+    for stage, wait in simulation.stage_waits.items():
+        summary[f"wait_{stage}"] = wait / len(result) if result else math.nan
+    return summary
+
+
+def code_version():
+    """
+    Returns a hash of the source code of the hotel model and of the sweep's metrics, which is
+    part of every cache key.
+    """
+    package = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for pattern in MODEL_SOURCES:
+        for path in sorted(package.glob(pattern)):
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def point_key(config, seed, guests, version):
+    """
+    Returns the cache key of one (configuration, seed) point.
+    """
+    text = json.dumps({"config": config, "seed": seed, "guests": guests, "code": version}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+class SweepCache:
+    """
+    An on-disk memo of evaluated points, one small JSON file per key.
+
+    Attributes:
+        directory (str): The cache directory.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns the cached summary of a point, or None.
+        """
+        try:
+            with open(self._path(key)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, summary):
+        """
+        Stores the summary of a point, replacing the file atomically.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(summary, file)
+        os.replace(temporary, path)
+
+
+# Sweeps
+def run_sweep(design, guests=400, replications=3, seed=None, cache_dir="sweep_cache", max_workers=None):
+    """
+    Evaluates every configuration of a design, reusing cached points.
+
+    Args:
+        design (list): The configurations (dicts of capacities).
+        guests (int): The number of guests of every run.
+        replications (int): The number of seeded replications per configuration.
+        seed (int): The root seed the replication seeds are spawned from; None uses 0 so that
+            the points can be cached.
+        cache_dir (str): The cache directory; None disables the cache.
+        max_workers (int): The number of worker processes; defaults to the number of CPUs.
+
+    Returns:
+        list: One row per configuration: its capacities, the mean of every metric over the
+            replications, and the number of replications computed and read from the cache
+            (counted on the first row only when a configuration appears several times).
+    """
+    unknown = {name for config in design for name in config} - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}.")
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed or 0).spawn(replications)]
+    version = code_version()
+    cache = SweepCache(cache_dir) if cache_dir is not None else None
+
+    summaries = {}
+    missing = {}
+    for config in design:
+        for replication_seed in seeds:
+            key = point_key(config, replication_seed, guests, version)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                summaries[key] = cached
+            elif key not in missing:
+                missing[key] = (config, replication_seed)
+    cached_keys = set(summaries)
+
+    if missing:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(evaluate, config, replication_seed, guests): key
+                       for key, (config, replication_seed) in missing.items()}
+            for future in concurrent.futures.as_completed(futures):
+                key = futures[future]
+                summaries[key] = future.result()
+                if cache is not None:
+                    cache.put(key, summaries[key])
+
+    rows = []
+    counted = set()
+    for config in design:
+        keys = [point_key(config, replication_seed, guests, version) for replication_seed in seeds]
+        row = dict(config)
+        for metric in METRICS:
+            row[metric] = float(np.mean([summaries[key][metric] for key in keys]))
+        # A configuration drawn twice reuses the runs of its first row
+        first = [key for key in keys if key not in counted]
+        counted.update(first)
+        row["cached"] = sum(key in cached_keys for key in first)
+        row["computed"] = len(first) - row["cached"]
+        rows.append(row)
+    return rows
+
+
+def print_table(rows):
+    """
+    Prints the rows of a sweep as a table.
+    """
+    if not rows:
+        return
+    columns = [name for name in PARAMETERS if name in rows[0]] + list(METRICS)
+    table = [columns] + [[f"{row[name]:.4g}" if isinstance(row[name], float) else str(row[name])
+                          for name in columns] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    for line in table:
+        print("  ".join(value.rjust(width) for value, width in zip(line, widths)))
+
+
+def write_csv(rows, path):
+    """
+    Writes the rows of a sweep to a CSV file; an empty sweep writes only the metric columns.
+    """
+    columns = list(rows[0]) if rows else list(METRICS) + ["cached", "computed"]
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parse_values(text):
+    name, _, values = text.partition("=")
+    return name, [int(value) for value in values.split(",")]
+
+
+def _parse_range(text):
+    name, _, bounds = text.partition("=")
+    low, _, high = bounds.partition(":")
+    return name, (int(low), int(high))
+
+
+def main(argv=None):
+    """
+    Parses the command line, runs a sweep and prints its table.
+    """
+    parser = argparse.ArgumentParser(description="Sweep the hotel's staffing and capacities.")
+    parser.add_argument("--grid", action="append", default=[], type=_parse_values, metavar="NAME=V1,V2,...",
+                        help="Values of a parameter for a full grid design (repeatable).")
+    parser.add_argument("--range", action="append", default=[], type=_parse_range, metavar="NAME=LOW:HIGH",
+                        help="Integer range of a parameter for a random or Latin hypercube design (repeatable).")
+    design_kind = parser.add_mutually_exclusive_group()
+    design_kind.add_argument("--random", type=int, default=None, metavar="N", help="Draw N random configurations.")
+    design_kind.add_argument("--lhs", type=int, default=None, metavar="N",
+                             help="Draw a Latin hypercube of N configurations.")
+    parser.add_argument("--guests", type=int, default=400, help="The number of guests of every run.")
+    parser.add_argument("-r", "--replications", type=int, default=3, help="Seeded replications per configuration.")
+    parser.add_argument("--seed", type=int, default=None, help="Root seed of the replications and of the design.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--cache-dir", default="sweep_cache", help="Directory of the memoized results.")
+    parser.add_argument("--no-cache", action="store_true", help="Compute every point and cache nothing.")
+    parser.add_argument("--sort", default=None, choices=METRICS, help="Sort the table by this metric.")
+    parser.add_argument("--output", default=None, help="Also write the table to this CSV file.")
+    args = parser.parse_args(argv)
+
+    if args.random is not None or args.lhs is not None:
+        if not args.range:
+            parser.error("--random and --lhs need at least one --range.")
+        space = dict(args.range)
+        if args.random is not None:
+            design = random_design(space, args.random, args.seed)
+        else:
+            design = latin_hypercube_design(space, args.lhs, args.seed)
+    else:
+        if not args.grid:
+            parser.error("Give a --grid, or --random or --lhs with --range.")
+        design = grid_design(dict(args.grid))
+
+    rows = run_sweep(design, args.guests, args.replications, args.seed,
+                     None if args.no_cache else args.cache_dir, args.workers)
+    if args.sort:
+        rows.sort(key=lambda row: row[args.sort])
+    print_table(rows)
+    computed = sum(row["computed"] for row in rows)
+    print(f"\n{len(rows)} configurations, {computed} runs computed, "
+          f"{sum(row['cached'] for row in rows)} read from the cache.")
+    if args.output:
+        write_csv(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+The traffic simulation on a grid of traffic lights, threaded or vectorized.
+"""
+from simulations import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "run_threaded": "traffic_simulation",
+    "run_vectorized": "traffic_simulation",
+    "GridEngine": "grid_engine",
+    "TiledGridEngine": "tiled_engine",
+    "PlanEvaluator": "signal_timing",
+    "load_plan": "signal_timing",
+    "RoadNetwork": "road_network",
+    "build_routing_table": "road_network",
+})
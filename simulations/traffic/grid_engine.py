@@ -0,0 +1,474 @@
+import time
+
+import numpy as np
+
+from simulations.traffic.road_network import RoutingTable
+
+# Car Directions (as drawn by `random.randrange(1, 3)` in the threaded simulation)
+DOWN = 1
+RIGHT = 2
+
+# Random Streams (each kind of decision hashes its own counter)
+DIRECTION_STREAM = 1
+ENTRY_STREAM = 2
+TURN_STREAM = 3
+LIGHT_STREAM = 4
+DESTINATION_STREAM = 5
+
+# Arrays making up the state of the engine, with `tick` and `key`
+STATE_ARRAYS = ("light_right", "light_timer", "light_flips", "right_queue", "down_queue", "direction", "x", "y",
+                "route_right", "queued", "cooldown", "active", "trip_ticks")
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_BELOW_ONE = np.nextafter(1.0, 0.0)
+
+
+def _mix(z):
+    """
+    The SplitMix64 finalizer: a bijective hash of 64-bit integers (Python ints or uint64 arrays).
+    """
+    if isinstance(z, np.ndarray):
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def check_plan(plan, number_of_x_squares, number_of_y_squares):
+    """
+    Checks that the values of a fixed-time plan fit the lights of a grid.
+
+    Args:
+        plan (dict): The "cycle", "green" and "offset" of the lights (see `GridEngine.set_plan`).
+        number_of_x_squares (int): The number of grid squares along the x axis.
+        number_of_y_squares (int): The number of grid squares along the y axis.
+
+    Raises:
+        ValueError: If an array of the plan does not have one value per light of the grid.
+    """
+    shape = (number_of_x_squares + 1, number_of_y_squares + 1)
+    for name in ("cycle", "green", "offset"):
+        values = np.asarray(plan[name])
+        try:
+            np.broadcast_shapes(values.shape, shape)
+        except ValueError:
+            grid = "×".join(str(size - 1) for size in values.shape) if values.ndim == 2 else f"{values.shape} lights"
+            raise ValueError(f"plan is for a {grid} grid, not {number_of_x_squares}×{number_of_y_squares}") from None
+
+
+def plan_ticks(plan, shape, tick_seconds):
+    """
+    Converts a fixed-time plan to whole ticks, as used by the lights of a GridEngine.
+
+    Args:
+        plan (dict): The "cycle", "green" and "offset" of the lights in seconds (see `GridEngine.set_plan`).
+        shape (tuple): The (x, y) shape of the lights.
+        tick_seconds (float): The simulated time covered by one tick.
+
+    Returns:
+        tuple: The cycle, green and offset arrays of the lights, in ticks. Cycles last at least
+            2 ticks and are green for each direction at least 1 tick.
+    """
+    cycle, green, offset = (np.broadcast_to(np.rint(np.asarray(plan[name], dtype=float) / tick_seconds),
+                                            shape).astype(np.int32)
+                            for name in ("cycle", "green", "offset"))
+    cycle = np.maximum(cycle, 2)
+    return cycle, np.clip(green, 1, cycle - 1), offset % cycle
+
+
+class GridEngine:
+    """
+    Simulates traffic on the grid with all cars and traffic lights advanced together, one tick at a time.
+
+    Instead of one thread per car and per intersection, the state of every light and car is
+    held in NumPy arrays and each tick is a handful of vectorized operations. The rules are
+    those of the threaded simulation: a car starts on the top edge going down or on the left
+    edge going right, changes direction with a probability of 1 in 9 at each intersection,
+    queues at the intersection and only moves on when the light allows its direction.
+
+    Random decisions come from a counter-based generator: each value is a hash of the seed,
+    the kind of decision, a counter (the number of flips for lights, the number of
+    intersections passed for a car's turns) and the car (or light) it is for. A car's decisions therefore do not
+    depend on the order in which cars are stored or processed, which keeps runs reproducible
+    when the grid is split between workers, and a car follows the same route whatever the
+    light timings. A light's phases are drawn as uniforms scaled to the range of phase
+    lengths, so compared light timings see common random numbers. An antithetic engine draws the
+    mirror image high - 1 - k of every value k of the same seed.
+
+    With a fixed-time plan, the lights no longer flip at random: each light lets cars move right
+    for the first `green` seconds of every cycle of `cycle` seconds, shifted by its `offset`, and
+    lets them move down for the rest of the cycle.
+
+    With a routing table of the grid network (`grid_network`), each car that can reach one of
+    the table's destinations from its entry point drives to one of them: at every intersection
+    it takes the direction of `RoutingTable.next_hop` instead of turning at random, and its
+    trip ends when it arrives. Cars that cannot reach any destination drive as before.
+
+    Attributes:
+        number_of_x_squares (int): The number of grid squares along the x axis.
+        number_of_y_squares (int): The number of grid squares along the y axis.
+        tick_seconds (float): The simulated time covered by one tick.
+        tick (int): The number of ticks simulated so far.
+        key (int): The 64-bit key of the counter-based random generator, derived from the seed.
+        antithetic (bool): Whether every drawn value is mirrored within its range.
+        light_right (numpy.ndarray): (x, y) booleans, True where the light lets cars move right.
+        light_timer (numpy.ndarray): (x, y) ticks until each light flips.
+        light_flips (numpy.ndarray): (x, y) number of times each light has flipped.
+        plan_cycle (numpy.ndarray): (x, y) cycle length of each light in ticks, or None without a plan.
+        plan_green (numpy.ndarray): (x, y) ticks of each cycle during which cars move right, or None.
+        plan_offset (numpy.ndarray): (x, y) ticks each light's cycle is shifted by, or None.
+        x (numpy.ndarray): The x coordinate of each car.
+        y (numpy.ndarray): The y coordinate of each car.
+        direction (numpy.ndarray): The initial direction of each car (DOWN or RIGHT).
+        route_right (numpy.ndarray): True for cars currently routed right, False for down.
+        queued (numpy.ndarray): True for cars waiting in an intersection queue.
+        cooldown (numpy.ndarray): Ticks until a moving car reaches the next intersection.
+        active (numpy.ndarray): True for cars still on the grid.
+        trip_ticks (numpy.ndarray): The tick at which each car left the grid, or -1.
+        routing (RoutingTable): The routing table of the grid network, or None.
+        destination_slot (numpy.ndarray): The row of `routing` each car drives to, -1 for cars
+            without a destination, or None without routing.
+        right_queue (numpy.ndarray): (x, y) number of cars queued to move right.
+        down_queue (numpy.ndarray): (x, y) number of cars queued to move down.
+    """
+    def __init__(self, number_of_x_squares=5, number_of_y_squares=5, number_of_cars=2, seed=None,
+                 tick_seconds=0.5, travel_seconds=1.5, light_seconds=(3, 7), antithetic=False, plan=None,
+                 routing=None):
+        """
+        Initializes the lights and places every car at its entry point.
+
+        Args:
+            number_of_x_squares (int): The number of grid squares along the x axis.
+            number_of_y_squares (int): The number of grid squares along the y axis.
+            number_of_cars (int): The number of cars to simulate.
+            seed (int or numpy.random.SeedSequence): Optional seed of the random decisions.
+            tick_seconds (float): The simulated time covered by one tick.
+            travel_seconds (float): The time a car takes to drive between intersections.
+            light_seconds (tuple): The range [low, high) of whole seconds between light flips.
+            antithetic (bool): Draw the antithetic twin of the run with the same seed.
+            plan (dict): Optional fixed-time plan replacing the random phases (see `set_plan`).
+            routing (RoutingTable): Optional routing table of the grid network (see `set_routing`).
+        """
+        self.number_of_x_squares = number_of_x_squares
+        self.number_of_y_squares = number_of_y_squares
+        self.tick_seconds = tick_seconds
+        self.travel_ticks = max(1, round(travel_seconds / tick_seconds))
+        self.light_seconds = light_seconds
+        sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.key = int(sequence.generate_state(1, np.uint64)[0])
+        self.antithetic = antithetic
+        self.tick = 0
+
+        shape = (number_of_x_squares + 1, number_of_y_squares + 1)
+        self.light_right = np.broadcast_to((np.arange(shape[0]) % 3 == 0)[:, None], shape).copy()
+        # Lights flip as soon as they start, like flipping_semaphore.
+        self.light_timer = np.zeros(shape, dtype=np.int32)
+        self.light_flips = np.zeros(shape, dtype=np.int32)
+        self.right_queue = np.zeros(shape, dtype=np.int32)
+        self.down_queue = np.zeros(shape, dtype=np.int32)
+
+        cars = np.arange(number_of_cars)
+        self.direction = (DOWN + self.draw(DIRECTION_STREAM, cars, 2)).astype(np.int8)
+        going_down = self.direction == DOWN
+        entry = self.draw(ENTRY_STREAM, cars, np.where(going_down, shape[0], shape[1]))
+        self.x = np.where(going_down, entry, 0).astype(np.int32)
+        self.y = np.where(going_down, 0, entry).astype(np.int32)
+        self.route_right = ~going_down
+        self.queued = np.zeros(number_of_cars, dtype=bool)
+        self.cooldown = np.zeros(number_of_cars, dtype=np.int32)
+        self.active = np.ones(number_of_cars, dtype=bool)
+        self.trip_ticks = np.full(number_of_cars, -1, dtype=np.int64)
+        self.plan_cycle = self.plan_green = self.plan_offset = None
+        if plan is not None:
+            self.set_plan(plan)
+        self.routing = self.destination_slot = None
+        if routing is not None:
+            self.set_routing(routing)
+
+    def set_plan(self, plan):
+        """
+        Switches the lights to a fixed-time plan, from the next tick on.
+
+        Args:
+            plan (dict): The "cycle", "green" and "offset" of the lights in seconds, each a number
+                or an array with one value per light. A light lets cars move right during the
+                first `green` seconds of each cycle, counted from `offset` seconds before tick 0.
+                None goes back to random phases.
+
+        Raises:
+            ValueError: If the plan is for a grid of another size (see `check_plan`).
+        """
+        if plan is None:
+            self.plan_cycle = self.plan_green = self.plan_offset = None
+            return
+        check_plan(plan, self.number_of_x_squares, self.number_of_y_squares)
+        self.plan_cycle, self.plan_green, self.plan_offset = plan_ticks(plan, self.light_right.shape,
+                                                                        self.tick_seconds)
+
+    def set_routing(self, routing):
+        """
+        Gives every car a destination of a routing table that it can reach from its entry point.
+
+        Each car draws its destination uniformly among the reachable ones, keyed on the car, so
+        the choice does not depend on the other cars.
+
+        Args:
+            routing (RoutingTable): A routing table of `grid_network` for the engine's grid.
+
+        Raises:
+            ValueError: If the table is not for a network of the grid's intersections.
+        """
+        nodes_y = self.number_of_y_squares + 1
+        if routing.next_hop.shape[1] != self.light_right.size:
+            raise ValueError(f"The routing table is for {routing.next_hop.shape[1]} intersections, "
+                             f"the grid has {self.light_right.size}.")
+        nodes = self.x * nodes_y + self.y
+        reachable = np.isfinite(routing.distance[:, nodes]).T
+        counts = reachable.sum(axis=1)
+        pick = self.draw(DESTINATION_STREAM, np.arange(self.number_of_cars), np.maximum(counts, 1))
+        slot = (np.cumsum(reachable, axis=1) > pick[:, None]).argmax(axis=1).astype(np.int32)
+        slot[counts == 0] = -1
+        self.routing = routing
+        self.destination_slot = slot
+
+    def get_plan(self):
+        """
+        Returns the fixed-time plan of the lights in seconds, or None if their phases are random.
+        """
+        if self.plan_cycle is None:
+            return None
+        return {name: getattr(self, f"plan_{name}") * self.tick_seconds for name in ("cycle", "green", "offset")}
+
+    @property
+    def number_of_cars(self):
+        return self.x.size
+
+    @property
+    def cars_on_grid(self):
+        return int(np.count_nonzero(self.active))
+
+    def draw(self, stream, ids, high, tick=0):
+        """
+        Draws one integer in [0, high) for each id from the counter-based generator.
+
+        Args:
+            stream (int): The kind of decision (DIRECTION_STREAM, TURN_STREAM, ...).
+            ids (numpy.ndarray): The cars or lights (as flat intersection indices) to draw for, possibly
+                combined with a per-car counter.
+            high (int or numpy.ndarray): The exclusive upper bound, per id or shared.
+            tick (int): The tick the values are drawn for.
+
+        Returns:
+            numpy.ndarray: The drawn integers, as int64.
+        """
+        values = (self._hash(stream, ids, tick) % np.asarray(high, dtype=np.uint64)).astype(np.int64)
+        if self.antithetic:
+            values = np.asarray(high, dtype=np.int64) - 1 - values
+        return values
+
+    def uniform(self, stream, ids, tick=0):
+        """
+        Draws one float in [0, 1) for each id from the counter-based generator (see `draw`).
+        """
+        values = (self._hash(stream, ids, tick) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+        if self.antithetic:
+            values = np.minimum(1.0 - values, _BELOW_ONE)
+        return values
+
+    def _hash(self, stream, ids, tick):
+        base = _mix((self.key + stream * _GOLDEN) & _MASK)
+        base = _mix(base ^ ((tick * _GOLDEN) & _MASK))
+        return _mix(np.asarray(ids, dtype=np.uint64) * np.uint64(_GOLDEN) + np.uint64(base))
+
+    def _flip_lights(self):
+        if self.plan_cycle is not None:
+            self.light_right = (self.tick + self.plan_offset) % self.plan_cycle < self.plan_green
+            return
+        self.light_timer -= 1
+        flipping = self.light_timer <= 0
+        lights = np.flatnonzero(flipping)
+        if lights.size:
+            self.light_right[flipping] = ~self.light_right[flipping]
+            low, high = self.light_seconds
+            # The n-th phase of a light is drawn for (light, n), whatever the tick.
+            phases = self.uniform(LIGHT_STREAM, (lights << 32) + self.light_flips[flipping])
+            seconds = low + np.floor((high - low) * phases)
+            self.light_flips[flipping] += 1
+            self.light_timer[flipping] = np.maximum(1, np.rint(seconds / self.tick_seconds)).astype(np.int32)
+
+    def step(self):
+        """
+        Advances every light and car by one tick.
+
+        Returns:
+            int: The number of cars that moved to the next intersection during the tick.
+        """
+        self._flip_lights()
+
+        # Cars driving between intersections get closer to the next one.
+        driving = np.flatnonzero(self.cooldown)
+        self.cooldown[driving] -= 1
+
+        # Cars reaching an intersection may change direction, then join its queue. The draw is
+        # keyed on the car and the number of intersections it has passed (x + y), not the tick,
+        # so a car takes the same route whatever the lights do.
+        arriving = np.flatnonzero(self.active & ~self.queued & (self.cooldown == 0))
+        turning = arriving
+        if self.routing is not None:
+            arriving = self._route(arriving)
+            turning = arriving[self.destination_slot[arriving] < 0]
+        changing = turning[self.draw(TURN_STREAM, (turning << 32) + self.x[turning] + self.y[turning], 9) == 0]
+        self.route_right[changing] = self.direction[changing] == DOWN
+        self.queued[arriving] = True
+
+        # Queued cars leave when the light allows their route.
+        waiting = np.flatnonzero(self.queued)
+        green = self.light_right[self.x[waiting], self.y[waiting]] == self.route_right[waiting]
+        moving = waiting[green]
+        moving_right = self.route_right[moving]
+        self.x[moving] += moving_right
+        self.y[moving] += ~moving_right
+        self.queued[moving] = False
+        self.cooldown[moving] = self.travel_ticks
+
+        left_grid = moving[(self.x[moving] > self.number_of_x_squares) | (self.y[moving] > self.number_of_y_squares)]
+        self.active[left_grid] = False
+        self.cooldown[left_grid] = 0
+        self.trip_ticks[left_grid] = self.tick + 1
+
+        self._count_queues(waiting[~green])
+        self.tick += 1
+        return moving.size
+
+    def _route(self, arriving):
+        # Routed cars take the next hop towards their destination, and stop there.
+        routed = arriving[self.destination_slot[arriving] >= 0]
+        nodes_y = self.number_of_y_squares + 1
+        nodes = self.x[routed] * nodes_y + self.y[routed]
+        hops = self.routing.next_hops(nodes, self.destination_slot[routed])
+        arrived = routed[hops < 0]
+        self.active[arrived] = False
+        self.trip_ticks[arrived] = self.tick
+        going = hops >= 0
+        self.route_right[routed[going]] = hops[going] == nodes[going] + nodes_y
+        return arriving[self.active[arriving]]
+
+    def _count_queues(self, waiting):
+        nodes = self.right_queue.size
+        index = self.x[waiting] * self.right_queue.shape[1] + self.y[waiting]
+        right = self.route_right[waiting]
+        self.right_queue = np.bincount(index[right], minlength=nodes).reshape(self.right_queue.shape).astype(np.int32)
+        self.down_queue = np.bincount(index[~right], minlength=nodes).reshape(self.down_queue.shape).astype(np.int32)
+
+    def run(self, max_ticks=None):
+        """
+        Steps the simulation until every car has left the grid or `max_ticks` ticks have been simulated.
+
+        Args:
+            max_ticks (int): Optional limit on the number of ticks to simulate.
+
+        Returns:
+            dict: A summary of the run (see `summary`).
+        """
+        start = time.perf_counter()
+        first_tick = self.tick
+        moves = 0
+        while self.active.any() and (max_ticks is None or self.tick - first_tick < max_ticks):
+            moves += self.step()
+        return self.summary(time.perf_counter() - start, self.tick - first_tick, moves)
+
+    # State
+    def get_state(self):
+        """
+        Returns the full state of the engine as arrays and scalars, for checkpointing.
+
+        The counter-based generator has no state beyond its key and the tick, so saving them
+        is enough to continue with exactly the same random decisions.
+
+        Returns:
+            dict: Maps names to numpy arrays or numbers.
+        """
+        state = {name: getattr(self, name) for name in STATE_ARRAYS}
+        state.update({
+            "number_of_x_squares": self.number_of_x_squares,
+            "number_of_y_squares": self.number_of_y_squares,
+            "tick_seconds": self.tick_seconds,
+            "travel_ticks": self.travel_ticks,
+            "light_low": self.light_seconds[0],
+            "light_high": self.light_seconds[1],
+            "key": self.key,
+            "tick": self.tick,
+            "antithetic": int(self.antithetic),
+        })
+        if self.plan_cycle is not None:
+            state.update(plan_cycle=self.plan_cycle, plan_green=self.plan_green, plan_offset=self.plan_offset)
+        if self.routing is not None:
+            state.update(destination_slot=self.destination_slot, routing_destinations=self.routing.destinations,
+                         routing_next_hop=self.routing.next_hop, routing_distance=self.routing.distance)
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates an engine from a state returned by `get_state` (the arrays are copied).
+        """
+        engine = cls.__new__(cls)
+        for name in ("number_of_x_squares", "number_of_y_squares", "travel_ticks", "key", "tick"):
+            setattr(engine, name, int(state[name]))
+        engine.tick_seconds = float(state["tick_seconds"])
+        engine.antithetic = bool(state.get("antithetic", 0))
+        engine.light_seconds = (int(state["light_low"]), int(state["light_high"]))
+        for name in STATE_ARRAYS:
+            if name in state:
+                setattr(engine, name, np.array(state[name]))
+        if "light_flips" not in state:
+            # Checkpoints from before lights counted their flips
+            engine.light_flips = np.zeros_like(engine.light_timer)
+        engine.plan_cycle = engine.plan_green = engine.plan_offset = None
+        if "plan_cycle" in state:
+            for name in ("plan_cycle", "plan_green", "plan_offset"):
+                setattr(engine, name, np.array(state[name]))
+        engine.routing = engine.destination_slot = None
+        if "destination_slot" in state:
+            engine.routing = RoutingTable(np.array(state["routing_destinations"]), np.array(state["routing_next_hop"]),
+                                          np.array(state["routing_distance"]))
+            engine.destination_slot = np.array(state["destination_slot"])
+        return engine
+
+    def trip_times(self):
+        """
+        Returns the trip time, in simulated seconds, of every car that has left the grid.
+        """
+        return self.trip_ticks[self.trip_ticks >= 0] * self.tick_seconds
+
+    def summary(self, elapsed=None, ticks=None, moves=None):
+        """
+        Summarizes the state of the simulation.
+
+        Args:
+            elapsed (float): Optional wall-clock duration of the run, in seconds.
+            ticks (int): Optional number of ticks simulated during the run.
+            moves (int): Optional number of car moves during the run.
+
+        Returns:
+            dict: Cars finished, mean trip time, queue lengths and, when timings are given, ticks per second.
+        """
+        trips = self.trip_times()
+        summary = {
+            "cars": self.number_of_cars,
+            "cars_finished": int(trips.size),
+            "simulated_seconds": self.tick * self.tick_seconds,
+            "mean_trip_time": float(trips.mean()) if trips.size else float("nan"),
+            "max_trip_time": float(trips.max()) if trips.size else float("nan"),
+            "cars_queued": int(self.right_queue.sum() + self.down_queue.sum()),
+            "longest_queue": int(max(self.right_queue.max(), self.down_queue.max())),
+        }
+        if moves is not None:
+            summary["moves"] = moves
+        if elapsed is not None and ticks:
+            summary["ticks_per_second"] = ticks / elapsed if elapsed > 0 else float("inf")
+            summary["moves_per_second"] = moves / elapsed if elapsed > 0 else float("inf")
+        return summary
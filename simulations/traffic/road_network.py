@@ -0,0 +1,421 @@
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+
+class RoadNetwork:
+    """
+    A directed road network stored in compressed sparse row (CSR) form.
+
+    The outgoing roads of node `i` are `indices[indptr[i]:indptr[i + 1]]`, with the matching
+    road lengths in `lengths`. Nodes are numbered 0..num_nodes-1; `node_ids` keeps the
+    identifiers used by the source file.
+
+    Attributes:
+        coordinates (numpy.ndarray): (num_nodes, 2) coordinates of the intersections.
+        indptr (numpy.ndarray): (num_nodes + 1,) offsets into `indices` for each node.
+        indices (numpy.ndarray): (num_edges,) destination node of each road.
+        lengths (numpy.ndarray): (num_edges,) length of each road.
+        node_ids (numpy.ndarray): (num_nodes,) identifiers of the nodes in the source data.
+    """
+    def __init__(self, coordinates, indptr, indices, lengths, node_ids=None):
+        self.coordinates = np.asarray(coordinates, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.node_ids = np.arange(self.num_nodes) if node_ids is None else np.asarray(node_ids)
+        self._index_of = None
+        self._hash = None
+
+    @classmethod
+    def from_edges(cls, sources, targets, lengths=None, coordinates=None, node_ids=None):
+        """
+        Builds a network from parallel arrays of edge endpoints.
+
+        Args:
+            sources (array-like): The start node index of each road.
+            targets (array-like): The end node index of each road.
+            lengths (array-like): Optional length of each road; defaults to 1.
+            coordinates (array-like): Optional (num_nodes, 2) node coordinates.
+            node_ids (array-like): Optional identifiers of the nodes.
+
+        Returns:
+            RoadNetwork: The network in CSR form.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        lengths = np.ones(sources.size) if lengths is None else np.asarray(lengths, dtype=np.float64)
+        if coordinates is not None:
+            num_nodes = len(coordinates)
+        elif node_ids is not None:
+            num_nodes = len(node_ids)
+        else:
+            num_nodes = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        if coordinates is None:
+            coordinates = np.zeros((num_nodes, 2))
+
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        return cls(coordinates, indptr, targets[order], lengths[order], node_ids)
+
+    @property
+    def num_nodes(self):
+        return self.indptr.size - 1
+
+    @property
+    def num_edges(self):
+        return self.indices.size
+
+    def neighbors(self, node):
+        """
+        Returns the nodes reachable from `node` by a single road.
+        """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def edge_sources(self):
+        """
+        Returns the start node of every road, aligned with `indices` and `lengths`.
+        """
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    def reversed(self):
+        """
+        Returns the network with the direction of every road flipped.
+        """
+        return RoadNetwork.from_edges(self.indices, self.edge_sources(), self.lengths, self.coordinates, self.node_ids)
+
+    def node_index(self, node_id):
+        """
+        Returns the index of the node with the given source identifier.
+        """
+        if self._index_of is None:
+            self._index_of = {node.item() if hasattr(node, "item") else node: index
+                              for index, node in enumerate(self.node_ids)}
+        return self._index_of[node_id]
+
+    def network_hash(self):
+        """
+        Returns a hex digest identifying the topology and road lengths of the network.
+        """
+        if self._hash is None:
+            digest = hashlib.sha256()
+            for array in (self.indptr, self.indices, self.lengths):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._hash = digest.hexdigest()
+        return self._hash
+
+    def __repr__(self):
+        return f"RoadNetwork: {self.num_nodes} nodes, {self.num_edges} roads"
+
+
+def grid_network(number_of_x_squares, number_of_y_squares):
+    """
+    Generates the rectangular grid used by the traffic simulation as a RoadNetwork.
+
+    Node `x * (number_of_y_squares + 1) + y` is the intersection at (x, y), and every
+    intersection has a road to its right and down neighbours inside the grid.
+
+    Args:
+        number_of_x_squares (int): The number of grid squares along the x axis.
+        number_of_y_squares (int): The number of grid squares along the y axis.
+
+    Returns:
+        RoadNetwork: The grid network.
+    """
+    nx, ny = number_of_x_squares + 1, number_of_y_squares + 1
+    x, y = np.meshgrid(np.arange(nx), np.arange(ny), indexing="ij")
+    nodes = (x * ny + y).ravel()
+    coordinates = np.column_stack([x.ravel(), y.ravel()])
+    right = nodes[x.ravel() < nx - 1]
+    down = nodes[y.ravel() < ny - 1]
+    sources = np.concatenate([right, down])
+    targets = np.concatenate([right + ny, down + 1])
+    return RoadNetwork.from_edges(sources, targets, coordinates=coordinates)
+
+
+def load_edge_list(path, nodes_path=None, delimiter=","):
+    """
+    Loads a network from an edge-list file with `source`, `target` and optional `length` columns.
+
+    Lines starting with '#' are ignored. Roads are one-way unless a `oneway` column is present
+    and set to 0/false for that row, in which case the reverse road is added too.
+
+    Args:
+        path (str): The edge-list file.
+        nodes_path (str): Optional node file with `id`, `x` and `y` columns.
+        delimiter (str): The column delimiter.
+
+    Returns:
+        RoadNetwork: The loaded network.
+    """
+    index_of = {}
+    coordinates = []
+
+    def node(node_id):
+        if node_id not in index_of:
+            index_of[node_id] = len(index_of)
+            coordinates.append((math.nan, math.nan))
+        return index_of[node_id]
+
+    if nodes_path is not None:
+        with open(nodes_path, newline="") as file:
+            for row in csv.DictReader(_data_lines(file), delimiter=delimiter):
+                coordinates[node(row["id"])] = (float(row["x"]), float(row["y"]))
+
+    sources, targets, lengths = [], [], []
+    with open(path, newline="") as file:
+        for row in csv.DictReader(_data_lines(file), delimiter=delimiter):
+            source, target = node(row["source"]), node(row["target"])
+            length = float(row["length"]) if row.get("length") not in (None, "") else 1.0
+            sources.append(source)
+            targets.append(target)
+            lengths.append(length)
+            if row.get("oneway", "1").strip().lower() in ("0", "false", "no"):
+                sources.append(target)
+                targets.append(source)
+                lengths.append(length)
+
+    return RoadNetwork.from_edges(sources, targets, lengths, coordinates, list(index_of))
+
+
+def load_geojson(path, precision=7):
+    """
+    Loads a network from a GeoJSON FeatureCollection of LineString or MultiLineString roads.
+
+    The end points of every line are intersections; points closer than `precision` decimal
+    places are merged. Road lengths are great-circle distances in metres along the line. A
+    road is two-way unless its `oneway` property is true.
+
+    Args:
+        path (str): The GeoJSON file.
+        precision (int): The number of decimal places used to match end points.
+
+    Returns:
+        RoadNetwork: The loaded network.
+    """
+    with open(path) as file:
+        collection = json.load(file)
+
+    index_of = {}
+    coordinates = []
+
+    def node(point):
+        key = (round(point[0], precision), round(point[1], precision))
+        if key not in index_of:
+            index_of[key] = len(index_of)
+            coordinates.append(key)
+        return index_of[key]
+
+    sources, targets, lengths = [], [], []
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "LineString":
+            lines = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiLineString":
+            lines = geometry["coordinates"]
+        else:
+            continue
+        oneway = bool((feature.get("properties") or {}).get("oneway", False))
+        for line in lines:
+            if len(line) < 2:
+                continue
+            source, target = node(line[0]), node(line[-1])
+            length = sum(_haversine(a, b) for a, b in zip(line, line[1:]))
+            sources.append(source)
+            targets.append(target)
+            lengths.append(length)
+            if not oneway:
+                sources.append(target)
+                targets.append(source)
+                lengths.append(length)
+
+    return RoadNetwork.from_edges(sources, targets, lengths, coordinates)
+
+
+def load_network(path, nodes_path=None):
+    """
+    Loads a network, choosing the importer from the file extension (.geojson/.json or an edge list).
+    """
+    if os.path.splitext(path)[1].lower() in (".geojson", ".json"):
+        return load_geojson(path)
+    return load_edge_list(path, nodes_path)
+
+
+def _data_lines(file):
+    return (line for line in file if line.strip() and not line.lstrip().startswith("#"))
+
+
+def _haversine(a, b):
+    lon1, lat1, lon2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * math.asin(math.sqrt(h))
+
+
+class RoutingTable:
+    """
+    Precomputed shortest-path next hops from every node towards a set of destinations.
+
+    Routing a car is an array lookup: `next_hop[slot, node]` is the node to drive to from
+    `node` to reach `destinations[slot]` on a shortest path.
+
+    Attributes:
+        destinations (numpy.ndarray): (k,) the destination nodes.
+        next_hop (numpy.ndarray): (k, num_nodes) next node, or -1 at the destination or if unreachable.
+        distance (numpy.ndarray): (k, num_nodes) shortest distance to the destination, inf if unreachable.
+    """
+    def __init__(self, destinations, next_hop, distance):
+        self.destinations = destinations
+        self.next_hop = next_hop
+        self.distance = distance
+        self._slot_of = {int(node): slot for slot, node in enumerate(destinations)}
+
+    def slot(self, destination):
+        """
+        Returns the row of the table for a destination node.
+        """
+        return self._slot_of[int(destination)]
+
+    def next_hops(self, nodes, slots):
+        """
+        Returns the next node for many cars at once.
+
+        Args:
+            nodes (numpy.ndarray): The node each car is at.
+            slots (numpy.ndarray): The table row of each car's destination.
+        """
+        return self.next_hop[slots, nodes]
+
+    def route(self, origin, destination):
+        """
+        Returns the shortest path from `origin` to `destination` as a list of nodes, or [] if unreachable.
+        """
+        slot = self.slot(destination)
+        if not np.isfinite(self.distance[slot, origin]):
+            return []
+        path = [origin]
+        while path[-1] != destination:
+            path.append(int(self.next_hop[slot, path[-1]]))
+        return path
+
+
+def build_routing_table(network, destinations=None, cache_dir=None):
+    """
+    Computes (or loads from the on-disk cache) the next-hop table of a network.
+
+    Each destination is solved with one Dijkstra search over the reversed network, and the
+    table holds one row of next hops and distances per destination. Large networks should be
+    routed to a subset of their nodes (see `pick_destinations`): a table of every node is
+    quadratic in the number of nodes, in both time and memory. When `cache_dir` is given, tables are stored there as .npz files keyed by the network hash and
+    the destinations, so the same network is only ever solved once.
+
+    Args:
+        network (RoadNetwork): The road network.
+        destinations (array-like): The destination nodes; defaults to every node, for small networks.
+        cache_dir (str): Optional directory of cached routing tables.
+
+    Returns:
+        RoutingTable: The routing table.
+    """
+    if destinations is None:
+        destinations = np.arange(network.num_nodes, dtype=np.int32)
+    destinations = np.asarray(destinations, dtype=np.int32)
+
+    cache_path = None
+    if cache_dir is not None:
+        key = hashlib.sha256(network.network_hash().encode() + destinations.tobytes()).hexdigest()[:32]
+        cache_path = os.path.join(cache_dir, f"routing-{key}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return RoutingTable(cached["destinations"], cached["next_hop"], cached["distance"])
+
+    reverse = network.reversed()
+    next_hop = np.full((destinations.size, network.num_nodes), -1, dtype=np.int32)
+    distance = np.full((destinations.size, network.num_nodes), np.inf)
+    for slot, destination in enumerate(destinations):
+        _dijkstra_to(reverse, int(destination), next_hop[slot], distance[slot])
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = cache_path + ".tmp.npz"
+        np.savez(temporary, destinations=destinations, next_hop=next_hop, distance=distance)
+        os.replace(temporary, cache_path)
+    return RoutingTable(destinations, next_hop, distance)
+
+
+def pick_destinations(network, count, seed=None):
+    """
+    Picks distinct destination nodes of a network at random.
+
+    Args:
+        network (RoadNetwork): The road network.
+        count (int): The number of destinations; all nodes if it is not smaller than the network.
+        seed (int): Optional seed of the choice.
+
+    Returns:
+        numpy.ndarray: The sorted destination nodes, as int32.
+    """
+    if count >= network.num_nodes:
+        return np.arange(network.num_nodes, dtype=np.int32)
+    chosen = np.random.default_rng(seed).choice(network.num_nodes, size=count, replace=False)
+    return np.sort(chosen).astype(np.int32)
+
+
+def _dijkstra_to(reverse, destination, next_hop, distance):
+    indptr = reverse.indptr.tolist()
+    indices = reverse.indices.tolist()
+    lengths = reverse.lengths.tolist()
+    best = [math.inf] * reverse.num_nodes
+    hop = [-1] * reverse.num_nodes
+    best[destination] = 0.0
+    heap = [(0.0, destination)]
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if dist > best[node]:
+            continue
+        for edge in range(indptr[node], indptr[node + 1]):
+            previous = indices[edge]
+            candidate = dist + lengths[edge]
+            if candidate < best[previous]:
+                best[previous] = candidate
+                hop[previous] = node
+                heapq.heappush(heap, (candidate, previous))
+    distance[:] = best
+    next_hop[:] = hop
+
+
+def main(argv=None):
+    """
+    Imports a road network file and precomputes its routing table into the cache.
+    """
+    parser = argparse.ArgumentParser(description="Import a road network and cache its routing table.")
+    parser.add_argument("path", help="An edge-list (.csv) or GeoJSON (.geojson) file.")
+    parser.add_argument("--nodes", default=None, help="Optional node file (id, x, y) for edge lists.")
+    parser.add_argument("--cache-dir", default=".routing_cache", help="Directory of cached routing tables.")
+    parser.add_argument("--destinations", type=int, default=64,
+                        help="The number of destination nodes to route to, picked at random; 0 routes to every "
+                             "node, which is quadratic in the size of the network.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the choice of destinations.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    network = load_network(args.path, args.nodes)
+    print(f"Loaded {network} in {time.perf_counter() - start:.3f}s (hash {network.network_hash()[:16]}).")
+    start = time.perf_counter()
+    destinations = pick_destinations(network, args.destinations or network.num_nodes, args.seed)
+    table = build_routing_table(network, destinations, cache_dir=args.cache_dir)
+    reachable = np.isfinite(table.distance).mean()
+    print(f"Routing table to {destinations.size} destinations ready in {time.perf_counter() - start:.3f}s "
+          f"({(table.next_hop.nbytes + table.distance.nbytes) / 2 ** 20:.1f} MiB); "
+          f"{reachable:.1%} of node-destination pairs are connected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""
+Optimization of fixed-time traffic light plans on the vectorized grid.
+
+A plan gives every light a cycle length, the green time of the right direction within the
+cycle (the rest of the cycle is green for cars moving down) and an offset, which lines up the
+cycles of neighbouring lights into green waves. Plans are evaluated in headless runs of the
+grid: `PlanBatch` steps the same cars through many plans at once, with the rules of
+`GridEngine.step` and the cars' routes drawn from the same counter-based generator, so every
+plan sees the same traffic (common random numbers). Evaluated plans are cached.
+
+The search is a coordinate descent over the lights and their cycle, split and offset. At each
+step, the candidate values of one parameter of one light are evaluated together in one batch
+and the best one is kept if it lowers the mean trip time. A cheap surrogate, the delay of
+platoons between neighbouring lights computed from the plan alone, can screen the candidates
+so that only the most promising ones are simulated.
+
+Example:
+    python -m simulations signals --grid 5 --cars 200 --seeds 2 --output plan.json
+    python -m simulations traffic --mode vectorized --grid 5 --cars 200 --seed 0 --plan plan.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from simulations.traffic.grid_engine import DOWN, TURN_STREAM, GridEngine, check_plan, plan_ticks
+
+# Search space: cycle lengths in seconds, and fractions of the cycle green for cars moving right
+CYCLES = (4, 6, 8, 10, 12, 16)
+SPLITS = (0.3, 0.4, 0.5, 0.6, 0.7)
+PARAMETERS = ("cycle", "split", "offset")
+
+# Plans simulated together in one batch
+BATCH_SIZE = 64
+
+
+def uniform_plan(shape, cycle=8.0, split=0.5, offset=0.0):
+    """
+    Returns a plan giving every light the same cycle, split and offset.
+
+    Args:
+        shape (tuple): The (x, y) shape of the lights, one more than the squares per side.
+        cycle (float): The cycle length in seconds.
+        split (float): The fraction of the cycle during which cars move right.
+        offset (float): The offset of every cycle in seconds.
+
+    Returns:
+        dict: The "cycle", "green" and "offset" arrays of the plan, in seconds.
+    """
+    return {
+        "cycle": np.full(shape, float(cycle)),
+        "green": np.full(shape, float(cycle) * split),
+        "offset": np.full(shape, float(offset)),
+    }
+
+
+def save_plan(path, plan, result=None):
+    """
+    Writes a plan, and optionally its evaluation, as JSON.
+    """
+    document = {name: np.asarray(plan[name]).tolist() for name in ("cycle", "green", "offset")}
+    if result is not None:
+        document["result"] = result
+    with open(path, "w") as file:
+        json.dump(document, file, indent=1)
+
+
+def load_plan(path):
+    """
+    Reads a plan written by `save_plan`, as a dict of arrays in seconds.
+    """
+    with open(path) as file:
+        document = json.load(file)
+    return {name: np.array(document[name], dtype=float) for name in ("cycle", "green", "offset")}
+
+
+class PlanBatch:
+    """
+    Runs the cars of one GridEngine through several fixed-time plans at once.
+
+    The cars of every plan are copies of the engine's cars, stored one copy after the other in
+    the same arrays, and the lights of all plans form one (plan, x, y) array. A step applies
+    the rules of GridEngine.step to every copy, drawing the turns of a car from the engine's
+    generator, so the copy of a car in every plan makes the same decisions as the car itself
+    would in a GridEngine with that plan.
+
+    Attributes:
+        engine (GridEngine): The engine whose cars and generator are used; it is not modified.
+        plans (int): The number of plans.
+        cycle (numpy.ndarray): (plan, x, y) cycle of each light, in ticks.
+        green (numpy.ndarray): (plan, x, y) ticks of each cycle during which cars move right.
+        offset (numpy.ndarray): (plan, x, y) offset of each light, in ticks.
+        tick (int): The number of ticks simulated so far.
+        queued_ticks (numpy.ndarray): The number of (car, tick) pairs spent queued, per plan.
+        longest_queue (numpy.ndarray): The longest queue at any light and direction, per plan.
+    """
+    def __init__(self, engine, plans):
+        """
+        Args:
+            engine (GridEngine): A new engine (at tick 0) with the cars to run.
+            plans (list): The plans, as dicts of "cycle", "green" and "offset" in seconds.
+        """
+        self.engine = engine
+        self.plans = len(plans)
+        self.cycle, self.green, self.offset = (np.stack(values) for values in zip(*map(self._ticks, plans)))
+        self.tick = engine.tick
+
+        cars = engine.number_of_cars
+        self.copy = np.repeat(np.arange(self.plans), cars)
+        self.car = np.tile(np.arange(cars), self.plans)
+        for name in ("direction", "x", "y", "route_right", "queued", "cooldown", "active", "trip_ticks"):
+            setattr(self, name, np.tile(getattr(engine, name), self.plans))
+        self.queued_ticks = np.zeros(self.plans, dtype=np.int64)
+        self.longest_queue = np.zeros(self.plans, dtype=np.int64)
+
+    def _ticks(self, plan):
+        # The plan in ticks, rounded and clipped exactly as by GridEngine.set_plan
+        engine = self.engine
+        check_plan(plan, engine.number_of_x_squares, engine.number_of_y_squares)
+        return plan_ticks(plan, engine.light_right.shape, engine.tick_seconds)
+
+    def step(self):
+        """
+        Advances the cars of every plan by one tick.
+        """
+        engine = self.engine
+        light_right = (self.tick + self.offset) % self.cycle < self.green
+
+        driving = np.flatnonzero(self.cooldown)
+        self.cooldown[driving] -= 1
+
+        arriving = np.flatnonzero(self.active & ~self.queued & (self.cooldown == 0))
+        hops = (self.car[arriving] << 32) + self.x[arriving] + self.y[arriving]
+        changing = arriving[engine.draw(TURN_STREAM, hops, 9) == 0]
+        self.route_right[changing] = self.direction[changing] == DOWN
+        self.queued[arriving] = True
+
+        waiting = np.flatnonzero(self.queued)
+        green = light_right[self.copy[waiting], self.x[waiting], self.y[waiting]] == self.route_right[waiting]
+        moving = waiting[green]
+        moving_right = self.route_right[moving]
+        self.x[moving] += moving_right
+        self.y[moving] += ~moving_right
+        self.queued[moving] = False
+        self.cooldown[moving] = engine.travel_ticks
+
+        left_grid = moving[(self.x[moving] > engine.number_of_x_squares) | (self.y[moving] > engine.number_of_y_squares)]
+        self.active[left_grid] = False
+        self.cooldown[left_grid] = 0
+        self.trip_ticks[left_grid] = self.tick + 1
+
+        # Queue lengths per plan, light and direction
+        stuck = waiting[~green]
+        if stuck.size:
+            self.queued_ticks += np.bincount(self.copy[stuck], minlength=self.plans)
+            lights = light_right[0].size
+            index = ((self.copy[stuck] * lights + self.x[stuck] * light_right.shape[2] + self.y[stuck]) * 2
+                     + self.route_right[stuck])
+            queues = np.bincount(index, minlength=self.plans * lights * 2).reshape(self.plans, -1)
+            np.maximum(self.longest_queue, queues.max(axis=1), out=self.longest_queue)
+        self.tick += 1
+
+    def run(self, max_ticks=None):
+        """
+        Steps until every car of every plan has left the grid or `max_ticks` ticks have been simulated.
+
+        Returns:
+            list: The result of each plan (see `results`).
+        """
+        first_tick = self.tick
+        while self.active.any() and (max_ticks is None or self.tick - first_tick < max_ticks):
+            self.step()
+        return self.results()
+
+    def results(self):
+        """
+        Returns, for each plan, the mean trip time of the cars (those still on the grid count the
+        time simulated so far), the cars finished, and the mean and longest queue lengths.
+        """
+        engine = self.engine
+        trip_ticks = np.where(self.trip_ticks >= 0, self.trip_ticks, self.tick).reshape(self.plans, -1)
+        finished = (self.trip_ticks >= 0).reshape(self.plans, -1).sum(axis=1)
+        lights = self.cycle[0].size
+        ticks = max(self.tick - engine.tick, 1)
+        return [{
+            "mean_trip_time": float(trip_ticks[plan].mean() * engine.tick_seconds) if trip_ticks.size else 0.0,
+            "cars_finished": int(finished[plan]),
+            "mean_queue": float(self.queued_ticks[plan] / (ticks * lights)),
+            "longest_queue": int(self.longest_queue[plan]),
+        } for plan in range(self.plans)]
+
+
+class PlanCache:
+    """
+    Memoizes plan evaluations by a hash of the plan and of the traffic it was evaluated with.
+
+    Attributes:
+        path (str): The JSON file the cache is loaded from and saved to, or None to keep it in memory.
+        hits (int): The number of evaluations read from the cache.
+        misses (int): The number of evaluations that had to be simulated.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                self._results = json.load(file)
+
+    def get(self, key):
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._results[key] = result
+
+    def save(self):
+        """
+        Writes the cache to its file, if it has one.
+        """
+        if self.path is not None:
+            with open(self.path, "w") as file:
+                json.dump(self._results, file)
+
+    def __len__(self):
+        return len(self._results)
+
+
+class PlanEvaluator:
+    """
+    Evaluates plans on a grid with the same cars for every plan, averaging over seeds.
+
+    Attributes:
+        grid (int): The number of squares per side of the grid.
+        cars (int): The number of cars of each run.
+        seeds (list): The seeds of the runs each plan is evaluated with.
+        max_ticks (int): The maximum number of ticks of a run.
+        cache (PlanCache): The cache of evaluated plans.
+        evaluations (int): The number of plans simulated (cache hits excluded).
+        seconds (float): The wall-clock time spent simulating.
+    """
+    def __init__(self, grid=5, cars=200, seeds=(0,), max_ticks=2000, cache=None):
+        self.grid = grid
+        self.cars = cars
+        self.seeds = list(seeds)
+        self.max_ticks = max_ticks
+        self.cache = cache if cache is not None else PlanCache()
+        self.evaluations = 0
+        self.seconds = 0.0
+        self._engine = self.engine(self.seeds[0])
+
+    def engine(self, seed, plan=None):
+        """
+        Returns a new GridEngine with the cars of one seed.
+        """
+        return GridEngine(self.grid, self.grid, self.cars, seed=seed, plan=plan)
+
+    @property
+    def shape(self):
+        return self._engine.light_right.shape
+
+    def key(self, plan):
+        """
+        Returns the cache key of a plan: the plan in ticks and the settings of the runs.
+        """
+        engine = self._engine
+        engine.set_plan(plan)
+        digest = hashlib.sha256(json.dumps([self.grid, self.cars, self.seeds, self.max_ticks,
+                                            engine.tick_seconds, engine.travel_ticks]).encode())
+        for values in (engine.plan_cycle, engine.plan_green, engine.plan_offset):
+            digest.update(values.tobytes())
+        engine.set_plan(None)
+        return digest.hexdigest()[:32]
+
+    def evaluate(self, plans):
+        """
+        Returns the result of each plan (see PlanBatch.results), averaged over the seeds.
+        """
+        keys = [self.key(plan) for plan in plans]
+        results = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, result in results.items() if result is None]
+        if missing:
+            start = time.perf_counter()
+            by_key = dict(zip(keys, plans))
+            for first in range(0, len(missing), BATCH_SIZE):
+                chunk = missing[first:first + BATCH_SIZE]
+                runs = [PlanBatch(self.engine(seed), [by_key[key] for key in chunk]).run(self.max_ticks)
+                        for seed in self.seeds]
+                for index, key in enumerate(chunk):
+                    results[key] = {name: float(np.mean([run[index][name] for run in runs]))
+                                    for name in runs[0][index]}
+                    self.cache.put(key, results[key])
+            self.evaluations += len(missing)
+            self.seconds += time.perf_counter() - start
+        return [results[key] for key in keys]
+
+    def random_phases(self):
+        """
+        Returns the result of the random light phases of the GridEngine, for reference.
+        """
+        results = []
+        for seed in self.seeds:
+            engine = self.engine(seed)
+            queued_ticks = longest_queue = 0
+            while engine.active.any() and engine.tick < self.max_ticks:
+                engine.step()
+                queued_ticks += int(engine.right_queue.sum() + engine.down_queue.sum())
+                longest_queue = max(longest_queue, int(engine.right_queue.max()), int(engine.down_queue.max()))
+            trip_ticks = np.where(engine.trip_ticks >= 0, engine.trip_ticks, engine.tick)
+            results.append({
+                "mean_trip_time": float(trip_ticks.mean() * engine.tick_seconds) if trip_ticks.size else 0.0,
+                "cars_finished": int(np.count_nonzero(engine.trip_ticks >= 0)),
+                "mean_queue": queued_ticks / (max(engine.tick, 1) * engine.light_right.size),
+                "longest_queue": longest_queue,
+            })
+        return {name: float(np.mean([result[name] for result in results])) for name in results[0]}
+
+
+def green_wave_delay(plan, tick_seconds=0.5, travel_seconds=1.5):
+    """
+    Estimates the delay of a plan from the plan alone, as a cheap surrogate of its simulation.
+
+    Cars leaving a light while it is green in their direction reach the next light in that
+    direction `travel_seconds` later. The estimate adds, over every pair of neighbouring lights,
+    the mean wait of such cars at the second light, and over every light the mean wait of a car
+    arriving at a random time, in both directions.
+
+    Returns:
+        float: The estimated delay, in seconds; lower is better.
+    """
+    cycle, green, offset = plan_ticks(plan, np.shape(plan["cycle"]), tick_seconds)
+    travel = max(1, round(travel_seconds / tick_seconds))
+    horizon = int(cycle.max())
+
+    # Ticks until each light turns green in each direction, from every tick of one cycle on
+    ticks = np.arange(2 * horizon + travel)[:, None, None]
+    right = (ticks + offset) % cycle < green
+    wait_right = np.zeros(right.shape, dtype=np.int32)
+    wait_down = np.zeros(right.shape, dtype=np.int32)
+    for tick in range(len(ticks) - 2, -1, -1):
+        wait_right[tick] = np.where(right[tick], 0, wait_right[tick + 1] + 1)
+        wait_down[tick] = np.where(right[tick], wait_down[tick + 1] + 1, 0)
+
+    departures = slice(0, horizon)
+    arrivals = slice(travel, horizon + travel)
+    moving_right = right[departures, :-1, :]
+    moving_down = ~right[departures, :, :-1]
+    platoons = ((wait_right[arrivals, 1:, :] * moving_right).sum() / max(moving_right.sum(), 1)
+                + (wait_down[arrivals, :, 1:] * moving_down).sum() / max(moving_down.sum(), 1))
+    random_arrivals = wait_right[departures].mean() + wait_down[departures].mean()
+    return float(platoons + random_arrivals) * tick_seconds
+
+
+def candidates(plan, light, parameter, tick_seconds=0.5):
+    """
+    Returns copies of a plan with one parameter of one light set to each of its other values.
+
+    Args:
+        plan (dict): The current plan.
+        light (tuple): The (x, y) index of the light.
+        parameter (str): "cycle" (keeping the split), "split" or "offset".
+        tick_seconds (float): The step of the offsets.
+    """
+    cycle, green, offset = (float(plan[name][light]) for name in ("cycle", "green", "offset"))
+    if parameter == "cycle":
+        values = [(value, value * green / cycle, offset % value) for value in CYCLES if value != cycle]
+    elif parameter == "split":
+        values = [(cycle, cycle * split, offset) for split in SPLITS if abs(cycle * split - green) >= tick_seconds / 2]
+    else:
+        values = [(cycle, green, value) for value in np.arange(0, cycle, tick_seconds).tolist()
+                  if abs(value - offset) >= tick_seconds / 2]
+
+    plans = []
+    for new_cycle, new_green, new_offset in values:
+        new_plan = {name: array.copy() for name, array in plan.items()}
+        new_plan["cycle"][light] = new_cycle
+        new_plan["green"][light] = new_green
+        new_plan["offset"][light] = new_offset
+        plans.append(new_plan)
+    return plans
+
+
+def optimize(evaluator, plan=None, sweeps=3, screen=None, budget=None, objective="mean_trip_time", log=None):
+    """
+    Searches for the plan with the lowest objective by coordinate descent.
+
+    Each sweep visits every light and, for each of its cycle, split and offset, evaluates the
+    other values of the parameter in one batch and keeps the best if it improves the plan.
+    The search stops after `sweeps` sweeps, after a sweep without improvement, or once
+    `budget` plans have been simulated.
+
+    Args:
+        evaluator (PlanEvaluator): Evaluates the plans.
+        plan (dict): The starting plan; by default every light has the same 8-second cycle.
+        sweeps (int): The maximum number of sweeps over the lights.
+        screen (int): Optional number of candidates per step kept by the green_wave_delay surrogate.
+        budget (int): Optional maximum number of plans to simulate.
+        objective (str): The result to minimize.
+        log: Optional function called with a progress message after each sweep.
+
+    Returns:
+        tuple: The best plan and its result.
+    """
+    tick_seconds = evaluator._engine.tick_seconds
+    travel_seconds = evaluator._engine.travel_ticks * tick_seconds
+    plan = plan if plan is not None else uniform_plan(evaluator.shape)
+    best = evaluator.evaluate([plan])[0]
+    for sweep in range(sweeps):
+        improved = False
+        for light in np.ndindex(evaluator.shape):
+            for parameter in PARAMETERS:
+                if budget is not None and evaluator.evaluations >= budget:
+                    return plan, best
+                options = candidates(plan, light, parameter, tick_seconds)
+                if screen is not None and len(options) > screen:
+                    delays = [green_wave_delay(option, tick_seconds, travel_seconds) for option in options]
+                    options = [options[index] for index in np.argsort(delays, kind="stable")[:screen]]
+                if not options:
+                    continue
+                results = evaluator.evaluate(options)
+                index = min(range(len(results)), key=lambda option: results[option][objective])
+                if results[index][objective] < best[objective] - 1e-9:
+                    plan, best = options[index], results[index]
+                    improved = True
+        if log is not None:
+            log(f"Sweep {sweep + 1}: {objective} {best[objective]:.3f}, {evaluator.evaluations} plans simulated.")
+        if not improved:
+            break
+    return plan, best
+
+
+def print_plan(plan):
+    """
+    Prints the cycle, green time and offset of every light, one row per y.
+    """
+    import pandas as pd
+
+    for name in ("cycle", "green", "offset"):
+        print(f"\n{name.capitalize()} (seconds, x across, y down):")
+        print(pd.DataFrame(np.asarray(plan[name]).T).to_string(float_format=lambda value: f"{value:g}"))
+
+
+def main(argv=None):
+    """
+    Optimizes a fixed-time plan for the lights of the grid and prints it with its evaluation.
+    """
+    parser = argparse.ArgumentParser(description="Optimize fixed-time traffic light plans on the vectorized grid.")
+    parser.add_argument("--grid", type=int, default=5, help="Squares per side of the grid.")
+    parser.add_argument("--cars", type=int, default=200, help="The number of cars of each run.")
+    parser.add_argument("--seed", type=int, default=0, help="The first seed of the runs.")
+    parser.add_argument("--seeds", type=int, default=1, help="The number of seeds each plan is evaluated with.")
+    parser.add_argument("--max-ticks", type=int, default=2000, help="The maximum number of ticks of a run.")
+    parser.add_argument("--sweeps", type=int, default=3, help="The maximum number of sweeps over the lights.")
+    parser.add_argument("--screen", type=int, default=None,
+                        help="Simulate only this many candidates per step, ranked by the green-wave surrogate.")
+    parser.add_argument("--budget", type=int, default=None, help="The maximum number of plans to simulate.")
+    parser.add_argument("--objective", choices=["mean_trip_time", "mean_queue", "longest_queue"],
+                        default="mean_trip_time", help="The result to minimize.")
+    parser.add_argument("--start", default=None, metavar="FILE", help="Start from the plan in this JSON file.")
+    parser.add_argument("--cache", default=None, metavar="FILE", help="JSON file of the evaluated plans, reused.")
+    parser.add_argument("--output", default=None, metavar="FILE", help="Write the best plan to this JSON file.")
+    args = parser.parse_args(argv)
+
+    cache = PlanCache(args.cache)
+    evaluator = PlanEvaluator(args.grid, args.cars, range(args.seed, args.seed + args.seeds), args.max_ticks, cache)
+    reference = evaluator.random_phases()
+    start = time.perf_counter()
+    plan, result = optimize(evaluator, load_plan(args.start) if args.start else None, args.sweeps, args.screen,
+                            args.budget, args.objective, log=print)
+    elapsed = time.perf_counter() - start
+    cache.save()
+
+    print_plan(plan)
+    print()
+    for name, values in (("Random phases", reference), ("Best plan", result)):
+        print(f"{name}: mean trip time {values['mean_trip_time']:.3f}s, {values['cars_finished']:.0f} cars "
+              f"finished, mean queue {values['mean_queue']:.3f} cars per light, "
+              f"longest queue {values['longest_queue']:.0f}.")
+    rate = evaluator.evaluations / evaluator.seconds * 60 if evaluator.seconds else 0.0
+    print(f"{evaluator.evaluations} plans simulated ({rate:,.0f} per minute), {cache.hits} read from the cache, "
+          f"in {elapsed:.1f}s.")
+    if args.output:
+        save_plan(args.output, plan, result)
+        print(f"Plan written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
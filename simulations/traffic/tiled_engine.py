@@ -0,0 +1,330 @@
+import math
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulations.traffic.grid_engine import DOWN, LIGHT_STREAM, STATE_ARRAYS, TURN_STREAM, GridEngine
+
+# Directions of the neighbouring tiles cars are handed off to (cars only move right or down)
+TO_RIGHT = 0
+TO_DOWN = 1
+
+
+def default_tiles(processes):
+    """
+    Returns the (columns, rows) layout of `processes` tiles closest to a square.
+    """
+    rows = math.isqrt(processes)
+    while processes % rows:
+        rows -= 1
+    return processes // rows, rows
+
+
+def _bounds(size, parts):
+    edges = np.linspace(0, size, parts + 1).round().astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class SharedArrays:
+    """
+    NumPy arrays in named shared memory blocks, created by one process and attached by others.
+
+    Attributes:
+        specs (dict): Maps each array name to the (block name, shape, dtype) needed to attach it.
+        arrays (dict): Maps each array name to its numpy view.
+    """
+    def __init__(self, specs=None):
+        """
+        Attaches the arrays described by `specs`, or starts an empty set to `create` arrays in.
+        """
+        self.specs = dict(specs or {})
+        self.arrays = {}
+        self._blocks = []
+        for name, (block_name, shape, dtype) in self.specs.items():
+            self._attach(name, shared_memory.SharedMemory(name=block_name), shape, dtype)
+
+    def _attach(self, name, block, shape, dtype):
+        self._blocks.append(block)
+        self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def create(self, name, shape, dtype, value=None):
+        """
+        Creates a shared array, filled with a copy of `value` if one is given.
+        """
+        dtype = np.dtype(dtype)
+        block = shared_memory.SharedMemory(create=True, size=max(1, math.prod(shape) * dtype.itemsize))
+        self.specs[name] = (block.name, tuple(shape), dtype.str)
+        self._attach(name, block, shape, dtype)
+        if value is not None:
+            self.arrays[name][...] = value
+        return self.arrays[name]
+
+    def close(self, unlink=False):
+        """
+        Detaches the arrays, and frees their memory if `unlink` is set (by the creator).
+        """
+        self.arrays.clear()
+        for block in self._blocks:
+            block.close()
+            if unlink:
+                block.unlink()
+        self._blocks.clear()
+
+
+class TiledGridEngine:
+    """
+    Runs a GridEngine split into rectangular tiles of intersections, one process per tile.
+
+    Every light, queue and car array of the engine lives in shared memory. A tile flips its
+    own lights, counts its own queues and advances the cars standing at or driving to its
+    intersections. Cars only move right or down, one intersection at a time, so a car
+    leaving a tile always enters the tile to its right or below: the tile writes the car's
+    index to its outbox in that direction, and the neighbour adopts it at the start of the
+    next tick. Outboxes are double-buffered by tick parity, so one barrier per tick keeps the
+    tiles in step.
+
+    Random decisions come from the engine's counter-based generator, keyed on global car and
+    light indices, so a tiled run makes exactly the same decisions as the single-process
+    engine and ends in the same state.
+
+    Attributes:
+        engine (GridEngine): The engine being run; its state is updated when `run` returns.
+        tiles (tuple): The number of tiles along the x and y axes.
+    """
+    def __init__(self, engine, tiles=None):
+        """
+        Args:
+            engine (GridEngine): The engine to run, new or restored from a checkpoint.
+            tiles (tuple): (columns, rows) of tiles; defaults to one tile per CPU.
+        """
+        self.engine = engine
+        self.tiles = tuple(tiles) if tiles is not None else default_tiles(multiprocessing.cpu_count())
+        columns, rows = self.tiles
+        if not (0 < columns <= engine.light_right.shape[0] and 0 < rows <= engine.light_right.shape[1]):
+            raise ValueError(f"Cannot split {engine.light_right.shape[0]}x{engine.light_right.shape[1]} "
+                             f"intersections into {columns}x{rows} tiles.")
+        if engine.routing is not None:
+            raise ValueError("Cars routed to destinations are only simulated by the single-process engine.")
+
+    def run(self, max_ticks=None):
+        """
+        Steps the tiles in parallel until every car has left the grid or `max_ticks` ticks have been simulated.
+
+        Args:
+            max_ticks (int): Optional limit on the number of ticks to simulate.
+
+        Returns:
+            dict: The summary of the run (see GridEngine.summary).
+        """
+        engine = self.engine
+        start = time.perf_counter()
+        if not engine.active.any() or max_ticks == 0:
+            return engine.summary(time.perf_counter() - start, 0, 0)
+
+        columns, rows = self.tiles
+        count = columns * rows
+        shared = SharedArrays()
+        try:
+            for name in STATE_ARRAYS:
+                value = getattr(engine, name)
+                shared.create(name, value.shape, value.dtype, value)
+            shared.create("outbox", (2, count, 2, max(1, engine.number_of_cars)), np.int32)
+            shared.create("outbox_count", (2, count, 2), np.int64, 0)
+            shared.create("remaining", (2, count), np.int64, 0)
+            shared.create("moves", (count,), np.int64, 0)
+            shared.create("ticks", (1,), np.int64, 0)
+
+            settings = {
+                "tiles": self.tiles,
+                "x_bounds": _bounds(engine.light_right.shape[0], columns),
+                "y_bounds": _bounds(engine.light_right.shape[1], rows),
+                "number_of_x_squares": engine.number_of_x_squares,
+                "number_of_y_squares": engine.number_of_y_squares,
+                "tick_seconds": engine.tick_seconds,
+                "travel_ticks": engine.travel_ticks,
+                "light_seconds": engine.light_seconds,
+                "key": engine.key,
+                "antithetic": engine.antithetic,
+                "tick": engine.tick,
+                "max_ticks": max_ticks,
+                "plan": None if engine.plan_cycle is None else (engine.plan_cycle, engine.plan_green,
+                                                                engine.plan_offset),
+            }
+            context = multiprocessing.get_context()
+            barrier = context.Barrier(count)
+            workers = [context.Process(target=_run_tile, args=(shared.specs, settings, tile, barrier), daemon=True)
+                       for tile in range(count)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            failed = [worker.exitcode for worker in workers if worker.exitcode]
+            if failed:
+                raise RuntimeError(f"{len(failed)} tile worker(s) failed, with exit codes {failed}.")
+
+            for name in STATE_ARRAYS:
+                setattr(engine, name, shared.arrays[name].copy())
+            ticks = int(shared.arrays["ticks"][0])
+            moves = int(shared.arrays["moves"].sum())
+        finally:
+            shared.close(unlink=True)
+        engine.tick += ticks
+        return engine.summary(time.perf_counter() - start, ticks, moves)
+
+
+def _run_tile(specs, settings, tile, barrier):
+    shared = SharedArrays(specs)
+    try:
+        _Tile(shared.arrays, settings, tile).run(barrier)
+    except threading.BrokenBarrierError:
+        # Another tile failed and aborted the barrier; it reports the error.
+        raise SystemExit(1)
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        shared.close()
+
+
+class _Tile:
+    """
+    The part of a TiledGridEngine run by one worker process: a rectangle of intersections and the cars at them.
+
+    The step mirrors GridEngine.step, restricted to the tile's lights and cars.
+    """
+    def __init__(self, arrays, settings, tile):
+        self.arrays = arrays
+        self.settings = settings
+        self.tile = tile
+        columns, rows = settings["tiles"]
+        column, row = divmod(tile, rows)
+        self.x0, self.x1 = settings["x_bounds"][column]
+        self.y0, self.y1 = settings["y_bounds"][row]
+        self.left_tile = tile - rows if column > 0 else None
+        self.up_tile = tile - 1 if row > 0 else None
+
+        # A GridEngine with only a key, to draw from the same counter-based generator.
+        self.generator = GridEngine.__new__(GridEngine)
+        self.generator.key = settings["key"]
+        self.generator.antithetic = settings["antithetic"]
+
+        region = (slice(self.x0, self.x1), slice(self.y0, self.y1))
+        self.light_right = arrays["light_right"][region]
+        self.light_timer = arrays["light_timer"][region]
+        self.light_flips = arrays["light_flips"][region]
+        self.right_queue = arrays["right_queue"][region]
+        self.down_queue = arrays["down_queue"][region]
+        self.plan = None
+        if settings["plan"] is not None:
+            self.plan = tuple(values[region] for values in settings["plan"])
+
+        x, y = arrays["x"], arrays["y"]
+        self.cars = np.flatnonzero(arrays["active"] & (x >= self.x0) & (x < self.x1) & (y >= self.y0) & (y < self.y1))
+
+    def run(self, barrier):
+        settings = self.settings
+        max_ticks = settings["max_ticks"]
+        # No tile may move a car before every tile has found the cars it starts with.
+        barrier.wait()
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            tick = settings["tick"] + ticks
+            self.step(tick)
+            ticks += 1
+            barrier.wait()
+            if not self.arrays["remaining"][tick % 2].any():
+                break
+        if self.tile == 0:
+            self.arrays["ticks"][0] = ticks
+
+    def step(self, tick):
+        arrays = self.arrays
+        settings = self.settings
+        x, y = arrays["x"], arrays["y"]
+        queued, cooldown, route_right = arrays["queued"], arrays["cooldown"], arrays["route_right"]
+        parity = tick % 2
+
+        # Adopt the cars the left and upper tiles handed over during the previous tick.
+        cars = [self.cars]
+        for source, direction in ((self.left_tile, TO_RIGHT), (self.up_tile, TO_DOWN)):
+            if source is not None:
+                count = arrays["outbox_count"][1 - parity, source, direction]
+                cars.append(arrays["outbox"][1 - parity, source, direction, :count].astype(np.int64))
+        cars = np.concatenate(cars)
+
+        self._flip_lights(tick)
+
+        # Cars driving between intersections get closer to the next one. The masks are over the
+        # tile's cars, so the shared arrays are only gathered once per tick.
+        car_cooldown = np.maximum(cooldown[cars] - 1, 0)
+        cooldown[cars] = car_cooldown
+
+        # Cars reaching an intersection may change direction, then join its queue.
+        car_queued = queued[cars]
+        arriving_mask = ~car_queued & (car_cooldown == 0)
+        arriving = cars[arriving_mask]
+        changing = arriving[self.generator.draw(TURN_STREAM, (arriving << 32) + x[arriving] + y[arriving], 9) == 0]
+        route_right[changing] = arrays["direction"][changing] == DOWN
+        queued[arriving] = True
+
+        # Queued cars leave when the light allows their route.
+        waiting_at = np.flatnonzero(car_queued | arriving_mask)
+        waiting = cars[waiting_at]
+        green = arrays["light_right"][x[waiting], y[waiting]] == route_right[waiting]
+        moving_at = waiting_at[green]
+        moving = cars[moving_at]
+        moving_right = route_right[moving]
+        x[moving] += moving_right
+        y[moving] += ~moving_right
+        queued[moving] = False
+        cooldown[moving] = settings["travel_ticks"]
+
+        off_grid = (x[moving] > settings["number_of_x_squares"]) | (y[moving] > settings["number_of_y_squares"])
+        left_grid = moving[off_grid]
+        arrays["active"][left_grid] = False
+        cooldown[left_grid] = 0
+        arrays["trip_ticks"][left_grid] = tick + 1
+
+        self._count_queues(waiting[~green])
+
+        # Hand the cars now driving to another tile's intersections over to that tile.
+        leaving_at = moving_at[off_grid | (x[moving] >= self.x1) | (y[moving] >= self.y1)]
+        crossing = moving[~off_grid]
+        handed_over = 0
+        for direction, leaving in ((TO_RIGHT, crossing[x[crossing] >= self.x1]),
+                                   (TO_DOWN, crossing[y[crossing] >= self.y1])):
+            arrays["outbox"][parity, self.tile, direction, :leaving.size] = leaving
+            arrays["outbox_count"][parity, self.tile, direction] = leaving.size
+            handed_over += leaving.size
+        self.cars = np.delete(cars, leaving_at)
+        arrays["remaining"][parity, self.tile] = self.cars.size + handed_over
+        arrays["moves"][self.tile] += moving.size
+
+    def _flip_lights(self, tick):
+        if self.plan is not None:
+            cycle, green, offset = self.plan
+            self.light_right[...] = (tick + offset) % cycle < green
+            return
+        timer = self.light_timer
+        timer -= 1
+        flipping = timer <= 0
+        light_x, light_y = np.nonzero(flipping)
+        if light_x.size:
+            self.light_right[flipping] = ~self.light_right[flipping]
+            low, high = self.settings["light_seconds"]
+            lights = (light_x + self.x0) * self.arrays["light_right"].shape[1] + light_y + self.y0
+            phases = self.generator.uniform(LIGHT_STREAM, (lights << 32) + self.light_flips[flipping])
+            seconds = low + np.floor((high - low) * phases)
+            self.light_flips[flipping] += 1
+            timer[flipping] = np.maximum(1, np.rint(seconds / self.settings["tick_seconds"])).astype(np.int32)
+
+    def _count_queues(self, waiting):
+        x, y = self.arrays["x"], self.arrays["y"]
+        width, height = self.right_queue.shape
+        index = (x[waiting] - self.x0) * height + y[waiting] - self.y0
+        right = self.arrays["route_right"][waiting]
+        self.right_queue[...] = np.bincount(index[right], minlength=width * height).reshape(width, height)
+        self.down_queue[...] = np.bincount(index[~right], minlength=width * height).reshape(width, height)
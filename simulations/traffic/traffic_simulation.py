@@ -0,0 +1,253 @@
+import os
+import sys
+import threading
+import random
+import time
+import concurrent.futures
+import contextlib
+import traceback
+from collections import deque
+
+from simulations.traffic.road_network import grid_network
+
+number_of_x_squares = 5
+number_of_y_squares = 5
+road_network = grid_network(number_of_x_squares, number_of_y_squares)
+coordinate_dictionary = {}
+for x, y in road_network.coordinates.astype(int).tolist():
+    coordinate_dictionary[(x, y)] = {
+        "right_queue": deque(),
+        "down_queue": deque(),
+        "where_can_i_move": "right" if x % 3 == 0 else "down",
+        "right_queue_lock": threading.Lock(),
+        "down_queue_lock": threading.Lock(),
+        "x": x,
+        "y": y
+    }
+
+
+def flipping_semaphore(structure, rng=random):
+    """
+    Simulates the flipping of a traffic light semaphore at a specific grid location.
+
+    Each flip wakes the cars queued in the direction that has just turned green, in the order they arrived.
+
+    Args:
+        structure (dict): The dictionary representing a specific grid location and its semaphore state.
+        rng: The light's source of random numbers, with the API of the random module.
+    """
+    try:
+        while not program_over.is_set():
+            print(f"The semaphore at x: {structure['x']} y: {structure['y']} is flipping")
+            with structure["right_queue_lock"], structure["down_queue_lock"]:
+                if structure["where_can_i_move"] == "right":
+                    structure["where_can_i_move"] = "down"
+                else:
+                    structure["where_can_i_move"] = "right"
+                green_queue = structure[f"{structure['where_can_i_move']}_queue"]
+                while green_queue:
+                    _, green_light = green_queue.popleft()
+                    green_light.set()
+            program_over.wait(rng.randrange(3, 7) * sleep_scale)
+    except Exception:
+        traceback.print_exc()
+
+
+def wait_for_green_light(structure, direction, id):
+    """
+    Queues a car at an intersection and blocks until the light lets it move in the given direction.
+
+    The car waits on its own event, which the semaphore sets when it flips to the car's direction, so
+    waiting cars use no CPU and leave the queue in first-in-first-out order. A car arriving at a green
+    light passes straight through.
+
+    Args:
+        structure (dict): The dictionary representing the grid location the car is at.
+        direction (str): The direction the car wants to move in, "right" or "down".
+        id (int): The unique ID of the car.
+    """
+    green_light = threading.Event()
+    with structure[f"{direction}_queue_lock"]:
+        if structure["where_can_i_move"] == direction:
+            green_light.set()
+        else:
+            structure[f"{direction}_queue"].append((id, green_light))
+    print(f"Car {id} is in the {structure['x'], structure['y']} queue.")
+    green_light.wait()
+    print(f"Car {id} is out of the {structure['x'], structure['y']} queue.")
+
+
+def cars(id, rng=random):
+    """
+    Simulates a car moving through the grid, queuing at traffic lights, and changing directions.
+
+    Args:
+        id (int): The unique ID of the car.
+        rng: The car's source of random numbers, with the API of the random module.
+    """
+    try:
+        route = ""
+        direction = rng.randrange(1, 3)
+        if direction == 1:
+            route = "down"
+            x, y = rng.randrange(0, number_of_x_squares + 1), 0
+        else:
+            route = "right"
+            x, y = 0, rng.randrange(0, number_of_y_squares + 1)
+
+        print(f"Car {id} is going on route: {route}")
+
+        while x <= number_of_x_squares and y <= number_of_y_squares:
+            with profile_stage("move"):
+                print(f"Car {id} is moving from {x},{y}")
+
+                change_criteria = rng.randrange(1, 10)
+
+                if change_criteria == 1:
+                    print(f"CAR {id} IS CHANGING DIRECTION.")
+                    if direction == 1:
+                        route = "right"
+                    else:
+                        route = "down"
+                else:
+                    with profile_stage("light"):
+                        if route == "down":
+                            wait_for_green_light(coordinate_dictionary[(x, y)], "down", id)
+                            y += 1
+
+                        if route == "right":
+                            wait_for_green_light(coordinate_dictionary[(x, y)], "right", id)
+                            x += 1
+                    print(f"Car {id} arrived at {x},{y}")
+                    with profile_stage("drive"):
+                        time.sleep(1.5 * sleep_scale)
+
+    except Exception:
+        traceback.print_exc()
+
+
+program_over = threading.Event()
+
+# Multiplier applied to every wall-clock sleep of the threaded simulation
+sleep_scale = 1.0
+
+# Times the moves of a car; simulations.profiling swaps in a timer when a run is profiled
+profile_stage = contextlib.nullcontext
+
+
+def run_threaded(amount_of_cars=2, time_scale=1.0, streams=None):
+    """
+    Runs the simulation with one thread per traffic light and one thread per car.
+
+    Args:
+        amount_of_cars (int): The number of cars to simulate.
+        time_scale (float): Multiplier applied to driving times and light phases, to run faster than real time.
+        streams (SeedStreams): Optional source of a seeded random stream per car and per light; without
+            it, cars and lights draw from the random module.
+    """
+    global sleep_scale
+    sleep_scale = time_scale
+    program_over.clear()
+    amount_of_semaphores = len(coordinate_dictionary.items())
+    if streams is None:
+        light_streams = [random] * amount_of_semaphores
+        car_streams = [random] * amount_of_cars
+    else:
+        light_streams = [streams.stream("light", node, block_size=16) for node in range(amount_of_semaphores)]
+        car_streams = [streams.stream("car", id, block_size=16) for id in range(amount_of_cars)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=amount_of_semaphores) as executor:
+        executor.map(flipping_semaphore, coordinate_dictionary.values(), light_streams)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=amount_of_cars) as executor:
+            executor.map(cars, range(amount_of_cars), car_streams)
+        program_over.set()
+
+
+def run_vectorized(amount_of_cars=2, grid_size=None, seed=None, max_ticks=None, tiles=None, plan=None,
+                   destinations=None):
+    """
+    Runs the simulation with the vectorized GridEngine, advancing all cars and lights together.
+
+    With `tiles`, the grid is split into tiles simulated by one process each (TiledGridEngine),
+    with exactly the same results.
+
+    Args:
+        amount_of_cars (int): The number of cars to simulate.
+        grid_size (int): The number of squares per side of the grid; defaults to the threaded grid.
+        seed (int): Optional seed for the random number generator.
+        max_ticks (int): Optional limit on the number of ticks to simulate.
+        tiles (tuple): Optional (columns, rows) of tiles to split the grid into.
+        plan (dict): Optional fixed-time plan of the lights (see GridEngine.set_plan).
+        destinations (int): Optional number of intersections, picked at random, that the cars
+            drive to along the routing table of the grid instead of turning at random (single
+            process only).
+
+    Returns:
+        dict: The summary of the run.
+    """
+    from simulations.traffic.grid_engine import GridEngine
+    from simulations.traffic.road_network import build_routing_table, pick_destinations
+
+    size_x = grid_size if grid_size is not None else number_of_x_squares
+    size_y = grid_size if grid_size is not None else number_of_y_squares
+    routing = None
+    if destinations:
+        network = grid_network(size_x, size_y)
+        routing = build_routing_table(network, pick_destinations(network, destinations, seed))
+    engine = GridEngine(size_x, size_y, amount_of_cars, seed=seed, plan=plan, routing=routing)
+    if tiles is not None:
+        from simulations.traffic.tiled_engine import TiledGridEngine
+
+        engine = TiledGridEngine(engine, tiles)
+    summary = engine.run(max_ticks)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    return summary
+
+
+def run_command(args):
+    """
+    Runs the simulation in the execution mode chosen on the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments of the traffic command (see simulations.cli).
+    """
+    plan = None
+    if args.plan is not None and args.mode != "threaded":
+        from simulations.traffic.grid_engine import check_plan
+        from simulations.traffic.signal_timing import load_plan
+
+        plan = load_plan(args.plan)
+        try:
+            check_plan(plan, args.grid or number_of_x_squares, args.grid or number_of_y_squares)
+        except ValueError as error:
+            sys.exit(f"simulations traffic: error: {error} (--plan {args.plan})")
+    if args.mode == "threaded":
+        streams = None
+        if args.seed is not None:
+            from simulations.seeding import SeedStreams
+
+            streams = SeedStreams(args.seed)
+        with profile_stage("simulate"):
+            run_threaded(args.cars, args.time_scale, streams)
+    elif args.mode == "tiled":
+        from simulations.traffic.tiled_engine import default_tiles
+
+        tiles = args.tiles or default_tiles(os.cpu_count() or 1)
+        with profile_stage("simulate"):
+            run_vectorized(args.cars, args.grid, args.seed, args.ticks, tiles, plan)
+    else:
+        with profile_stage("simulate"):
+            run_vectorized(args.cars, args.grid, args.seed, args.ticks, plan=plan, destinations=args.destinations)
+
+
+def main(argv=None):
+    """
+    Parses the command line and runs the simulation in the requested execution mode.
+    """
+    from simulations.cli import main as cli_main
+
+    cli_main(["traffic", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
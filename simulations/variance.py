@@ -0,0 +1,348 @@
+"""
+Variance reduction for comparing configurations: common random numbers, antithetic pairs and
+control variates.
+
+Comparing two staffing levels or two light timings with independent replications takes many
+runs before the difference stands out of the noise of each run. Here both configurations of
+a replication use the same seed, and every guest, car and employee draws from its own seeded
+stream, so both see the same guests, luggage, activity choices, routes and tasks (common
+random numbers): the noise they share cancels in the difference.
+
+Every replication can also be run a second time with antithetic streams, which draw 1 - u for
+every uniform u, the two runs being averaged; and the estimate can be corrected with control
+variates, quantities of the random inputs whose expectation is known (the fraction of guests
+with luggage, the cars' directions and entry points, the employees' hours), by regressing the
+results on them.
+
+For every metric, the report gives the estimated difference with its confidence interval,
+and the number of runs per configuration that independent sampling would need for an
+interval as narrow.
+
+Example:
+    python -m simulations.variance hotel --param arrival_rate=4 --baseline receptionists=2 --alternative receptionists=3
+    python -m simulations.variance traffic --alternative light_high=9 --antithetic --control -n 10
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+
+import numpy as np
+
+from simulations import import_model
+from simulations.replication import t_quantile
+from simulations.seeding import SeedStreams
+from simulations.sweep import PARAMETERS
+
+
+# Models
+def evaluate_hotel(config, seed, antithetic=False, guests=400, arrival_rate=None):
+    """
+    Runs one replication of the hotel on the virtual clock.
+
+    Args:
+        config (dict): Capacities overriding the defaults (see sweep.PARAMETERS), and optionally
+            an arrival_rate.
+        seed (int): The seed of the replication.
+        antithetic (bool): Run the antithetic twin of the replication.
+        guests (int): The number of guests.
+        arrival_rate (float): Guests arriving per second, unless the configuration sets one.
+
+    Returns:
+        tuple: The metrics, and the controls minus their expectation.
+    """
+    hotel = import_model("hotel")
+    capacities = dict(config)
+    arrival_rate = capacities.pop("arrival_rate", arrival_rate)
+    simulation = hotel.make_event_simulation(guests, streams=SeedStreams(seed, antithetic), capacities=capacities,
+                                             arrival_rate=arrival_rate)
+    result = simulation.run()
+    stays = [guest.time_in_hotel for guest in result if guest.room_number is not None]
+    metrics = {
+        "guests_checked_in": len(stays),
+        "mean_time_in_hotel": sum(stays) / len(stays) if stays else math.nan,
+        "mean_wait": sum(simulation.stage_waits.values()) / len(result),
+        "makespan": simulation.now,
+    }
+    # guest_init draws the luggage as a fair coin.
+    controls = {"luggage_fraction": sum(guest.has_luggage for guest in result) / len(result) - 0.5}
+    return metrics, controls
+
+
+def evaluate_traffic(config, seed, antithetic=False, cars=500, grid=10):
+    """
+    Runs one replication of the traffic grid on the vectorized engine.
+
+    Args:
+        config (dict): Settings of the engine: light_low and light_high (the range of seconds
+            between light flips) and travel_seconds.
+        seed (int): The seed of the replication.
+        antithetic (bool): Run the antithetic twin of the replication.
+        cars (int): The number of cars.
+        grid (int): The number of squares per side of the grid.
+
+    Returns:
+        tuple: The metrics, and the controls minus their expectation.
+    """
+    from simulations.traffic.grid_engine import DOWN, GridEngine
+
+    settings = dict(config)
+    light_seconds = (settings.pop("light_low", 3), settings.pop("light_high", 7))
+    engine = GridEngine(grid, grid, cars, seed=seed, light_seconds=light_seconds, antithetic=antithetic, **settings)
+    going_down = engine.direction == DOWN
+    entry = np.where(going_down, engine.x, engine.y)
+    # Entry points are uniform over the intersections of the edge a car starts from.
+    edge = np.where(going_down, engine.number_of_x_squares + 1, engine.number_of_y_squares + 1)
+    controls = {"down_fraction": going_down.mean() - 0.5, "mean_entry": (entry - (edge - 1) / 2).mean()}
+    engine.run()
+    trips = engine.trip_times()
+    metrics = {
+        "mean_trip_time": trips.mean(),
+        "p90_trip_time": np.quantile(trips, 0.9),
+        "makespan": engine.tick * engine.tick_seconds,
+    }
+    return metrics, controls
+
+
+def evaluate_office(config, seed, antithetic=False, employees=1000):
+    """
+    Replays one replication of the office's asyncio mode on the virtual clock (see queueing.replay_office).
+
+    Args:
+        config (dict): Optionally max_concurrency, the number of employees working at once.
+        seed (int): The seed of the replication.
+        antithetic (bool): Run the antithetic twin of the replication.
+        employees (int): The number of employees.
+
+    Returns:
+        tuple: The metrics, and the controls minus their expectation.
+    """
+    from simulations.queueing import replay_office
+
+    streams = SeedStreams(seed, antithetic)
+    metrics = replay_office(streams, employees, config.get("max_concurrency"))
+    assignments = streams.blocks("employee", import_model("office").draw_assignments)
+    # draw_assignments draws the hours uniformly from 1 to 10.
+    hours = [assignments[employee_id][1] for employee_id in range(1, employees + 1)]
+    return metrics, {"mean_hours": sum(hours) / employees - 5.5}
+
+
+# Model -> (evaluate function, settings a configuration may change)
+MODELS = {
+    "hotel": (evaluate_hotel, PARAMETERS + ("arrival_rate",)),
+    "traffic": (evaluate_traffic, ("light_low", "light_high", "travel_seconds")),
+    "office": (evaluate_office, ("max_concurrency",)),
+}
+
+
+def _run_one(model, config, seed, antithetic, params):
+    evaluate, _ = MODELS[model]
+    metrics, controls = evaluate(config, seed, antithetic, **params)
+    return ({name: float(value) for name, value in metrics.items()},
+            {name: float(value) for name, value in controls.items()})
+
+
+# Statistics
+def regression_estimate(values, controls=None, confidence=0.95):
+    """
+    Returns the mean of the values corrected with control variates, and the half-width of its interval.
+
+    The values are regressed on the controls, which have an expectation of zero; the
+    intercept is the corrected mean and its standard error comes from the regression. Without
+    controls, this is the mean and its t confidence interval.
+
+    Args:
+        values (numpy.ndarray): One value per replication.
+        controls (numpy.ndarray): Optional (replication, control) values, centered on their expectation.
+        confidence (float): The confidence level.
+
+    Returns:
+        tuple: (mean, half_width); the half-width is inf when there are too few replications.
+    """
+    values = np.asarray(values, dtype=float)
+    design = np.ones((values.size, 1))
+    if controls is not None:
+        design = np.column_stack([design, controls])
+    degrees = values.size - design.shape[1]
+    if degrees < 1:
+        return float(values.mean()), math.inf
+    coefficients = np.linalg.lstsq(design, values, rcond=None)[0]
+    residuals = values - design @ coefficients
+    variance = residuals @ residuals / degrees
+    standard_error = math.sqrt(variance * np.linalg.pinv(design.T @ design)[0, 0])
+    return float(coefficients[0]), t_quantile((1 + confidence) / 2, degrees) * standard_error
+
+
+def run_comparison(model, baseline, alternative=None, replications=10, params=None, seed=None, antithetic=False,
+                   control=False, common=True, max_workers=None, confidence=0.95):
+    """
+    Estimates the difference of every metric between two configurations, or the metrics of one.
+
+    Args:
+        model (str): "hotel", "traffic" or "office".
+        baseline (dict): The settings of the baseline configuration.
+        alternative (dict): The settings of the configuration compared to it; None only
+            estimates the baseline's metrics.
+        replications (int): The number of replications (seeds) per configuration.
+        params (dict): Keyword arguments of the model's evaluate function (guests, cars, ...).
+        seed (int): The root seed the replication seeds are spawned from.
+        antithetic (bool): Also run the antithetic twin of every replication and average the pair.
+        control (bool): Correct the estimates with the model's control variates.
+        common (bool): Give both configurations the same seeds (common random numbers);
+            False draws independent seeds, for reference.
+        max_workers (int): The number of worker processes; defaults to the number of CPUs.
+        confidence (float): The confidence level of the intervals.
+
+    Returns:
+        dict: The settings of the comparison and, per metric, the mean of each configuration, the
+            estimate with its half-width, and the runs per configuration independent sampling
+            would need for the same half-width.
+    """
+    evaluate, settings = MODELS[model]
+    configs = [dict(baseline)] + ([dict(alternative)] if alternative is not None else [])
+    unknown = {name for config in configs for name in config} - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown {model} settings: {', '.join(sorted(unknown))}; expected {', '.join(settings)}.")
+    params = params or {}
+    count = replications * (1 if common else len(configs))
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(count)]
+    mirrors = (False, True) if antithetic else (False,)
+
+    jobs = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for number, config in enumerate(configs):
+            for replication in range(replications):
+                replication_seed = seeds[replication if common else number * replications + replication]
+                for mirror in mirrors:
+                    future = executor.submit(_run_one, model, config, replication_seed, mirror, params)
+                    jobs[(number, replication, mirror)] = future
+        outcomes = {key: future.result() for key, future in jobs.items()}
+
+    metrics = list(outcomes[(0, 0, False)][0])
+    control_names = list(outcomes[(0, 0, False)][1])
+    # (configuration, replication, mirror) arrays of every metric and control
+    runs = {name: np.array([[[outcomes[(number, replication, mirror)][0][name] for mirror in mirrors]
+                             for replication in range(replications)] for number in range(len(configs))])
+            for name in metrics}
+    controls = np.array([[[[outcomes[(number, replication, mirror)][1][name] for name in control_names]
+                           for mirror in mirrors] for replication in range(replications)]
+                         for number in range(len(configs))]).mean(axis=2)
+    if not control:
+        regressors = None
+    elif common or len(configs) == 1:
+        # The configurations share their random inputs, hence their controls.
+        regressors = controls[0]
+    else:
+        regressors = np.concatenate(list(controls), axis=1)
+
+    runs_per_config = replications * len(mirrors)
+    report = {
+        "model": model, "baseline": configs[0], "alternative": configs[1] if alternative is not None else None,
+        "params": params, "replications": replications, "runs_per_configuration": runs_per_config,
+        "antithetic": antithetic, "control": control, "common_random_numbers": common, "confidence": confidence,
+        "metrics": {},
+    }
+    for name in metrics:
+        values = runs[name]
+        observations = values.mean(axis=2)
+        estimate, half_width = regression_estimate(observations[-1] - observations[0] if len(configs) > 1
+                                                   else observations[0], regressors, confidence)
+        # Independent plain runs: the variance of the estimate is the sum of the per-run variances over n.
+        run_variance = sum(np.var(values[number].ravel(), ddof=1) for number in range(len(configs)))
+        independent_half_width = t_quantile((1 + confidence) / 2, runs_per_config - 1) * math.sqrt(
+            run_variance / runs_per_config)
+        if half_width > 0 and math.isfinite(half_width):
+            equivalent_runs = runs_per_config * (independent_half_width / half_width) ** 2
+        else:
+            # A zero half-width is an infinite gain, unless independent runs have none either (0/0).
+            equivalent_runs = math.inf if half_width == 0 and independent_half_width > 0 else math.nan
+        report["metrics"][name] = {
+            "means": observations.mean(axis=1).tolist(),
+            "estimate": estimate + 0.0,
+            "half_width": half_width,
+            "independent_half_width": independent_half_width,
+            "equivalent_runs": equivalent_runs,
+        }
+    return report
+
+
+def print_report(report):
+    """
+    Prints a comparison report as a table.
+    """
+    techniques = [name for name, used in (("common random numbers", report["common_random_numbers"]
+                                           and report["alternative"] is not None),
+                                          ("antithetic pairs", report["antithetic"]),
+                                          ("control variates", report["control"])) if used]
+    print(f"\n{report['model']}: {report['replications']} replications, {report['runs_per_configuration']} runs "
+          f"per configuration, {report['confidence']:.0%} confidence"
+          f"{', with ' + ', '.join(techniques) if techniques else ''}\n")
+    comparing = report["alternative"] is not None
+    header = ["Metric", "Baseline"] + (["Alternative", "Difference"] if comparing else ["Estimate"])
+    rows = [header + ["Half-width", "Independent", "Equivalent runs", "Gain"]]
+    for name, info in report["metrics"].items():
+        means = [f"{mean:.4g}" for mean in info["means"]]
+        equivalent_runs = info["equivalent_runs"]
+        if math.isnan(equivalent_runs):
+            runs, gain = "n/a", "n/a"
+        else:
+            runs, gain = f"{equivalent_runs:.0f}", f"{equivalent_runs / report['runs_per_configuration']:.1f}x"
+        rows.append([name] + means + [f"{info['estimate']:+.4g}" if comparing else f"{info['estimate']:.4g}",
+                                      f"{info['half_width']:.3g}", f"{info['independent_half_width']:.3g}",
+                                      runs, gain])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header) + 4)]
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+    print("\nIndependent: the half-width of independent sampling with as many runs; Equivalent runs: the runs "
+          "per configuration it would need to be as narrow.")
+
+
+def _parse_setting(text):
+    key, _, value = text.partition("=")
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main(argv=None):
+    """
+    Parses the command line, runs a comparison and prints its report.
+    """
+    parser = argparse.ArgumentParser(description="Compare configurations of a simulation with variance reduction.")
+    parser.add_argument("model", choices=sorted(MODELS))
+    parser.add_argument("--baseline", action="append", default=[], type=_parse_setting, metavar="KEY=VALUE",
+                        help="A setting of the baseline configuration (repeatable); defaults to the model's own.")
+    parser.add_argument("--alternative", action="append", default=None, type=_parse_setting, metavar="KEY=VALUE",
+                        help="A setting of the configuration compared to the baseline (repeatable); "
+                             "without one, only the baseline is estimated.")
+    parser.add_argument("--param", action="append", default=[], type=_parse_setting, metavar="KEY=VALUE",
+                        help="A parameter of both runs, e.g. guests=1000 or cars=2000 (repeatable).")
+    parser.add_argument("-n", "--replications", type=int, default=10, help="Replications per configuration.")
+    parser.add_argument("--seed", type=int, default=None, help="Root seed of the replications.")
+    parser.add_argument("--antithetic", action="store_true", help="Pair every replication with its antithetic twin.")
+    parser.add_argument("--control", action="store_true", help="Correct the estimates with control variates.")
+    parser.add_argument("--independent", action="store_true",
+                        help="Give the configurations independent seeds instead of common random numbers.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--output", default=None, help="Also write the report as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    baseline = dict(args.baseline)
+    alternative = {**baseline, **dict(args.alternative)} if args.alternative is not None else None
+    try:
+        report = run_comparison(args.model, baseline, alternative, args.replications, dict(args.param), args.seed,
+                                args.antithetic, args.control, not args.independent, args.workers, args.confidence)
+    except ValueError as error:
+        parser.error(str(error))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+A run resumed from a checkpoint must end exactly like the uninterrupted run.
+"""
+import numpy as np
+import pytest
+
+from simulations.checkpoint import checkpoint_grid, checkpoint_hotel, restore_grid, restore_hotel
+from simulations.hotel.hotel_simulation import make_event_simulation
+from simulations.hotel.streaming import make_streaming_simulation, poisson_arrivals
+from simulations.seeding import SeedStreams
+from simulations.traffic.grid_engine import STATE_ARRAYS, GridEngine
+
+
+def test_grid_resume_matches_uninterrupted_run(tmp_path):
+    uninterrupted = GridEngine(6, 6, 80, seed=5)
+    uninterrupted.run()
+
+    engine = GridEngine(6, 6, 80, seed=5)
+    engine.run(20)
+    checkpoint_grid(engine, tmp_path / "grid")
+    resumed = restore_grid(tmp_path / "grid")
+    resumed.run()
+
+    assert resumed.tick == uninterrupted.tick
+    for name in STATE_ARRAYS:
+        np.testing.assert_array_equal(getattr(resumed, name), getattr(uninterrupted, name), err_msg=name)
+
+
+def test_hotel_resume_matches_uninterrupted_run(tmp_path):
+    uninterrupted = make_event_simulation(150, streams=SeedStreams(2))
+    uninterrupted.run()
+
+    simulation = make_event_simulation(150, streams=SeedStreams(2))
+    simulation.run(until=uninterrupted.now / 4)
+    assert simulation.pending_events
+    checkpoint_hotel(simulation, tmp_path / "hotel")
+    resumed = restore_hotel(tmp_path / "hotel")
+    resumed.run()
+
+    assert resumed.events_processed == uninterrupted.events_processed
+    expected = uninterrupted.get_state()
+    state = resumed.get_state()
+    del expected["rngs"], state["rngs"]
+    assert state.keys() == expected.keys()
+    for name, value in expected.items():
+        np.testing.assert_array_equal(state[name], value, err_msg=name)
+
+
+def test_streaming_hotel_is_not_checkpointed(tmp_path):
+    streams = SeedStreams(3)
+    simulation = make_streaming_simulation(poisson_arrivals(2.0, streams.stream("arrivals"), until=100),
+                                           streams=streams)
+    simulation.run(until=50)
+
+    with pytest.raises(ValueError):
+        checkpoint_hotel(simulation, tmp_path / "hotel")
+    assert not (tmp_path / "hotel").exists()
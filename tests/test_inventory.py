@@ -0,0 +1,55 @@
+"""
+The room inventory must never book a room twice on the same night.
+"""
+import random
+
+import numpy as np
+
+from simulations.hotel.inventory import ROOM_TYPES, RoomInventory, room_layout
+
+
+def test_no_room_is_booked_twice():
+    rng = random.Random(4)
+    layout = {number: (floor, room_type) for number, floor, room_type in room_layout(150)}
+    inventory = RoomInventory.for_hotel(150, horizon=30)
+    # Brute force: the booking holding each room on each night
+    nights = {}
+    stays = {}
+
+    for night in range(120):
+        inventory.advance(night)
+        for passed in [passed for passed in nights if passed < night]:
+            del nights[passed]
+
+        for _ in range(rng.randint(0, 40)):
+            length = rng.randint(1, 7)
+            start = rng.randint(night, night + inventory.horizon - length)
+            room_type = rng.choice((None,) + ROOM_TYPES)
+            floor = rng.choice((None, rng.randint(1, 14)))
+            booking = inventory.book(start, start + length, room_type, floor)
+
+            candidates = [number for number, (room_floor, kind) in layout.items()
+                          if room_type in (None, kind) and floor in (None, room_floor)]
+            free = [number for number in candidates
+                    if all(number not in nights.get(stay_night, {}) for stay_night in range(start, start + length))]
+            if booking is None:
+                assert not free
+                continue
+            number = inventory.room_number(booking)
+            assert number in free
+            for stay_night in range(start, start + length):
+                nights.setdefault(stay_night, {})[number] = booking
+            stays[booking] = (number, start, start + length)
+
+        for booking in rng.sample(sorted(stays), len(stays) // 4):
+            number, start, end = stays.pop(booking)
+            checkout = rng.randint(start, end)
+            inventory.release(booking, checkout)
+            for stay_night in range(max(start, checkout, night), end):
+                del nights[stay_night][number]
+
+        expected = np.zeros((len(ROOM_TYPES), inventory.horizon), dtype=np.int64)
+        for stay_night, rooms in nights.items():
+            for number in rooms:
+                expected[ROOM_TYPES.index(layout[number][1]), stay_night - night] += 1
+        np.testing.assert_array_equal(inventory.occupancy(), expected)
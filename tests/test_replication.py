@@ -0,0 +1,20 @@
+"""
+Unknown model parameters are reported before any replication runs.
+"""
+import pytest
+
+from simulations.replication import check_params, iter_replications, main
+
+
+def test_unknown_param_is_rejected():
+    check_params("hotel", {"guests": 50})
+    with pytest.raises(ValueError, match="num_guests"):
+        next(iter_replications("hotel", 2, {"num_guests": 50}))
+
+
+def test_unknown_param_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exit:
+        main(["hotel", "--param", "num_guests=50"])
+
+    assert exit.value.code == 2
+    assert "Unknown hotel parameters: num_guests" in capsys.readouterr().err
@@ -0,0 +1,39 @@
+"""
+Plans evaluated in a batch must give the results of a GridEngine running each plan.
+"""
+import math
+
+import numpy as np
+
+from simulations.traffic.grid_engine import GridEngine
+from simulations.traffic.signal_timing import (PlanBatch, PlanEvaluator, green_wave_delay, optimize,
+                                               uniform_plan)
+
+PLANS = [uniform_plan((5, 5)), uniform_plan((5, 5), cycle=4.0, split=0.3, offset=1.0),
+         uniform_plan((5, 5), cycle=12.0, split=0.7)]
+
+
+def test_batch_matches_engine_runs():
+    results = PlanBatch(GridEngine(4, 4, 40, seed=1), PLANS).run()
+
+    for plan, result in zip(PLANS, results):
+        engine = GridEngine(4, 4, 40, seed=1, plan=plan)
+        engine.run()
+        assert result["cars_finished"] == 40
+        assert math.isclose(result["mean_trip_time"], float(engine.trip_times().mean()))
+
+
+def test_green_wave_delay():
+    delays = [green_wave_delay(plan) for plan in PLANS]
+
+    assert all(np.isfinite(delays)) and min(delays) >= 0
+
+
+def test_optimize_does_not_worsen_the_plan():
+    evaluator = PlanEvaluator(grid=3, cars=30, seeds=(0,), max_ticks=500)
+    start = evaluator.evaluate([uniform_plan(evaluator.shape)])[0]
+    plan, best = optimize(evaluator, sweeps=1, screen=3, budget=60)
+
+    assert np.shape(plan["cycle"]) == evaluator.shape
+    assert best["mean_trip_time"] <= start["mean_trip_time"]
+    assert evaluator.evaluations <= 60 + 1
@@ -0,0 +1,20 @@
+"""
+A sweep simulates each distinct point once and reports the runs it actually made.
+"""
+from simulations.sweep import run_sweep
+
+
+def test_repeated_configurations_are_computed_once():
+    design = [{"receptionists": 2}, {"receptionists": 2}, {"receptionists": 3}]
+    rows = run_sweep(design, guests=30, replications=2, seed=1, cache_dir=None, max_workers=1)
+
+    assert [row["computed"] for row in rows] == [2, 0, 2]
+    assert rows[0]["mean_time_in_hotel"] == rows[1]["mean_time_in_hotel"]
+
+
+def test_cached_points_are_not_computed(tmp_path):
+    design = [{"receptionists": 2}, {"receptionists": 2}]
+    run_sweep(design, guests=30, replications=2, seed=1, cache_dir=tmp_path, max_workers=1)
+    rows = run_sweep(design, guests=30, replications=2, seed=1, cache_dir=tmp_path, max_workers=1)
+
+    assert [(row["cached"], row["computed"]) for row in rows] == [(2, 0), (0, 0)]
@@ -0,0 +1,48 @@
+"""
+The tiled traffic engine must give exactly the results of the single-process engine.
+"""
+import numpy as np
+import pytest
+
+from simulations.traffic.grid_engine import STATE_ARRAYS, GridEngine
+from simulations.traffic.signal_timing import uniform_plan
+from simulations.traffic.tiled_engine import TiledGridEngine
+
+
+def assert_same_state(engine, other):
+    assert engine.tick == other.tick
+    for name in STATE_ARRAYS:
+        np.testing.assert_array_equal(getattr(engine, name), getattr(other, name), err_msg=name)
+
+
+@pytest.mark.parametrize("tiles", [(2, 2), (3, 2), (4, 1)])
+def test_tiles_match_single_process(tiles):
+    single = GridEngine(6, 6, 60, seed=7)
+    tiled = GridEngine(6, 6, 60, seed=7)
+    summary = single.run()
+    tiled_summary = TiledGridEngine(tiled, tiles).run()
+
+    assert_same_state(single, tiled)
+    assert tiled_summary["moves"] == summary["moves"]
+
+
+def test_tiles_match_single_process_with_plan():
+    plan = uniform_plan((7, 7), cycle=6.0, split=0.4, offset=1.0)
+    single = GridEngine(6, 6, 60, seed=3, plan=plan)
+    tiled = GridEngine(6, 6, 60, seed=3, plan=plan)
+    single.run()
+    TiledGridEngine(tiled, (2, 2)).run()
+
+    assert_same_state(single, tiled)
+
+
+def test_tiles_continue_a_partial_run():
+    single = GridEngine(6, 6, 60, seed=11)
+    tiled = GridEngine(6, 6, 60, seed=11)
+    single.run(15)
+    TiledGridEngine(tiled, (2, 2)).run(15)
+    assert_same_state(single, tiled)
+
+    single.run()
+    TiledGridEngine(tiled, (2, 2)).run()
+    assert_same_state(single, tiled)